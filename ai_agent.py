@@ -3,26 +3,115 @@
 展示如何通过API与游戏服务器交互
 """
 
-import requests
+import logging
+import os
 import time
-import json
+import random
 import threading
-import sys
-from typing import List, Dict
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from typing import List
+import codec
+import rules
+from guandan_client import GuandanClient, GameAPIError, GameNotStarted, TurnInfo, ActionResult, apply_turn_delta
+
+try:
+    import simple_websocket
+except ImportError:   # 可选依赖：WebSocket 传输需要 pip install simple-websocket
+    simple_websocket = None
+
+logger = logging.getLogger('guandan.agent')
+
+
+class SeatSocket:
+    """
+    座位的 WebSocket 客户端（协议见 server.SeatChannel）
+    服务器推送的回合信息合并到 turn_info；play/pass_turn 在同一条连接上发送并等待结果
+    """
+    def __init__(self, server_url, player_id, game_id=None, compact=True, token=None):
+        if simple_websocket is None:
+            raise RuntimeError("WebSocket 传输需要安装 simple-websocket")
+        self.mimetype = codec.MSGPACK if compact and codec.msgpack_available() else codec.JSON
+        path = f'/game/{game_id}/ws/{player_id}' if game_id else f'/game/ws/{player_id}'
+        query = '?encoding=msgpack' if self.mimetype == codec.MSGPACK else ''
+        # http -> ws, https -> wss；token 为 claim_seat() 得到的座位令牌，服务器据此确认是这个座位
+        self.ws = simple_websocket.Client.connect('ws' + server_url[len('http'):] + path + query,
+                                                  headers={'X-Seat-Token': token} if token else None)
+        self.turn_info = None
+        self._fresh = False   # 收到了还没被 wait_turn 取走的回合信息
+        self._next_id = 0
+    
+    def close(self):
+        self.ws.close()
+    
+    def _send(self, message):
+        data = codec.encode(message, self.mimetype)
+        self.ws.send(data if self.mimetype == codec.MSGPACK else data.decode('utf-8'))
+    
+    def _receive(self, timeout):
+        """收一条消息（超时返回 None）；回合信息顺便合并到 turn_info"""
+        raw = self.ws.receive(timeout=timeout)
+        if raw is None:
+            return None
+        message = codec.decode(raw, self.mimetype if isinstance(raw, bytes) else codec.JSON)
+        kind = message.get('type')
+        if kind == 'turn':
+            if message.get('delta') and self.turn_info is not None:
+                message = apply_turn_delta(self.turn_info, message)
+            self.turn_info = message
+            self._fresh = True
+        elif kind == 'closed':
+            raise Exception("牌桌已关闭")
+        elif kind == 'error' and message.get('id') is None:
+            raise Exception(f"服务器错误: {message.get('message')}")
+        return message
+    
+    def wait_turn(self, timeout):
+        """等到有新的回合信息或超时，返回最新的完整回合信息（还没开局时为 None）"""
+        deadline = time.monotonic() + timeout
+        while not self._fresh:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._receive(remaining) is None:
+                break
+        self._fresh = False
+        return self.turn_info
+    
+    def request(self, message, timeout=3):
+        """发送动作并等待对应的 result 消息"""
+        self._next_id += 1
+        request_id = self._next_id
+        self._send(dict(message, id=request_id))
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            reply = self._receive(remaining) if remaining > 0 else None
+            if reply is None:
+                raise Exception("服务器响应超时")
+            if reply.get('id') == request_id:
+                return reply
+    
+    def play(self, cards):
+        return ActionResult.from_dict(self.request({'type': 'play', 'cards': cards}))
+    
+    def pass_turn(self):
+        return ActionResult.from_dict(self.request({'type': 'pass'}))
+
 
 class GuandanAIAgent:
-    def __init__(self, server_url='http://localhost:5000', player_id=1):
+    def __init__(self, server_url='http://localhost:5000', player_id=1, transport=None, game_id=None):
         self.server_url = server_url
         self.player_id = player_id
         self.game_history = []
         self.last_play = None
         self.stop_event = threading.Event()  # 用事件替代 running 标志
         
-        # 创建带超时的 requests session
-        self.session = requests.Session()
-        self.session.timeout = 3  # 3秒超时
+        # 连接池 + 重试 + 超时的 API 客户端（见 guandan_client.py），默认请求紧凑编码；game_id 为 None 时是默认牌桌
+        self.game_client = GuandanClient(server_url, game_id=game_id)
+        self.session = self.game_client.session
+        # 'push'：认领座位，订阅座位的私有事件流，turn 事件轮到自己时才拉取回合信息（见 _run_push）
+        # 'http'：长轮询 + 每个动作一个请求；'ws'：一条 WebSocket 连接收发（见 SeatSocket）
+        self.transport = transport or os.getenv('AGENT_TRANSPORT', 'push')
+        if self.transport == 'ws' and simple_websocket is None:
+            raise RuntimeError("WebSocket 传输需要安装 simple-websocket")
+        self.socket = None
         
         # 玩家位置映射
         self.position_map = {
@@ -32,152 +121,169 @@ class GuandanAIAgent:
         }
         self.position = self.position_map.get(player_id, f'玩家{player_id}')
         
-        # 可配置的延迟（秒），改为 0.1 秒以加快速度
-        self.poll_interval = 0.1  # 轮询间隔
+        # 可配置的延迟（秒）
+        self.long_poll_wait = 5  # 长轮询等待时间（服务器阻塞到轮到自己或状态变化）
+        self.poll_interval = 0.1  # 服务器不支持长轮询或决策未生效时的重试间隔
         self.error_retry_interval = 0.5  # 错误重试间隔
+        self.state_version = None  # 最后看到的状态版本号
+        self.turn_info = None      # 最后一次的回合信息（TurnInfo）
     
-    def _log(self, message):
-        """打印带方位的日志"""
-        print(f"[{self.position}] {message}", flush=True)
+    def _log(self, message, *args, level=logging.INFO):
+        """带方位的日志；args 按 % 格式化，只在该级别开启时才格式化"""
+        if logger.isEnabledFor(level):
+            logger.log(level, "[%s] " + message, self.position, *args)
     
-    def get_turn_info(self) -> Dict:
-        """获取该玩家的回合信息"""
+    def get_turn_info(self, wait=0, since=None) -> TurnInfo:
+        """
+        获取该玩家的回合信息
+        wait > 0 时使用长轮询：服务器阻塞到轮到自己或状态版本号不等于 since；
+        带 since 时服务器只返回之后的变化，由客户端合并成完整的回合信息
+        连接失败、超时、未开局时抛出的异常见 guandan_client
+        """
         # 检查是否已被请求停止
         if self.stop_event.is_set():
             raise Exception("已请求停止")
         
-        url = f'{self.server_url}/game/turn/{self.player_id}'
+        if self.transport == 'ws':
+            return self._socket_turn_info(wait)
+        
+        info = self.game_client.turn(self.player_id, wait=wait, since=since)
+        self.turn_info = info
+        return info
+    
+    def _connect_socket(self):
+        if self.socket is None:
+            # WebSocket 通道要出示座位令牌：先认领座位，重连时沿用已有的令牌
+            token = self.game_client.seat_tokens.get(self.player_id) or self.game_client.claim_seat(self.player_id)
+            try:
+                self.socket = SeatSocket(self.server_url, self.player_id, self.game_client.game_id, token=token)
+            except (OSError, simple_websocket.ConnectionError):
+                raise Exception("无法连接到服务器")
+        return self.socket
+    
+    def _close_socket(self):
+        """关闭 WebSocket 并释放 _connect_socket 认领的座位"""
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        if self.player_id in self.game_client.seat_tokens:
+            try:
+                self.game_client.release_seat(self.player_id)
+            except Exception as e:
+                self._log("释放座位失败: %s", e, level=logging.DEBUG)
+    
+    def _socket_call(self, call):
+        """在 WebSocket 上执行 call(socket)；连接断开时丢弃连接，下次重连"""
         try:
-            resp = self.session.get(url, timeout=3)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            # 检查响应中是否有 error 字段
-            if 'error' in data:
-                raise Exception(f"服务器错误: {data['error']}")
-            
-            return data
-        except requests.exceptions.ConnectionError:
+            return call(self._connect_socket())
+        except simple_websocket.ConnectionClosed:
+            self.socket = None
             raise Exception("无法连接到服务器")
-        except requests.exceptions.Timeout:
-            raise Exception("服务器响应超时")
-        except requests.exceptions.HTTPError as e:
-            # 400 错误表示游戏还没开始
-            if e.response.status_code == 400:
-                raise Exception("游戏未开始")
-            raise Exception(f"HTTP {e.response.status_code}")
-        except Exception as e:
-            raise Exception(f"获取回合信息失败: {e}")
+        except Exception:
+            if self.socket is not None and not self.socket.ws.connected:
+                self.socket = None
+            raise
     
-    def get_hand(self) -> List[Dict]:
-        """获取手牌"""
-        url = f'{self.server_url}/game/player/{self.player_id}/hand'
-        resp = requests.get(url)
-        data = resp.json()
-        return data['cards']
+    def _socket_turn_info(self, wait):
+        """WebSocket 模式：等待服务器推送回合信息（最多 wait 秒）"""
+        data = self._socket_call(lambda sock: sock.wait_turn(wait))
+        if data is None:
+            raise Exception("游戏未开始")
+        self.turn_info = TurnInfo.from_dict(data)
+        return self.turn_info
     
-    def get_game_state(self) -> Dict:
-        """获取游戏状态"""
-        url = f'{self.server_url}/game/state'
-        resp = requests.get(url)
-        return resp.json()
+    def get_hand(self) -> List:
+        """获取手牌（牌字典或牌面编码）"""
+        return self.game_client.hand(self.player_id).cards
     
-    def play_cards(self, cards: List[Dict]) -> Dict:
-        """出牌"""
-        url = f'{self.server_url}/game/play'
-        payload = {
-            'playerId': self.player_id,
-            'cards': cards
-        }
-        resp = requests.post(url, json=payload)
-        return resp.json()
+    def get_game_state(self):
+        """获取游戏状态（GameSnapshot）"""
+        return self.game_client.state()
     
-    def pass_turn(self) -> Dict:
+    def play_cards(self, cards: List) -> ActionResult:
+        """出牌（cards 为牌字典或牌面编码）"""
+        if self.transport == 'ws':
+            return self._socket_call(lambda sock: sock.play(cards))
+        return self.game_client.play(self.player_id, cards)
+    
+    def pass_turn(self) -> ActionResult:
         """过牌"""
-        url = f'{self.server_url}/game/pass'
-        payload = {'playerId': self.player_id}
-        resp = requests.post(url, json=payload)
-        return resp.json()
+        if self.transport == 'ws':
+            return self._socket_call(lambda sock: sock.pass_turn())
+        return self.game_client.pass_turn(self.player_id)
     
-    def make_decision(self) -> bool:
+    @staticmethod
+    def choose_move(moves, leading, rng=random):
+        """
+        简单的AI策略（moves 为 rules.legal_moves 的结果，从小到大排列）：
+        1. 首轮出最小的单牌
+        2. 非首轮30%概率过牌，70%概率用最小的同牌型压牌（不用炸弹）
+        返回要出的 rules.Move，None 表示过牌
+        """
+        if leading:
+            singles = [m for m in moves if m.hand_type.kind == rules.SINGLE]
+            return (singles or moves)[0] if moves else None
+        if rng.random() < 0.3:
+            return None
+        for move in moves:
+            if not move.hand_type.power:
+                return move
+        return None
+    
+    def make_decision(self, info=None) -> bool:
         """
         做出决策
+        info: 已获取的回合信息，为空时重新获取
         返回: True=出牌成功, False=过牌或出牌失败
         """
         try:
-            info = self.get_turn_info()
-            
-            # 检查返回数据结构
-            if not isinstance(info, dict) or 'isMyTurn' not in info:
-                self._log(f"错误: 无效的回合信息: {info}")
-                return False
+            if info is None:
+                info = self.get_turn_info()
             
             # 不是我的回合
-            if not info['isMyTurn']:
-                self._log("不是我的回合，等待...")
+            if not info.is_my_turn:
+                self._log("不是我的回合，等待...", level=logging.DEBUG)
                 return False
             
-            hand = info.get('hand', [])
-            last_play = info.get('lastPlay')
+            self._log("轮到我了！手牌数: %d", len(info.hand))
+            self._log("  最后出牌: %s", info.last_play, level=logging.DEBUG)
             
-            self._log("轮到我了！")
-            self._log(f"  手牌数: {len(hand)}")
-            self._log(f"  最后出牌: {last_play}")
+            # 在本地列出所有合法出法（与服务器使用同一套规则），不会发出会被拒绝的牌
+            last_card_type = info.last_card_type
+            last_type = rules.type_from_dict(last_card_type) if last_card_type else None
+            # 手牌可能是牌字典（JSON）或牌面编码（MessagePack）
+            faces = codec.to_faces(info.hand) or []
+            moves = rules.legal_moves(rules.counts_from_faces(faces), last_type, info.level)
             
-            # 简单的AI策略：
-            # 1. 首轮出最小的单牌
-            # 2. 非首轮30%概率过牌，70%概率尝试压牌
+            move = self.choose_move(moves, leading=last_card_type is None)
+            if move is None:
+                result = self.pass_turn()
+                self._log("选择过牌" if moves else "无法压牌，选择过牌")
+                return False
             
-            if not last_play or last_play.get('isPass', True):
-                # 首轮，出最小的单牌
-                if hand:
-                    card = hand[0]  # 已排序，最小的在前
-                    result = self.play_cards([card])
-                    if result['success']:
-                        self._log(f"出了: {card['value']}{card['suit']}")
-                        return True
-                    else:
-                        self._log(f"出牌失败: {result['message']}")
-            else:
-                # 非首轮
-                import random
-                if random.random() < 0.3:  # 30%过牌
-                    result = self.pass_turn()
-                    self._log("选择过牌")
-                    return False
-                else:
-                    # 尝试找大于上家的单牌（先本地过滤，再发送请求）
-                    last_cards = last_play['cards']
-                    last_card_type = last_play['cardType']['name']
-                    last_value = last_cards[0]['sortValue']
-                    
-                    # 策略：如果上家是单牌，找一个最小的能压的单牌
-                    if last_card_type == '单牌':
-                        candidates = [card for card in hand if card['sortValue'] > last_value]
-                        if candidates:
-                            # 选最小的能压的（贪心策略）
-                            best_card = min(candidates, key=lambda c: c['sortValue'])
-                            result = self.play_cards([best_card])
-                            if result['success']:
-                                self._log(f"压牌: {best_card['value']}{best_card['suit']}")
-                                return True
-                    
-                    # 没找到可以压的，过牌
-                    result = self.pass_turn()
-                    self._log("无法压牌，选择过牌")
-                    return False
+            result = self.play_cards(list(move.faces))
+            if result.success:
+                if logger.isEnabledFor(logging.INFO):
+                    card_str = '、'.join(f"{c['value']}{c['suit']}" for c in rules.move_to_dicts(move))
+                    self._log("出了 %s: %s", rules.type_name(move.hand_type), card_str)
+                return True
+            self._log("出牌失败: %s", result.message, level=logging.WARNING)
+            return False
         
         except Exception as e:
-            self._log(f"错误: {e}")
+            self._log("错误: %s", e, level=logging.ERROR)
             return False
     
     def run(self, max_turns=None):
         """
         AI Agent主循环
-        定期检查是否轮到自己，然后做出决策
+        长轮询等待轮到自己，然后做出决策
         max_turns: 最大轮数，None 表示无限运行
         """
         self._log("AI Agent启动")
+        if self.transport == 'push' and self._run_push(max_turns):
+            self._log("🛑 AI Agent已停止")
+            return
         turns = 0
         consecutive_errors = 0
         
@@ -187,47 +293,136 @@ class GuandanAIAgent:
                 if self.stop_event.is_set():
                     break
                 
-                info = self.get_turn_info()
+                # 长轮询：没轮到自己时服务器会一直挂起，直到状态变化
+                info = self.get_turn_info(wait=self.long_poll_wait, since=self.state_version)
                 consecutive_errors = 0  # 重置错误计数
                 
-                # 检查响应数据
-                if not isinstance(info, dict) or 'isMyTurn' not in info:
-                    if turns == 0 or turns % 10 == 0:  # 定期打印，避免日志过多
-                        self._log("等待游戏开始...")
-                else:
-                    if info['isMyTurn']:
-                        self.make_decision()
+                version = info.version
+                # 本局结束后 canPlay 为 False，不再做决策
+                if info.is_my_turn and info.can_play:
+                    # 同一版本仍轮到自己，说明上次决策没有生效，稍等再试
+                    if version is not None and version == self.state_version:
+                        if self.stop_event.wait(self.poll_interval):
+                            break
+                    self.make_decision(info)
+                self.state_version = version
                 
-                # 使用 wait 替代 sleep，支持被中断（改为 0.1 秒加快速度）
-                if self.stop_event.wait(self.poll_interval):
+                # 服务器不支持长轮询（没有版本号）时退回定时轮询
+                if version is None and self.stop_event.wait(self.poll_interval):
                     break
                 turns += 1
             
             except Exception as e:
-                error_msg = str(e)
                 consecutive_errors += 1
-                
-                # 已请求停止
-                if "已请求停止" in error_msg:
+                if not self._report_error(e, consecutive_errors):
                     break
                 
-                # 游戏未开始
-                if "游戏未开始" in error_msg:
-                    if consecutive_errors <= 1:  # 只打印第一次
-                        self._log("⏳ 等待游戏开始...")
-                # 连接错误
-                elif "无法连接" in error_msg or "超时" in error_msg:
-                    if consecutive_errors % 10 == 1:  # 每10次错误打印一次
-                        self._log(f"⚠️  {error_msg}")
-                else:
-                    self._log(f"❌ {error_msg}")
-                
                 # 错误时稍作延迟再重试（改为 0.5 秒）
                 if self.stop_event.wait(self.error_retry_interval):
                     break
                 turns += 1
         
+        self._close_socket()
         self._log("🛑 AI Agent已停止")
+    
+    def _report_error(self, error, consecutive_errors):
+        """按错误类型打印主循环里的异常；已请求停止时返回 False"""
+        error_msg = str(error)
+        
+        # 已请求停止
+        if "已请求停止" in error_msg:
+            return False
+        
+        # 游戏未开始
+        if "游戏未开始" in error_msg:
+            if consecutive_errors <= 1:  # 只打印第一次
+                self._log("⏳ 等待游戏开始...")
+        # 连接错误
+        elif "无法连接" in error_msg or "超时" in error_msg or "中断" in error_msg:
+            if consecutive_errors % 10 == 1:  # 每10次错误打印一次
+                self._log("⚠️  %s", error_msg, level=logging.WARNING)
+        else:
+            self._log("❌ %s", error_msg, level=logging.ERROR)
+        return True
+    
+    def _run_push(self, max_turns=None):
+        """
+        推送模式的主循环：认领座位并订阅它的私有事件流（见 server.seat_events），
+        只在 turn 事件轮到自己（以及连接/重连后）时才拉取回合信息并决策，没有轮询
+        座位已被认领或服务器不支持时返回 False，由 run() 退回长轮询
+        """
+        consecutive_errors = 0
+        while True:
+            try:
+                self.game_client.claim_seat(self.player_id)
+                break
+            except GameAPIError as e:
+                self._log("⚠️  无法认领座位（%s），改用长轮询", e, level=logging.WARNING)
+                return False
+            except Exception as e:
+                # 服务器还没起来：稍后重试
+                consecutive_errors += 1
+                self._report_error(e, consecutive_errors)
+                if self.stop_event.wait(self.error_retry_interval):
+                    return True
+        
+        turns = 0
+        consecutive_errors = 0
+        last_event_id = None
+        pending = False   # 已经决策，但之后还没收到任何事件（决策可能没有生效）
+        try:
+            while (max_turns is None or turns < max_turns) and not self.stop_event.is_set():
+                try:
+                    # 连接断开（生成器结束）时带上 last_event_id 重连，补发错过的事件
+                    for event in self.game_client.events(self.player_id, last_event_id):
+                        if self.stop_event.is_set() or (max_turns is not None and turns >= max_turns):
+                            break
+                        consecutive_errors = 0
+                        if event is None:
+                            # 心跳：决策后迟迟没有事件，说明决策没有生效，重新确认一次
+                            if pending:
+                                pending = self._act_on_turn()
+                            continue
+                        last_event_id = event.get('id', last_event_id)
+                        self._on_event(event)
+                        kind = event.get('type')
+                        if kind in ('connected', 'resync') or (kind == 'turn' and event.get('nextPlayer') == self.player_id):
+                            pending = self._act_on_turn()
+                            turns += 1
+                        elif kind == 'closed':
+                            # 牌桌关闭或座位被释放
+                            self._log("事件流已关闭")
+                            return True
+                        else:
+                            pending = False
+                except Exception as e:
+                    consecutive_errors += 1
+                    if not self._report_error(e, consecutive_errors):
+                        break
+                    if self.stop_event.wait(self.error_retry_interval):
+                        break
+        finally:
+            try:
+                self.game_client.release_seat(self.player_id)
+            except Exception as e:
+                self._log("释放座位失败: %s", e, level=logging.DEBUG)
+        return True
+    
+    def _on_event(self, event):
+        """推送模式下收到的每个事件（子类可以借此在轮到自己之前做准备）"""
+    
+    def _act_on_turn(self):
+        """拉取回合信息，轮到自己就决策；返回是否做了决策"""
+        try:
+            info = self.get_turn_info(since=self.state_version)
+        except GameNotStarted:
+            # 还没开局：等开局的 turn 事件
+            return False
+        self.state_version = info.version
+        if info.is_my_turn and info.can_play:
+            self.make_decision(info)
+            return True
+        return False
 
 
 def start_ai_agents():
@@ -266,9 +461,9 @@ def shutdown_agents():
     print("\n🛑 正在关闭 AI Agent...")
     for agent in agents:
         agent.stop_event.set()
-    # 给予线程一次机会完成当前循环（最大等待 session timeout + 1s）
+    # 给予线程一次机会完成当前循环（最大等待长轮询时间 + 1s）
     for t in threads:
-        t.join(timeout=5)
+        t.join(timeout=6)
     print("✅ 所有 AI Agent 已停止")
     print("=" * 50)
 
@@ -279,6 +474,8 @@ threads: List[threading.Thread] = []
 
 
 if __name__ == '__main__':
+    # 日志级别用环境变量 LOG_LEVEL 调整（DEBUG 时输出每回合的详细信息）
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(message)s')
     print("掼蛋 AI Agent 示例")
     print("=" * 50)
     print("使用方式:")
@@ -287,7 +484,7 @@ if __name__ == '__main__':
     print("3. 在前端点击'开始游戏'")
     print("4. 在另一个终端运行这个脚本: python ai_agent.py")
     print("=" * 50)
-    print("按 Ctrl+C 停止 AI Agent（可能有最多 ~3 秒等待，取决于当前网络请求 timeout）")
+    print("按 Ctrl+C 停止 AI Agent（可能有最多 ~5 秒等待，取决于当前长轮询请求）")
     print("=" * 50, flush=True)
 
     input("按Enter键启动AI Agent...")
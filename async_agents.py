@@ -0,0 +1,369 @@
+"""
+异步 AI Agent 运行时 - 一个事件循环 + 一个共享连接池驱动成百上千个座位
+
+每个座位是一个协程（AsyncAgent），所有座位共用一个 aiohttp.ClientSession（连接池、keep-alive）；
+每张牌桌另有一个协程负责开局、在一局结束后开下一局，打满 --games 局后停止该桌的 Agent。
+决策用 policies.py 的策略（默认 rule，与 GuandanAIAgent 相同）。
+
+用法:
+    pip install aiohttp
+    python async_agents.py --tables 50 --games 2     # 50 桌 x 4 个座位 = 200 个 Agent
+    python async_agents.py --tables 10 --games 0     # 一直打，直到 Ctrl+C
+
+Ctrl+C（或 SIGTERM）时所有 Agent 收到停止信号，等当前请求结束后退出。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import signal
+import time
+
+import aiohttp
+
+import codec
+import rules
+from guandan_client import DEFAULT_HEARTBEAT, GameAPIError, GameNotStarted, apply_turn_delta
+from policies import POLICIES, get_policy
+from simulator import TurnView
+
+logger = logging.getLogger('guandan.agent')
+
+
+class AgentStopped(Exception):
+    """等待期间收到了停止信号"""
+
+
+class AsyncGameClient:
+    """游戏 API 的协程客户端；请求紧凑编码（见 codec.py），所有 Agent 共用一个 session"""
+    def __init__(self, session, server_url='http://localhost:5000'):
+        self.session = session
+        self.server_url = server_url.rstrip('/')
+
+    async def _request(self, method, path, payload=None, timeout=3, **params):
+        kwargs = {'params': params, 'timeout': aiohttp.ClientTimeout(total=timeout)}
+        if payload is not None:
+            body, content_type = codec.encode_body(payload)
+            kwargs.update(data=body, headers={'Content-Type': content_type})
+        async with self.session.request(method, self.server_url + path, **kwargs) as resp:
+            data = codec.decode(await resp.read(), resp.content_type)
+            return resp.status, data
+
+    async def create_table(self, game_id):
+        """创建牌桌；已存在时返回 False"""
+        status, _ = await self._request('POST', '/game/tables', {'gameId': game_id})
+        return status == 201
+
+    async def start(self, game_id):
+        _, data = await self._request('POST', f'/game/{game_id}/start')
+        return data
+
+    async def turn(self, game_id, player_id, wait=0, since=None):
+        """回合信息；wait > 0 时长轮询，带 since 时服务器返回增量"""
+        params = {'wait': wait} if wait > 0 else {}
+        if wait > 0 and since is not None:
+            params['since'] = since
+        status, data = await self._request('GET', f'/game/{game_id}/turn/{player_id}',
+                                           timeout=3 + wait, **params)
+        if status == 400:
+            raise GameNotStarted(data.get('error'), status)
+        if status != 200:
+            raise GameAPIError(data.get('error') or f'HTTP {status}', status)
+        return data
+
+    async def events(self, game_id, last_event_id=None, heartbeat=DEFAULT_HEARTBEAT):
+        """
+        订阅牌桌事件流（SSE），逐条产生事件字典，每个心跳产生一次 None；服务器关闭连接时结束
+        带序号的事件有 'id' 字段，断线后作为 last_event_id 传入即可补发错过的事件
+        """
+        headers = {'Accept': 'text/event-stream'}
+        if last_event_id is not None:
+            headers['Last-Event-ID'] = str(last_event_id)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=3, sock_read=heartbeat + 3)
+        async with self.session.get(f'{self.server_url}/game/{game_id}/events', headers=headers,
+                                    params={'heartbeat': heartbeat}, timeout=timeout) as resp:
+            if resp.status != 200:
+                data = codec.decode(await resp.read(), resp.content_type)
+                raise GameAPIError(data.get('error') or f'HTTP {resp.status}', resp.status)
+            event_id, lines = None, []
+            async for raw in resp.content:
+                line = raw.decode('utf-8').rstrip('\r\n')
+                if line.startswith(':'):
+                    yield None   # 心跳
+                elif line.startswith('id:'):
+                    event_id = int(line[3:])
+                elif line.startswith('data:'):
+                    lines.append(line[5:].strip())
+                elif not line and lines:
+                    event = json.loads('\n'.join(lines))
+                    if event_id is not None:
+                        event['id'] = event_id
+                    event_id, lines = None, []
+                    yield event
+
+    async def play(self, game_id, player_id, cards):
+        _, data = await self._request('POST', f'/game/{game_id}/play', {'playerId': player_id, 'cards': cards})
+        return data
+
+    async def pass_turn(self, game_id, player_id):
+        _, data = await self._request('POST', f'/game/{game_id}/pass', {'playerId': player_id})
+        return data
+
+
+def turn_view(info):
+    """回合信息（/game/turn 的响应，手牌可以是牌字典或牌面编码） -> simulator.TurnView"""
+    state = info.get('gameState') or {}
+    last_play = info.get('lastPlay')
+    card_type = last_play.get('cardType') if last_play else None
+    last_type = rules.type_from_dict(card_type) if card_type else None
+    faces = codec.to_faces(info.get('hand', [])) or []
+    return TurnView(info['playerId'], rules.counts_from_faces(faces), last_type,
+                    last_play['playerId'] if last_type else None, state.get('currentLevel', 2),
+                    [p['cardCount'] for p in state.get('players', [])], info.get('passCount', 0))
+
+
+class AsyncAgent:
+    """一个座位的协程 Agent；stop() 代替线程版的 stop_event，正在进行的长轮询会立即结束"""
+    def __init__(self, client, game_id, player_id, policy='rule', seed=None):
+        self.client = client
+        self.game_id = game_id
+        self.player_id = player_id
+        self.policy = get_policy(policy)
+        self.rng = random.Random(seed)
+        self.stopped = asyncio.Event()
+
+        self.long_poll_wait = 5
+        self.poll_interval = 0.1
+        self.error_retry_interval = 0.5
+        self.turn_info = None      # 最后一次的完整回合信息（用来合并增量响应）
+        self.state_version = None  # 最后看到的状态版本号
+
+        self.plays = 0
+        self.passes = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def stop(self):
+        self.stopped.set()
+
+    def _log(self, message, *args, level=logging.INFO):
+        if logger.isEnabledFor(level):
+            logger.log(level, "[%s/%d] " + message, self.game_id, self.player_id, *args)
+
+    async def _until_stopped(self, coro):
+        """执行 coro；期间收到停止信号则取消它并抛出 AgentStopped"""
+        task = asyncio.ensure_future(coro)
+        stop = asyncio.ensure_future(self.stopped.wait())
+        try:
+            await asyncio.wait((task, stop), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+        if not task.done():
+            task.cancel()
+            raise AgentStopped()
+        return task.result()
+
+    async def _sleep(self, seconds):
+        """可被 stop() 打断的等待，返回是否已停止"""
+        try:
+            await asyncio.wait_for(self.stopped.wait(), seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def run(self):
+        """主循环：长轮询等到轮到自己，然后决策"""
+        while not self.stopped.is_set():
+            try:
+                since = self.state_version if self.turn_info is not None else None
+                info = await self._until_stopped(
+                    self.client.turn(self.game_id, self.player_id, self.long_poll_wait, since))
+                if info.get('delta'):
+                    info = apply_turn_delta(self.turn_info, info)
+                self.turn_info = info
+
+                version = info.get('version')
+                if info['isMyTurn'] and info.get('canPlay', True):
+                    # 同一版本仍轮到自己，说明上次决策没有生效，稍等再试
+                    if version == self.state_version and await self._sleep(self.poll_interval):
+                        break
+                    await self.make_decision(info)
+                self.state_version = version
+            except AgentStopped:
+                break
+            except GameNotStarted:
+                if await self._sleep(self.error_retry_interval):
+                    break
+            except (GameAPIError, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                self.errors += 1
+                if self.errors % 10 == 1:
+                    self._log("⚠️  %s", e or type(e).__name__, level=logging.WARNING)
+                if await self._sleep(self.error_retry_interval):
+                    break
+
+    async def make_decision(self, info):
+        move = self.policy(turn_view(info), self.rng)
+        if move is None:
+            result = await self.client.pass_turn(self.game_id, self.player_id)
+        else:
+            result = await self.client.play(self.game_id, self.player_id, list(move.faces))
+        if not result.get('success'):
+            self.rejected += 1
+            self._log("被拒绝: %s", result.get('message'), level=logging.WARNING)
+        elif move is None:
+            self.passes += 1
+        else:
+            self.plays += 1
+            self._log("出了 %s", rules.type_name(move.hand_type), level=logging.DEBUG)
+
+
+class AgentRuntime:
+    """
+    tables 张牌桌 x seats 个座位的 Agent，共用一个事件循环和一个连接池
+    games > 0 时每张牌桌打满 games 局后停止；games == 0 时一直运行到 stop()
+    """
+    def __init__(self, server_url='http://localhost:5000', tables=1, seats=(0, 1, 2, 3), games=1,
+                 policy='rule', prefix='bots', seed=None, connections=None):
+        self.server_url = server_url
+        self.table_ids = [f'{prefix}-{i}' for i in range(tables)]
+        self.seats = tuple(seats)
+        self.games = games
+        self.policy = policy
+        self.seed = seed
+        # 每个 Agent 常驻一个长轮询、每张牌桌的驱动常驻一条事件流，连接池要容得下它们再加上出牌请求
+        self.connections = connections or len(self.table_ids) * (len(self.seats) + 1) + 16
+        self.agents = []
+        self.games_finished = 0
+        self._stopping = None
+
+    def stop(self):
+        """有序关闭：通知所有牌桌和 Agent 停止"""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def _watch_table(self, client, game_id):
+        """
+        订阅牌桌事件流：连上后开局，收到本局结束的回合事件后开下一局，打满 games 局后返回
+        只在事件到来时醒来；不用 /game/turn 长轮询，那里轮到所问座位时会立即返回
+        """
+        played, last_event_id, started = 0, None, False
+        while True:
+            # 服务器断开事件流时带上 last_event_id 重连，补发错过的事件
+            async for event in client.events(game_id, last_event_id):
+                if event is None:
+                    continue
+                last_event_id = event.get('id', last_event_id)
+                kind = event.get('type')
+                if kind == 'connected' and not started:
+                    # 先订阅再开局，不会错过这一局的任何事件
+                    started = True
+                    await client.start(game_id)
+                elif kind == 'turn' and event.get('gameOver'):
+                    played += 1
+                    self.games_finished += 1
+                    logger.info("[%s] 第 %d 局结束", game_id, played)
+                    if self.games and played >= self.games:
+                        return
+                    await client.start(game_id)
+                elif kind == 'closed':
+                    return
+
+    async def _drive_table(self, client, game_id, agents):
+        """驱动一张牌桌直到打满 games 局或 stop()，然后停止该桌的 Agent"""
+        watch = asyncio.ensure_future(self._watch_table(client, game_id))
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        try:
+            await asyncio.wait((watch, stopping), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopping.cancel()
+            watch.cancel()
+            for agent in agents:
+                agent.stop()
+        if watch.done() and not watch.cancelled():
+            watch.result()   # 把驱动出的错交给 run() 记录
+
+    async def run(self, grace=5):
+        """运行到所有牌桌打完或 stop()；返回统计"""
+        self._stopping = asyncio.Event()
+        start = time.perf_counter()
+        connector = aiohttp.TCPConnector(limit=self.connections)
+        async with aiohttp.ClientSession(connector=connector,
+                                         headers={'Accept': codec.accept_header()}) as session:
+            client = AsyncGameClient(session, self.server_url)
+            # 先建好所有牌桌再启动 Agent，否则 Agent 的第一次长轮询会收到 404
+            await asyncio.gather(*(client.create_table(game_id) for game_id in self.table_ids))
+            rng = random.Random(self.seed)
+            drivers = []
+            for game_id in self.table_ids:
+                agents = [AsyncAgent(client, game_id, seat, self.policy, seed=rng.randrange(2 ** 32))
+                          for seat in self.seats]
+                self.agents.extend(agents)
+                drivers.append(asyncio.create_task(self._drive_table(client, game_id, agents)))
+            agent_tasks = [asyncio.create_task(agent.run()) for agent in self.agents]
+
+            # 等到所有牌桌打完，或者 stop()
+            all_done = asyncio.gather(*drivers, return_exceptions=True)
+            stopping = asyncio.create_task(self._stopping.wait())
+            await asyncio.wait((all_done, stopping), return_when=asyncio.FIRST_COMPLETED)
+            stopping.cancel()
+            self._stopping.set()
+            for agent in self.agents:
+                agent.stop()
+            done, pending = await asyncio.wait(agent_tasks + drivers, timeout=grace)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in drivers:
+                if task.done() and not task.cancelled() and task.exception():
+                    logger.error("牌桌驱动出错: %r", task.exception())
+        return self.stats(time.perf_counter() - start)
+
+    def stats(self, elapsed):
+        plays = sum(a.plays for a in self.agents)
+        passes = sum(a.passes for a in self.agents)
+        return {
+            'tables': len(self.table_ids),
+            'agents': len(self.agents),
+            'games': self.games_finished,
+            'plays': plays,
+            'passes': passes,
+            'rejected': sum(a.rejected for a in self.agents),
+            'errors': sum(a.errors for a in self.agents),
+            'elapsed': elapsed,
+            'actions_per_second': (plays + passes) / elapsed if elapsed else 0.0,
+        }
+
+
+async def _main(args):
+    runtime = AgentRuntime(args.server, tables=args.tables, games=args.games, policy=args.policy,
+                           seats=[int(s) for s in args.seats.split(',')], prefix=args.prefix,
+                           seed=args.seed, connections=args.connections)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, runtime.stop)
+        except NotImplementedError:   # Windows
+            pass
+    stats = await runtime.run()
+    print(f"{stats['agents']} 个 Agent / {stats['tables']} 张牌桌: 打完 {stats['games']} 局，"
+          f"出牌 {stats['plays']}、过牌 {stats['passes']}、被拒绝 {stats['rejected']}、错误 {stats['errors']}，"
+          f"用时 {stats['elapsed']:.1f}s（{stats['actions_per_second']:.0f} 动作/秒）")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='异步 AI Agent 运行时')
+    parser.add_argument('--server', default='http://localhost:5000')
+    parser.add_argument('--tables', type=int, default=1, help='牌桌数')
+    parser.add_argument('--seats', default='0,1,2,3', help='每张牌桌由 Agent 坐的座位')
+    parser.add_argument('--games', type=int, default=1, help='每张牌桌打几局，0 表示一直打到 Ctrl+C')
+    parser.add_argument('--policy', default='rule', choices=sorted(POLICIES))
+    parser.add_argument('--prefix', default='bots', help='牌桌 id 前缀（牌桌为 <prefix>-<序号>）')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--connections', type=int, default=None,
+                        help='连接池大小（默认为 Agent 数 + 牌桌数 + 16）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(message)s')
+    asyncio.run(_main(args))
@@ -0,0 +1,599 @@
+"""
+掼蛋游戏服务器 - asyncio 模式（aiohttp）
+
+与 server.py 提供相同的路由和响应，牌桌、游戏逻辑、事件广播和指标都复用 server.py / engine.py：
+- 长轮询、SSE 事件流、WebSocket 都是协程，不占线程；空闲连接只占一个协程和一个有界队列
+- 所有请求在同一个事件循环线程里处理，牌桌的锁不会有竞争，持有时间只是一次引擎调用
+
+用法:
+    pip install aiohttp
+    python async_server.py --port 5000
+
+上万个长连接时需要调高文件描述符上限（ulimit -n）。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from aiohttp import web, WSMsgType
+
+import codec
+import server
+from server import (DEFAULT_GAME_ID, SSE_HEARTBEAT_INTERVAL, LONG_POLL_MAX_WAIT, BASE_DIR,
+                    HTTP_REQUESTS, HTTP_LATENCY, GameTable, SeatChannel, metrics, registry)
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+logger = logging.getLogger('guandan.async_server')
+
+
+class AsyncSubscriber:
+    """事件流订阅者（协程读取）；接口同 event_broker.Subscriber"""
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def offer(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def get(self, timeout):
+        """取下一条消息；超时返回 b''，连接应结束时返回 None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return b''
+
+    def close(self):
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+
+
+class AsyncGameTable(GameTable):
+    """在事件循环里使用的牌桌：等待状态变化用 future 而不是 Condition"""
+    subscriber_class = AsyncSubscriber
+
+    def __init__(self, game_id):
+        super().__init__(game_id)
+        self._waiters = set()
+
+    def _notify(self):
+        super()._notify()
+        waiters, self._waiters = self._waiters, set()
+        for future in waiters:
+            if not future.done():
+                future.set_result(None)
+
+    async def wait_until(self, ready, timeout):
+        """等到 ready() 为真或超时，返回 ready() 的结果"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not ready():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            future = loop.create_future()
+            self._waiters.add(future)
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiters.discard(future)
+        return True
+
+
+class AsyncSeatChannel(SeatChannel):
+    """
+    座位的 WebSocket 通道（协议同 SeatChannel）
+    消息处理和编码沿用 SeatChannel，发送经由队列交给写协程，推送由协程等待状态变化
+    """
+    def __init__(self, ws, table, player_id, mimetype=codec.JSON):
+        super().__init__(ws, table, player_id, mimetype)
+        self.outbox = asyncio.Queue()
+
+    def _send(self, data):
+        self.outbox.put_nowait(data)
+
+    async def _writer(self):
+        while True:
+            data = await self.outbox.get()
+            if data is None:
+                await self.ws.close()
+                return
+            if self.mimetype == codec.JSON:
+                await self.ws.send_str(data.decode('utf-8'))
+            else:
+                await self.ws.send_bytes(data)
+
+    async def _pusher(self):
+        table = self.table
+
+        def changed():
+            return (self.closed or table.closed
+                    or (table.game_state is not None and table.game_state.version != self.version))
+
+        while not self.closed:
+            if not await table.wait_until(changed, SSE_HEARTBEAT_INTERVAL):
+                continue
+            if self.closed:
+                return
+            if table.closed:
+                self._reply({'type': 'closed', 'gameId': table.id})
+                self.outbox.put_nowait(None)
+                return
+            with table.lock:
+                self._send(self._turn_message())
+
+    async def serve_async(self):
+        server.WS_CONNECTIONS.inc()
+        writer = asyncio.create_task(self._writer())
+        pusher = asyncio.create_task(self._pusher())
+        try:
+            async for message in self.ws:
+                if message.type in (WSMsgType.TEXT, WSMsgType.BINARY):
+                    self._handle(message.data)
+                if writer.done():
+                    break
+        finally:
+            self.closed = True
+            pusher.cancel()
+            self.outbox.put_nowait(None)
+            try:
+                await writer
+            except (ConnectionResetError, RuntimeError):
+                pass
+            server.WS_CONNECTIONS.dec()
+
+
+# 复用 server.py 的全局注册表（/metrics 的牌桌、连接数 gauge 读的是它），牌桌换成 asyncio 版本
+registry.table_class = AsyncGameTable
+
+routes = web.RouteTableDef()
+
+
+@web.middleware
+async def observe_request(request, handler):
+    """请求数和耗时（流式响应只计到开始推流）；路由模板做标签"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else 'unmatched'
+        elapsed = request.get('stream_started', time.perf_counter()) - start
+        HTTP_LATENCY.labels(route, request.method).observe(elapsed)
+        HTTP_REQUESTS.labels(route, request.method, status).inc()
+
+
+def _json(obj, status=200):
+    return web.Response(body=codec.encode_json(obj), status=status, content_type=codec.JSON)
+
+
+def _game_id(request):
+    return request.match_info.get('game_id', DEFAULT_GAME_ID)
+
+
+def _player_id(request):
+    return int(request.match_info['player_id'])
+
+
+def _lookup_table(game_id):
+    if game_id == DEFAULT_GAME_ID:
+        return registry.get_or_create(game_id)
+    return registry.get(game_id)
+
+
+def _table_or_error(game_id, require_started=False):
+    table = registry.get(game_id)
+    if table is None:
+        return None, _json({'error': '牌桌不存在'}, 404)
+    if not table.game_state or (require_started and not table.game_state.started):
+        return None, _json({'error': '游戏未开始'}, 400)
+    return table, None
+
+
+def _since_arg(request):
+    since = request.query.get('since')
+    if since is None:
+        return None, None
+    try:
+        return int(since), None
+    except ValueError:
+        return None, _json({'error': 'since 参数无效'}, 400)
+
+
+def _mimetype(request):
+    return codec.negotiate_header(request.headers.get('Accept'))
+
+
+async def _request_data(request):
+    """请求体：MessagePack 或 JSON，解析失败返回 {}"""
+    body = await request.read()
+    try:
+        if request.content_type in codec.MSGPACK_TYPES:
+            data = codec.decode(body, request.content_type)
+        else:
+            data = codec.decode_json(body) if body else None
+    except ValueError:
+        data = None
+    return data if isinstance(data, dict) else {}
+
+
+def _bytes_response(data, mimetype=codec.JSON, status=200):
+    return web.Response(body=data, status=status, content_type=mimetype, headers={'Vary': 'Accept'})
+
+
+def _respond(request, obj, status=200):
+    mimetype = _mimetype(request)
+    return _bytes_response(codec.encode(obj, mimetype), mimetype, status)
+
+
+def _etag_matches(request, etag):
+    return any(tag.value in (etag, '*') for tag in request.if_none_match or ())
+
+
+def _versioned_response(data, etag, mimetype):
+    """带 ETag 的响应；data 为 None 时返回 304"""
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept'}
+    if data is None:
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=data, content_type=mimetype, headers=headers)
+
+
+# API 路由（与 server.py 相同）
+
+@routes.post('/game/tables')
+async def create_table(request):
+    data = await _request_data(request)
+    game_id = data.get('gameId')
+    if game_id is not None and (not isinstance(game_id, str) or not game_id
+                                or '/' in game_id or game_id == 'tables'):
+        return _json({'error': '无效的 gameId'}, 400)
+
+    table = registry.create(game_id)
+    if table is None:
+        return _json({'error': '牌桌已存在'}, 409)
+
+    start_result = table.start() if data.get('start') else None
+    result = table.to_dict()
+    if start_result:
+        result['start'] = start_result
+    return _json(result, 201)
+
+
+@routes.get('/game/tables')
+async def list_tables(request):
+    tables = registry.list()
+    return _json({'total': len(tables), 'tables': tables})
+
+
+@routes.get('/game/tables/{game_id}')
+async def get_table(request):
+    table = registry.get(request.match_info['game_id'])
+    if table is None:
+        return _json({'error': '牌桌不存在'}, 404)
+    return _json(table.to_dict())
+
+
+@routes.delete('/game/tables/{game_id}')
+async def close_table(request):
+    game_id = request.match_info['game_id']
+    if not registry.close(game_id):
+        return _json({'error': '牌桌不存在'}, 404)
+    return _json({'success': True, 'gameId': game_id})
+
+
+@routes.post('/game/start')
+@routes.post('/game/{game_id}/start')
+async def start_game(request):
+    table = _lookup_table(_game_id(request))
+    if table is None:
+        return _json({'error': '牌桌不存在'}, 404)
+    result = table.start()
+    result['gameId'] = table.id
+    return _json(result)
+
+
+@routes.get(r'/game/player/{player_id:\d+}/hand')
+@routes.get(r'/game/{game_id}/player/{player_id:\d+}/hand')
+async def get_player_hand(request):
+    table, error = _table_or_error(_game_id(request), require_started=True)
+    if error:
+        return error
+    player_id = _player_id(request)
+    if not table.seat_readable(player_id, _seat_token(request)):
+        return _json({'error': '座位令牌无效'}, 403)
+    mimetype = _mimetype(request)
+    with table.lock:
+        state = table.game_state
+        if not 0 <= player_id < len(state.players):
+            return _json({'error': '玩家不存在'}, 404)
+
+        def build():
+            hand = state.get_player_hand(player_id)
+            return {'playerId': player_id, 'cardCount': len(hand), 'cards': hand}
+        data = table.payload(f'hand{player_id}', build, mimetype)
+    return _bytes_response(data, mimetype)
+
+
+@routes.post('/game/play')
+@routes.post('/game/{game_id}/play')
+async def play(request):
+    table, error = _table_or_error(_game_id(request), require_started=True)
+    if error:
+        return error
+    data = await _request_data(request)
+    player_id = data.get('playerId')
+    cards = data.get('cards', [])
+    if player_id is None:
+        return _json({'error': 'playerId 必须'}, 400)
+    if not isinstance(cards, list):
+        return _json({'error': 'cards 必须是列表'}, 400)
+    return _respond(request, table.play(player_id, cards))
+
+
+@routes.post('/game/pass')
+@routes.post('/game/{game_id}/pass')
+async def pass_turn(request):
+    table, error = _table_or_error(_game_id(request), require_started=True)
+    if error:
+        return error
+    data = await _request_data(request)
+    player_id = data.get('playerId')
+    if player_id is None:
+        return _json({'error': 'playerId 必须'}, 400)
+    return _respond(request, table.pass_turn(player_id))
+
+
+async def _event_stream(request, broker, connected):
+    """SSE 事件流：一个协程 + 一个有界队列；connected 为第一条连接确认事件"""
+    last_event_id = server._last_event_id(request.headers.get('Last-Event-ID')
+                                          or request.query.get('lastEventId'))
+    heartbeat = server._heartbeat_interval(request.query.get('heartbeat'))
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    await response.prepare(request)
+    request['stream_started'] = time.perf_counter()
+
+    sub = broker.subscribe(last_event_id)
+    try:
+        await response.write(f"data: {json.dumps(connected)}\n\n".encode('utf-8'))
+        while True:
+            payload = await sub.get(heartbeat)
+            if payload is None:
+                break
+            await response.write(payload or b": heartbeat\n\n")
+    except (ConnectionResetError, asyncio.CancelledError):
+        pass
+    finally:
+        broker.unsubscribe(sub)
+    return response
+
+
+@routes.get('/game/events')
+@routes.get('/game/{game_id}/events')
+async def game_events(request):
+    table = _lookup_table(_game_id(request))
+    if table is None:
+        return _json({'error': '牌桌不存在'}, 404)
+    return await _event_stream(request, table.broker, {'type': 'connected', 'gameId': table.id})
+
+
+def _seat_token(request):
+    return request.headers.get('X-Seat-Token') or request.query.get('token')
+
+
+@routes.post(r'/game/seats/{player_id:\d+}/claim')
+@routes.post(r'/game/{game_id}/seats/{player_id:\d+}/claim')
+async def claim_seat(request):
+    table = _lookup_table(_game_id(request))
+    if table is None:
+        return _json({'error': '牌桌不存在'}, 404)
+    player_id = _player_id(request)
+    if not 0 <= player_id < 4:
+        return _json({'error': '玩家不存在'}, 404)
+    token = table.claim_seat(player_id)
+    if token is None:
+        return _json({'error': '座位已被认领'}, 409)
+    return _json({'gameId': table.id, 'playerId': player_id, 'token': token})
+
+
+@routes.delete(r'/game/seats/{player_id:\d+}')
+@routes.delete(r'/game/{game_id}/seats/{player_id:\d+}')
+async def release_seat(request):
+    table = registry.get(_game_id(request))
+    if table is None:
+        return _json({'error': '牌桌不存在'}, 404)
+    player_id = _player_id(request)
+    if not table.release_seat(player_id, _seat_token(request)):
+        return _json({'error': '座位令牌无效'}, 403)
+    return _json({'success': True, 'gameId': table.id, 'playerId': player_id})
+
+
+@routes.get(r'/game/seats/{player_id:\d+}/events')
+@routes.get(r'/game/{game_id}/seats/{player_id:\d+}/events')
+async def seat_events(request):
+    """座位的私有事件流（见 server.seat_events）"""
+    table = registry.get(_game_id(request))
+    if table is None:
+        return _json({'error': '牌桌不存在'}, 404)
+    player_id = _player_id(request)
+    broker = table.seat_brokers.get(player_id) if table.seat_authorized(player_id, _seat_token(request)) else None
+    if broker is None:
+        return _json({'error': '座位令牌无效'}, 403)
+    return await _event_stream(request, broker, {'type': 'connected', 'gameId': table.id, 'playerId': player_id})
+
+
+@routes.get(r'/game/ws/{player_id:\d+}')
+@routes.get(r'/game/{game_id}/ws/{player_id:\d+}')
+async def seat_socket(request):
+    """座位的 WebSocket 通道（协议见 server.SeatChannel）"""
+    mimetype = codec.JSON
+    if request.query.get('encoding') == 'msgpack' and codec.msgpack_available():
+        mimetype = codec.MSGPACK
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    request['stream_started'] = time.perf_counter()
+
+    table = _lookup_table(_game_id(request))
+    player_id = _player_id(request)
+    error = server._seat_socket_error(table, player_id, _seat_token(request))
+    if error:
+        channel = AsyncSeatChannel(ws, table, player_id, mimetype)
+        channel._reply({'type': 'error', 'message': error})
+        channel.outbox.put_nowait(None)
+        await channel._writer()
+        await ws.close()
+        return ws
+    await AsyncSeatChannel(ws, table, player_id, mimetype).serve_async()
+    return ws
+
+
+@routes.get('/game/state')
+@routes.get('/game/{game_id}/state')
+async def get_state(request):
+    since, error = _since_arg(request)
+    if error:
+        return error
+    table, error = _table_or_error(_game_id(request))
+    if error:
+        return error
+
+    mimetype = _mimetype(request)
+    with table.lock:
+        state = table.game_state
+        delta = state.can_delta(since)
+        etag = table.etag('state', since if delta else None, mimetype)
+        if _etag_matches(request, etag):
+            data = None
+        elif delta:
+            data = table.payload(f'state-since{since}', lambda: state.get_state_delta(since), mimetype)
+        else:
+            data = table.payload('state', state.get_state, mimetype)
+    return _versioned_response(data, etag, mimetype)
+
+
+@routes.get(r'/game/turn/{player_id:\d+}')
+@routes.get(r'/game/{game_id}/turn/{player_id:\d+}')
+async def get_turn(request):
+    """回合信息；?wait= 长轮询时挂起的是协程"""
+    since, error = _since_arg(request)
+    if error:
+        return error
+    try:
+        wait = min(float(request.query.get('wait', 0)), LONG_POLL_MAX_WAIT)
+    except ValueError:
+        return _json({'error': 'wait 参数无效'}, 400)
+
+    game_id = _game_id(request)
+    player_id = _player_id(request)
+    if wait > 0:
+        table = _lookup_table(game_id)
+        if table is None:
+            return _json({'error': '牌桌不存在'}, 404)
+        if not table.seat_readable(player_id, _seat_token(request)):
+            return _json({'error': '座位令牌无效'}, 403)
+        await table.wait_until(lambda: table.turn_ready(player_id, since), wait)
+
+    table, error = _table_or_error(game_id)
+    if error:
+        return error
+    if not table.seat_readable(player_id, _seat_token(request)):
+        return _json({'error': '座位令牌无效'}, 403)
+
+    mimetype = _mimetype(request)
+    with table.lock:
+        state = table.game_state
+        delta = state.can_delta(since)
+        etag = table.etag(f'turn{player_id}', since if delta else None, mimetype)
+        if _etag_matches(request, etag):
+            data = None
+        elif delta:
+            data = table.payload(f'turn{player_id}-since{since}',
+                                 lambda: state.get_turn_info_delta(player_id, since), mimetype)
+        else:
+            data = table.payload(f'turn{player_id}', lambda: state.get_turn_info(player_id), mimetype)
+    return _versioned_response(data, etag, mimetype)
+
+
+@routes.get('/game/history')
+@routes.get('/game/{game_id}/history')
+async def get_history(request):
+    table, error = _table_or_error(_game_id(request))
+    if error:
+        return error
+    mimetype = _mimetype(request)
+    with table.lock:
+        history = table.game_state.play_history
+        data = table.payload('history', lambda: {
+            'total': len(history),
+            'history': history
+        }, mimetype)
+    return _bytes_response(data, mimetype)
+
+
+@routes.get('/metrics')
+async def get_metrics(request):
+    return web.Response(body=metrics.render().encode('utf-8'),
+                        headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+
+@routes.get('/health')
+async def health(request):
+    return _json({'status': 'ok'})
+
+
+@routes.get('/')
+async def index(request):
+    return web.FileResponse(os.path.join(BASE_DIR, 'index.html'))
+
+
+@routes.get('/{filename:.+}')
+async def serve_static(request):
+    filepath = os.path.realpath(os.path.join(BASE_DIR, request.match_info['filename']))
+    if filepath.startswith(BASE_DIR + os.sep) and os.path.isfile(filepath):
+        return web.FileResponse(filepath)
+    return _json({'error': '文件未找到'}, 404)
+
+
+def create_app():
+    app = web.Application(middlewares=[observe_request])
+    app.add_routes(routes)
+
+    async def close_tables(app):
+        # 关闭时让事件流和 WebSocket 退出
+        for table in registry.tables():
+            registry.close(table.id)
+    app.on_shutdown.append(close_tables)
+    return app
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='掼蛋游戏服务器（asyncio 模式）')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    web.run_app(create_app(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,442 @@
+"""
+掼蛋批量引擎 - 用 NumPy 数组同时推进 N 局对局（需要安装 numpy）
+
+规则与 engine.GameState.play_faces / pass_turn 完全一致，只是不产生事件、历史和 API 字典:
+    games = BatchGames(10000, level=2)
+    games.deal(seed=42)
+    while not games.done.all():
+        status = games.step(games.greedy_actions())
+
+状态全部是数组（N = 局数，4 = 座位）:
+    faces       (N, 4, 54)  每家手牌的牌面计数（出牌校验、同花顺判断用）
+    ranks       (N, 4, 15)  每家手牌的点数计数，不含逢人配
+    wild        (N, 4)      每家手里的逢人配张数
+    current     (N,)        当前出牌座位
+    last_kind / last_key / last_size / last_power  (N,)  上家牌型，last_kind 为 -1 表示首家出牌
+    last_player (N,)        上家座位，首家出牌为 -1
+    pass_count  (N,)        连续过牌数
+    winner      (N,)        先出完牌的座位，未结束为 -1
+
+动作是 (N, 54) 的牌面计数矩阵，全零行表示过牌；step() 每局执行一步，返回每局的结果码。
+cross_check() 用同样的动作驱动 N 个 GameState，逐步比对两个引擎的结果和状态。
+"""
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError:   # pragma: no cover
+    raise ImportError("batch_engine 需要 numpy: pip install numpy") from None
+
+import rules
+from cards import (
+    NUM_FACES, NUM_RANKS, NUM_CARDS, FACE_RANK, FACE_SUIT, JOKER_SUIT,
+)
+from engine import GameState
+from simulator import DEFAULT_MAX_TURNS
+
+NUM_SEATS = 4
+HAND_SIZE = 27
+
+# step() 的结果码（与 GameState.play_faces 的失败原因一一对应）
+PLAYED = 1
+PASSED = 2
+INACTIVE = 0          # 该局已结束，动作被忽略（GameState: 本局已结束）
+NOT_OWNED = -1        # 你没有这些牌
+INVALID_TYPE = -2     # 无效的牌型
+CANNOT_BEAT = -3      # 无法压过上家的牌
+
+KINDS = list(rules.KIND_ORDER)
+KIND_ID = rules.KIND_ORDER
+NO_KIND = -1
+
+
+def _face_matrices(level):
+    """牌面 -> 点数 / 花色的 0-1 矩阵；逢人配单独计数，不计入点数和花色"""
+    wild = rules.wild_face(level)
+    to_rank = np.zeros((NUM_FACES, NUM_RANKS), dtype=np.int16)
+    to_suit = np.zeros((NUM_FACES, 5), dtype=np.int16)
+    for f in range(NUM_FACES):
+        if f != wild:
+            to_rank[f, FACE_RANK[f]] = 1
+            to_suit[f, FACE_SUIT[f]] = 1
+    return to_rank, to_suit
+
+
+class _LevelTable:
+    """rules.build_table 的数组版：签名排序后二分查找，每个签名的所有解释排成一行"""
+    def __init__(self, level):
+        table, _, straights = rules.level_tables(level)
+        keys = sorted(table)
+        width = max(len(types) for types in table.values())
+        self.level = level
+        self.wild = rules.wild_face(level)
+        self.keys = np.array(keys, dtype=np.int64)
+        # 第 0 列留给同花顺（只有同花时才生效），第 1.. 列按 classify 的顺序排列
+        shape = (len(keys) + 1, width + 1)
+        self.kind = np.full(shape, NO_KIND, dtype=np.int8)
+        self.key = np.zeros(shape, dtype=np.int8)
+        self.size = np.zeros(shape, dtype=np.int8)
+        self.power = np.zeros(shape, dtype=np.int16)
+        for i, sig in enumerate(keys):
+            straight = straights.get(sig)
+            if straight is not None:
+                self.kind[i, 0] = KIND_ID[rules.STRAIGHT_FLUSH]
+                self.key[i, 0] = straight.key
+                self.size[i, 0] = 5
+                self.power[i, 0] = rules.STRAIGHT_FLUSH_POWER
+            for j, t in enumerate(table[sig], start=1):
+                self.kind[i, j] = KIND_ID[t.kind]
+                self.key[i, j] = t.key
+                self.size[i, j] = t.size
+                self.power[i, j] = t.power
+        # 最后一行全空，查不到的签名指向这里
+        self.missing = len(keys)
+        self.rank_units = np.array(rules.RANK_UNIT, dtype=np.int64)
+        self.to_rank, self.to_suit = _face_matrices(level)
+
+    def lookup(self, actions):
+        """每个动作在表中的行号，以及是否同花（除逢人配外同一花色、不含王）"""
+        action_ranks = actions @ self.to_rank
+        sig = action_ranks.astype(np.int64) @ self.rank_units
+        sig += actions[:, self.wild].astype(np.int64) * rules.WILD_UNIT
+        rows = np.searchsorted(self.keys, sig)
+        rows = np.minimum(rows, self.missing)
+        found = self.keys[np.minimum(rows, self.missing - 1)] == sig
+        rows[~found] = self.missing
+        suits = actions @ self.to_suit
+        flush = ((suits[:, :JOKER_SUIT] > 0).sum(axis=1) <= 1) & (suits[:, JOKER_SUIT] == 0)
+        return rows, action_ranks, flush
+
+
+_tables = {}
+
+
+def level_table(level):
+    table = _tables.get(level)
+    if table is None:
+        table = _tables[level] = _LevelTable(level)
+    return table
+
+
+class BatchGames:
+    """N 局同步推进的对局"""
+    def __init__(self, n_games, level=2):
+        self.n = n_games
+        self.level = level
+        self.table = level_table(level)
+        self.order = np.array(rules.rank_order(level), dtype=np.int8)
+        self._index = np.arange(n_games)
+        self.faces = np.zeros((n_games, NUM_SEATS, NUM_FACES), dtype=np.int8)
+        self.ranks = np.zeros((n_games, NUM_SEATS, NUM_RANKS), dtype=np.int8)
+        self.wild = np.zeros((n_games, NUM_SEATS), dtype=np.int8)
+        self.card_counts = np.zeros((n_games, NUM_SEATS), dtype=np.int16)
+        self.current = np.zeros(n_games, dtype=np.int8)
+        self.last_kind = np.full(n_games, NO_KIND, dtype=np.int8)
+        self.last_key = np.zeros(n_games, dtype=np.int8)
+        self.last_size = np.zeros(n_games, dtype=np.int8)
+        self.last_power = np.zeros(n_games, dtype=np.int16)
+        self.last_player = np.full(n_games, -1, dtype=np.int8)
+        self.pass_count = np.zeros(n_games, dtype=np.int8)
+        self.winner = np.full(n_games, -1, dtype=np.int8)
+        self.turns = np.zeros(n_games, dtype=np.int32)
+
+    # ---- 发牌 ----
+
+    def deal(self, seed=None):
+        """所有对局同时洗牌发牌（每局一个随机排列），座位 0 先出"""
+        gen = np.random.default_rng(seed)
+        decks = np.argsort(gen.random((self.n, NUM_CARDS)), axis=1) % NUM_FACES
+        faces = np.zeros((self.n, NUM_SEATS, NUM_FACES), dtype=np.int8)
+        seats = np.repeat(np.arange(NUM_SEATS), HAND_SIZE)
+        for seat in range(NUM_SEATS):
+            dealt = decks[:, seats == seat]
+            np.add.at(faces, (self._index[:, None], seat, dealt), 1)
+        self.set_hands(faces)
+
+    def set_hands(self, faces):
+        """直接设置每家手牌 (N, 4, 54) 并重置对局状态"""
+        self.faces[...] = faces
+        self.ranks[...] = faces @ self.table.to_rank
+        self.wild[...] = faces[:, :, self.table.wild]
+        self.card_counts[...] = faces.sum(axis=2)
+        self.current[:] = 0
+        self.last_kind[:] = NO_KIND
+        self.last_player[:] = -1
+        self.pass_count[:] = 0
+        self.winner[:] = -1
+        self.turns[:] = 0
+
+    @property
+    def done(self):
+        return self.winner >= 0
+
+    # ---- 一步 ----
+
+    def _pick(self, rows, flush):
+        """rules.pick 的数组版：返回选中的列（-1 表示没有可用的解释）"""
+        t = self.table
+        kind = t.kind[rows]
+        key = t.key[rows]
+        size = t.size[rows]
+        power = t.power[rows]
+        # 同花顺只在同花时有效
+        kind[~flush, 0] = NO_KIND
+        valid = kind != NO_KIND
+
+        leading = (self.last_kind == NO_KIND)[:, None]
+        last_kind = self.last_kind[:, None]
+        last_key = self.last_key[:, None]
+        last_power = self.last_power[:, None]
+        same = (valid & (power == 0) & (kind == last_kind)
+                & (size == self.last_size[:, None]) & (key > last_key))
+        bomb = valid & (power > 0) & ((last_power == 0) | (power > last_power)
+                                      | ((power == last_power) & (key > last_key)))
+        # 首家取最大的解释（第一个有效列）；跟牌先取同牌型，再取炸弹
+        candidates = np.where(leading, valid, same)
+        col = np.where(candidates.any(axis=1), candidates.argmax(axis=1), -1)
+        use_bomb = (col < 0) & ~leading[:, 0] & bomb.any(axis=1)
+        col[use_bomb] = bomb[use_bomb].argmax(axis=1)
+        return col, kind, key, size, power
+
+    def step(self, actions):
+        """
+        每局执行一步：actions (N, 54) 为当前座位要出的牌面计数，全零表示过牌
+        返回每局的结果码（PLAYED / PASSED / INACTIVE / NOT_OWNED / INVALID_TYPE / CANNOT_BEAT）
+        出牌失败的对局状态不变（与 GameState 返回 success=False 一致）
+        """
+        actions = np.asarray(actions, dtype=np.int8)
+        idx = self._index
+        seat = self.current
+        active = self.winner < 0
+        n_cards = actions.sum(axis=1, dtype=np.int16)
+        passing = active & (n_cards == 0)
+        playing = active & (n_cards > 0)
+
+        status = np.zeros(self.n, dtype=np.int8)
+        hands = self.faces[idx, seat]
+        owned = (actions <= hands).all(axis=1)
+        rows, action_ranks, flush = self.table.lookup(actions)
+        col, kind, key, size, power = self._pick(rows, flush)
+        status[playing & ~owned] = NOT_OWNED
+        playing &= owned
+        status[playing & (rows == self.table.missing)] = INVALID_TYPE
+        status[playing & (rows != self.table.missing) & (col < 0)] = CANNOT_BEAT
+        playing &= col >= 0
+
+        # 出牌
+        p = np.nonzero(playing)[0]
+        if len(p):
+            s = seat[p]
+            c = col[p]
+            self.faces[p, s] -= actions[p]
+            self.ranks[p, s] -= action_ranks[p].astype(np.int8)
+            self.wild[p, s] -= actions[p, self.table.wild]
+            self.card_counts[p, s] -= n_cards[p]
+            self.last_kind[p] = kind[p, c]
+            self.last_key[p] = key[p, c]
+            self.last_size[p] = size[p, c]
+            self.last_power[p] = power[p, c]
+            self.last_player[p] = s
+            self.pass_count[p] = 0
+            won = p[self.card_counts[p, s] == 0]
+            self.winner[won] = seat[won]
+            status[p] = PLAYED
+
+        # 过牌：连续 3 家过牌后新一轮开始
+        q = np.nonzero(passing)[0]
+        if len(q):
+            self.pass_count[q] += 1
+            reset = q[self.pass_count[q] >= 3]
+            self.last_kind[reset] = NO_KIND
+            self.last_player[reset] = -1
+            self.pass_count[reset] = 0
+            status[q] = PASSED
+
+        # 获胜的对局座位不再轮转（与 GameState 一致）
+        advance = (status == PASSED) | ((status == PLAYED) & (self.winner < 0))
+        self.current[advance] = (self.current[advance] + 1) % NUM_SEATS
+        self.turns[status > 0] += 1
+        return status
+
+    # ---- 批量策略 ----
+
+    def greedy_actions(self):
+        """
+        全数组的简单策略（不逐局调用 Python）：
+        首家出最小点数的全部自然牌（单/对/三/炸）；跟单/对/三时用最小的能压过的点数，否则过牌；
+        手里只剩逢人配时出一张逢人配
+        """
+        idx = self._index
+        seat = self.current
+        ranks = self.ranks[idx, seat].astype(np.int16)      # (N, 15)
+        order = self.order.astype(np.int16)[None, :]
+        big = np.int16(100)
+
+        leading = self.last_kind == NO_KIND
+        lead_rank = np.where(ranks > 0, order, big).argmin(axis=1)
+        lead_count = ranks[idx, lead_rank]
+
+        need = self.last_size.astype(np.int16)[:, None]
+        simple = np.isin(self.last_kind, [KIND_ID[rules.SINGLE], KIND_ID[rules.PAIR], KIND_ID[rules.TRIPLE]])
+        fits = (ranks >= need) & (order > self.last_key.astype(np.int16)[:, None])
+        if fits.shape[1] > 13:
+            # 王只能单出或成对出
+            fits[:, 13:] &= need <= 2
+        follow_ok = simple & fits.any(axis=1)
+        follow_rank = np.where(fits, order, big).argmin(axis=1)
+
+        rank = np.where(leading, lead_rank, follow_rank)
+        count = np.where(leading, lead_count, self.last_size.astype(np.int16))
+        count = np.where(leading | follow_ok, count, 0)
+        actions = self.take(rank, count)
+
+        # 只剩逢人配：首家出一张
+        only_wild = leading & (count == 0) & (self.wild[idx, seat] > 0)
+        actions[only_wild, self.table.wild] = 1
+        return actions
+
+    def take(self, rank, count):
+        """从当前座位手里取 count 张点数为 rank 的自然牌（按花色顺序），返回 (N, 54) 动作"""
+        idx = self._index
+        hands = self.faces[idx, self.current]
+        cols = _RANK_FACE_COLS[rank]                         # (N, 4)，不足 4 个牌面的点数用 NUM_FACES 补齐
+        padded = np.concatenate([hands, np.zeros((self.n, 1), dtype=np.int8)], axis=1)
+        have = padded[idx[:, None], cols].astype(np.int16)
+        have[cols == self.table.wild] = 0
+        before = np.cumsum(have, axis=1) - have
+        take = np.clip(count[:, None] - before, 0, have).astype(np.int8)
+        actions = np.zeros((self.n, NUM_FACES + 1), dtype=np.int8)
+        np.add.at(actions, (idx[:, None], cols), take)
+        return actions[:, :NUM_FACES]
+
+    def play_out(self, max_turns=DEFAULT_MAX_TURNS):
+        """用 greedy_actions 把所有对局下完，返回总步数"""
+        steps = 0
+        while not self.done.all() and steps < max_turns:
+            self.step(self.greedy_actions())
+            steps += 1
+        return steps
+
+    def hand_type(self, i):
+        """第 i 局上家牌型（rules.HandType），首家出牌为 None"""
+        if self.last_kind[i] == NO_KIND:
+            return None
+        return rules.HandType(KINDS[self.last_kind[i]], int(self.last_key[i]),
+                              int(self.last_size[i]), int(self.last_power[i]))
+
+
+_RANK_FACE_COLS = np.full((NUM_RANKS, 4), NUM_FACES, dtype=np.int64)
+for _r, _faces in enumerate(rules.RANK_FACES):
+    _RANK_FACE_COLS[_r, :len(_faces)] = _faces
+
+
+# ---------------------------------------------------------------------------
+# 与标量引擎交叉校验
+# ---------------------------------------------------------------------------
+
+_STATUS_MESSAGES = {
+    NOT_OWNED: '你没有这些牌',
+    INVALID_TYPE: '无效的牌型',
+    CANNOT_BEAT: '无法压过上家的牌',
+    INACTIVE: '本局已结束',
+}
+
+
+def _random_action(state, rng):
+    """交叉校验用的动作：大多是合法出法，也有过牌、随手乱出和不在手里的牌"""
+    seat = state.current_player_id
+    player = state.players[seat]
+    roll = rng.random()
+    if roll < 0.15:
+        return []
+    if roll < 0.3:
+        hand = [f for f in range(NUM_FACES) for _ in range(player.counts[f])]
+        return rng.sample(hand, min(len(hand), rng.randint(1, 6)))
+    if roll < 0.35:
+        return [rng.randrange(NUM_FACES) for _ in range(rng.randint(1, 3))]
+    moves = state.legal_moves(seat)
+    return list(rng.choice(moves).faces) if moves else []
+
+
+def cross_check(n_games=200, seed=0, level=2, max_steps=3000):
+    """
+    N 局同时用两个引擎推进，每一步给两边同样的动作，比对结果码和完整状态
+    返回比对过的步数；发现不一致时抛出 AssertionError
+    """
+    rng = random.Random(seed)
+    states = []
+    for i in range(n_games):
+        state = GameState(rng=random.Random(rng.randrange(2 ** 32)))
+        state.current_level = level
+        state.start_game()
+        states.append(state)
+    batch = BatchGames(n_games, level=level)
+    batch.set_hands(np.array([[p.counts for p in s.players] for s in states], dtype=np.int8))
+
+    checked = 0
+    for step in range(max_steps):
+        if batch.done.all():
+            break
+        actions = np.zeros((n_games, NUM_FACES), dtype=np.int8)
+        expected = []
+        for i, state in enumerate(states):
+            faces = _random_action(state, rng) if state.winner_id is None else []
+            for f in faces:
+                actions[i, f] += 1
+            if state.winner_id is not None:
+                expected.append((False, '本局已结束'))
+                continue
+            seat = state.current_player_id
+            result = state.play_faces(seat, faces) if faces else state.pass_turn(seat)
+            expected.append((result['success'], result.get('message')))
+        status = batch.step(actions)
+        for i, state in enumerate(states):
+            ok, message = expected[i]
+            code = int(status[i])
+            if ok != (code > 0) or (not ok and _STATUS_MESSAGES.get(code) != message):
+                raise AssertionError(f"第 {i} 局第 {step} 步结果不一致: 标量={message} 批量={code}")
+            _compare_state(batch, i, state, step)
+            checked += 1
+    return checked
+
+
+def _compare_state(batch, i, state, step):
+    where = f"第 {i} 局第 {step} 步"
+    counts = [p.counts for p in state.players]
+    assert (batch.faces[i] == np.array(counts)).all(), f"{where} 手牌不一致"
+    assert [int(x) for x in batch.card_counts[i]] == [p.card_count for p in state.players], f"{where} 牌数不一致"
+    assert (batch.ranks[i] == np.array(counts) @ batch.table.to_rank).all(), f"{where} 点数计数不一致"
+    assert int(batch.current[i]) == state.current_player_id, f"{where} 当前座位不一致"
+    assert int(batch.pass_count[i]) == state.pass_count, f"{where} 过牌数不一致"
+    assert batch.hand_type(i) == state.last_hand_type, f"{where} 上家牌型不一致"
+    last_player = state.last_play['playerId'] if state.last_play else -1
+    assert int(batch.last_player[i]) == last_player, f"{where} 上家座位不一致"
+    winner = -1 if state.winner_id is None else state.winner_id
+    assert int(batch.winner[i]) == winner, f"{where} 胜者不一致"
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='掼蛋 NumPy 批量引擎')
+    parser.add_argument('--games', type=int, default=10000, help='同时进行的对局数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--level', type=int, default=2, help='级牌（2..14）')
+    parser.add_argument('--check', type=int, metavar='N', help='与 GameState 交叉校验 N 局后退出')
+    args = parser.parse_args()
+
+    if args.check:
+        start = time.perf_counter()
+        steps = cross_check(args.check, seed=args.seed, level=args.level)
+        print(f"交叉校验通过: {args.check} 局，{steps} 步，用时 {time.perf_counter() - start:.1f}s")
+    else:
+        games = BatchGames(args.games, level=args.level)
+        start = time.perf_counter()
+        games.deal(seed=args.seed)
+        games.play_out()
+        elapsed = time.perf_counter() - start
+        turns = int(games.turns.sum())
+        print(f"{args.games} 局，{turns} 回合，用时 {elapsed:.2f}s"
+              f"（{turns / elapsed:.0f} 回合/秒，{args.games / elapsed:.0f} 局/秒），"
+              f"未结束 {int((~games.done).sum())}")
@@ -0,0 +1,399 @@
+"""
+掼蛋性能基准 - 引擎、序列化和 HTTP 热点路径
+
+用法:
+    python bench.py                               # 跑全部基准，结果写入 bench-results.json
+    python bench.py --filter http --out new.json  # 只跑名字包含 http 的基准
+    python bench.py --compare baseline.json       # 与基线比较，变慢超过阈值时返回非零退出码
+
+每个基准先自动确定迭代次数（单轮至少 --min-time 秒），再跑 --repeat 轮，记录每次操作的耗时（纳秒）。
+输入数据全部由固定种子生成，同一台机器上多次运行结果可比。比较时使用各轮的中位数。
+"""
+import gc
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import rules
+from cards import face_to_dict
+from engine import Player, GameState
+from simulator import Simulator, TurnView, greedy_policy
+
+SEED = 20240601
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_OUT = 'bench-results.json'
+CACHE_STATS_GAMES = 50
+BENCH_TABLE_ID = 'bench'
+
+# 名字 -> setup 函数；setup() 返回一个无参函数，每调用一次算一次操作
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _started_game(seed=SEED, turns=20):
+    """一局打了 turns 回合的对局（牌桌上有出牌记录和上家牌型）"""
+    state = GameState(rng=random.Random(seed))
+    state.start_game()
+    rng = random.Random(seed)
+    for _ in range(turns):
+        seat = state.current_player_id
+        moves = state.legal_moves(seat)
+        if moves and (state.last_hand_type is None or rng.random() < 0.5):
+            state.play_faces(seat, rng.choice(moves).faces)
+        else:
+            state.pass_turn(seat)
+    return state
+
+
+def _sample_plays(n=64, seed=SEED):
+    """各种牌型的出牌（API 牌字典），也包含少量不合法的组合"""
+    rng = random.Random(seed)
+    plays = []
+    while len(plays) < n:
+        state = GameState(rng=random.Random(rng.randrange(2 ** 32)))
+        state.start_game()
+        counts = state.players[0].counts
+        moves = rules.legal_moves(counts, None, state.current_level)
+        for move in rng.sample(moves, min(len(moves), 8)):
+            plays.append([face_to_dict(f) for f in move.faces])
+        hand = state.players[0].hand_dicts()
+        plays.append(rng.sample(hand, 4))
+    return plays[:n]
+
+
+# ---- 引擎 ----
+
+@benchmark('engine.validate_card_type')
+def bench_validate_card_type():
+    state = GameState()
+    plays = _sample_plays()
+    n = len(plays)
+    i = 0
+
+    def op():
+        nonlocal i
+        state.validate_card_type(plays[i % n])
+        i += 1
+    return op
+
+
+@benchmark('engine.can_beat')
+def bench_can_beat():
+    state = _started_game()
+    plays = _sample_plays()
+    last_play = {'cardType': rules.type_to_dict(rules.HandType(rules.PAIR, 5, 2, 0))}
+    n = len(plays)
+    i = 0
+
+    def op():
+        nonlocal i
+        cards = plays[i % n]
+        state.can_beat(cards, state.validate_card_type(cards), last_play)
+        i += 1
+    return op
+
+
+@benchmark('player.has_cards')
+def bench_has_cards():
+    state = GameState(rng=random.Random(SEED))
+    state.start_game()
+    player = state.players[0]
+    rng = random.Random(SEED)
+    hand = player.hand_dicts()
+    subsets = [rng.sample(hand, rng.randint(1, 8)) for _ in range(64)]
+    i = 0
+
+    def op():
+        nonlocal i
+        player.has_cards(subsets[i % 64])
+        i += 1
+    return op
+
+
+@benchmark('player.remove_card')
+def bench_remove_card():
+    # 移除一张牌后再放回，保持手牌不变（包含 add_card 的开销）
+    state = GameState(rng=random.Random(SEED))
+    state.start_game()
+    player = state.players[0]
+    hand = player.hand_dicts()
+    cards = player.cards
+    n = len(hand)
+    i = 0
+
+    def op():
+        nonlocal i
+        k = i % n
+        player.remove_card(hand[k])
+        player.add_card(cards[k])
+        i += 1
+    return op
+
+
+@benchmark('engine.deal')
+def bench_deal():
+    # _create_deck + 洗牌 + 发牌 + sort_cards
+    state = GameState(rng=random.Random(SEED))
+    players = [Player(i, str(i)) for i in range(4)]
+
+    def op():
+        deck = state._create_deck()
+        state.rng.shuffle(deck)
+        for i, player in enumerate(players):
+            player.set_faces(c % 54 for c in deck[i * 27:(i + 1) * 27])
+            player.sort_cards()
+    return op
+
+
+@benchmark('engine.get_state')
+def bench_get_state():
+    state = _started_game()
+    return state.get_state
+
+
+@benchmark('engine.get_turn_info')
+def bench_get_turn_info():
+    state = _started_game()
+    return lambda: state.get_turn_info(1)
+
+
+@benchmark('json.turn_info')
+def bench_turn_info_json():
+    state = _started_game()
+    return lambda: json.dumps(state.get_turn_info(1))
+
+
+@benchmark('rules.legal_moves')
+def bench_legal_moves():
+    # 跳过缓存，测量完整的出法枚举
+    state = _started_game()
+    counts = state.players[state.current_player_id].counts
+    return lambda: rules._legal_moves.__wrapped__(tuple(counts), state.last_hand_type, state.current_level)
+
+
+# ---- HTTP（Flask 测试客户端，不经过网络） ----
+
+def _http_table():
+    import server
+    table = server.registry.get(BENCH_TABLE_ID) or server.registry.create(BENCH_TABLE_ID)
+    return server.app.test_client(), table
+
+
+def _recorded_game(seed):
+    """用 greedy 策略跑一局，记录每一步 (座位, 牌字典列表)，空列表为过牌"""
+    steps = []
+    state = GameState(rng=random.Random(seed))
+    state.start_game()
+    while state.winner_id is None:
+        seat = state.current_player_id
+        last_player = state.last_play['playerId'] if state.last_play else None
+        view = TurnView(seat, state.players[seat].counts, state.last_hand_type, last_player,
+                        state.current_level, [p.card_count for p in state.players], state.pass_count)
+        move = greedy_policy(view, None)
+        if move is None:
+            state.pass_turn(seat)
+            steps.append((seat, []))
+        else:
+            state.play_faces(seat, move.faces)
+            steps.append((seat, [face_to_dict(f) for f in move.faces]))
+    return steps
+
+
+@benchmark('http.play')
+def bench_http_play():
+    # 按录好的一局依次请求 /play（过牌请求 /pass），打完后用同一种子重开
+    client, table = _http_table()
+    steps = _recorded_game(SEED)
+    base = f'/game/{BENCH_TABLE_ID}'
+    k = len(steps)
+
+    def op():
+        nonlocal k
+        if k == len(steps):
+            table.start(rng=random.Random(SEED))
+            k = 0
+        seat, cards = steps[k]
+        if cards:
+            resp = client.post(f'{base}/play', json={'playerId': seat, 'cards': cards})
+        else:
+            resp = client.post(f'{base}/pass', json={'playerId': seat})
+        if not resp.get_json()['success']:
+            raise RuntimeError(f"回放失败: {resp.get_json()}")
+        k += 1
+    return op
+
+
+@benchmark('http.turn')
+def bench_http_turn():
+    client, table = _http_table()
+    table.start(rng=random.Random(SEED))
+    url = f'/game/{BENCH_TABLE_ID}/turn/1'
+    return lambda: client.get(url).get_json()
+
+
+@benchmark('http.turn.msgpack')
+def bench_http_turn_msgpack():
+    import codec
+    if not codec.msgpack_available():
+        raise RuntimeError('需要安装 msgpack')
+    client, table = _http_table()
+    table.start(rng=random.Random(SEED))
+    url = f'/game/{BENCH_TABLE_ID}/turn/1'
+    headers = {'Accept': codec.MSGPACK}
+    return lambda: codec.decode(client.get(url, headers=headers).data, codec.MSGPACK)
+
+
+# ---- 运行与比较 ----
+
+def measure(op, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME):
+    """返回 (每轮迭代次数, [每轮每次操作的纳秒数])；计时期间关闭 GC（与 timeit 相同）"""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _measure(op, repeat, min_time)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _measure(op, repeat, min_time):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 4 or number >= 1 << 24:
+            break
+        number *= 4
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        samples.append((time.perf_counter() - start) * 1e9 / number)
+    return number, samples
+
+
+def legal_moves_cache_stats(games=CACHE_STATS_GAMES, seed=SEED):
+    """清空 rules.legal_moves 的缓存，用 greedy 策略跑 games 局，返回缓存的命中情况"""
+    rules._legal_moves.cache_clear()
+    for _ in Simulator([greedy_policy] * 4, seed=seed).run(games):
+        pass
+    info = rules._legal_moves.cache_info()
+    return {
+        'games': games,
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': info.hits / max(1, info.hits + info.misses),
+        'maxsize': info.maxsize,
+        'currsize': info.currsize,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(names, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME):
+    results = {}
+    for name in names:
+        op = BENCHMARKS[name]()
+        number, samples = measure(op, repeat, min_time)
+        results[name] = {
+            'median_ns': statistics.median(samples),
+            'min_ns': min(samples),
+            'stdev_ns': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            'iterations': number,
+            'repeat': repeat,
+        }
+        print(f"{name:<28} {results[name]['median_ns'] / 1000:12.2f} µs/op  "
+              f"(min {results[name]['min_ns'] / 1000:.2f}, {number} x {repeat})", flush=True)
+    cache = legal_moves_cache_stats()
+    print(f"rules.legal_moves 缓存: {cache['games']} 局命中率 {cache['hit_rate']:.1%} "
+          f"({cache['hits']} / {cache['hits'] + cache['misses']}，{cache['currsize']} / {cache['maxsize']} 项)", flush=True)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+        'cache': cache,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """打印对比表，返回变慢超过阈值的基准名列表"""
+    regressions = []
+    base_results = baseline.get('results', {})
+    print(f"\n与基线比较（{baseline.get('meta', {}).get('commit') or '?'}，阈值 {threshold:.0%}）:")
+    for name, result in current['results'].items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"  {name:<28} 新增")
+            continue
+        ratio = result['median_ns'] / base['median_ns']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  ❌ 变慢'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  ✅ 变快'
+        print(f"  {name:<28} {base['median_ns'] / 1000:10.2f} -> {result['median_ns'] / 1000:10.2f} µs"
+              f"  ({ratio:.2f}x){flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='掼蛋性能基准')
+    parser.add_argument('--filter', default='', help='只跑名字包含该字符串的基准')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每个基准跑几轮')
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME, help='每轮最少运行秒数')
+    parser.add_argument('--out', default=DEFAULT_OUT, help='结果 JSON 文件')
+    parser.add_argument('--compare', metavar='BASELINE', help='与基线 JSON 比较')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='变慢超过该比例视为退化（默认 0.15）')
+    parser.add_argument('--list', action='store_true', help='列出所有基准')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        sys.exit(0)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if not names:
+        sys.exit(f"没有匹配 {args.filter!r} 的基准")
+
+    current = run(names, repeat=args.repeat, min_time=args.min_time)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 个基准变慢: {', '.join(regressions)}")
+            sys.exit(1)
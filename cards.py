@@ -0,0 +1,115 @@
+"""
+牌的整数编码
+两副牌共 108 张，每张牌是 0..107 的整数: card_id = 副数 * 54 + 牌面
+牌面（face）是 0..53 的整数，忽略副数:
+    face = 花色序号 * 13 + 点数序号 (0..51)，52 = 小王，53 = 大王
+点数序号（rank）0..14: 0..12 对应 2..A，13 = 小王，14 = 大王
+手牌用长度 54 的牌面计数数组表示，JSON 字典只在 API 边界生成
+"""
+from enum import Enum
+
+
+class CardSuit(Enum):
+    """花色"""
+    SPADE = '♠'
+    HEART = '♥'
+    DIAMOND = '♦'
+    CLUB = '♣'
+    JOKER = 'Joker'
+
+
+# 花色顺序与手牌排序一致：♠ ♥ ♦ ♣ Joker
+SUITS = [CardSuit.SPADE.value, CardSuit.HEART.value,
+         CardSuit.DIAMOND.value, CardSuit.CLUB.value]
+VALUES = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+SMALL_JOKER = '小王'
+BIG_JOKER = '大王'
+
+NUM_DECKS = 2
+NUM_FACES = 54
+NUM_CARDS = NUM_FACES * NUM_DECKS
+NUM_RANKS = 15
+SMALL_JOKER_FACE = 52
+BIG_JOKER_FACE = 53
+SMALL_JOKER_RANK = 13
+BIG_JOKER_RANK = 14
+JOKER_SUIT = 4
+
+# 旧版 sortValue（API 兼容）
+SORT_VALUES = {
+    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7,
+    '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14,
+    SMALL_JOKER: 14.5, BIG_JOKER: 15
+}
+SUIT_ORDER = {suit: i for i, suit in enumerate(SUITS)}
+SUIT_ORDER[CardSuit.JOKER.value] = JOKER_SUIT
+
+# 按牌面预先计算的查找表
+FACE_SUIT = []        # 花色序号，王为 4
+FACE_RANK = []        # 点数序号
+FACE_SUIT_STR = []
+FACE_VALUE = []
+for _suit_idx, _suit in enumerate(SUITS):
+    for _rank, _value in enumerate(VALUES):
+        FACE_SUIT.append(_suit_idx)
+        FACE_RANK.append(_rank)
+        FACE_SUIT_STR.append(_suit)
+        FACE_VALUE.append(_value)
+for _rank, _value in ((SMALL_JOKER_RANK, SMALL_JOKER), (BIG_JOKER_RANK, BIG_JOKER)):
+    FACE_SUIT.append(JOKER_SUIT)
+    FACE_RANK.append(_rank)
+    FACE_SUIT_STR.append(CardSuit.JOKER.value)
+    FACE_VALUE.append(_value)
+
+FACE_SORT_VALUE = [SORT_VALUES[v] for v in FACE_VALUE]
+FACE_BY_KEY = {(FACE_SUIT_STR[f], FACE_VALUE[f]): f for f in range(NUM_FACES)}
+# 手牌显示顺序：先按点数，再按花色
+SORTED_FACES = sorted(range(NUM_FACES), key=lambda f: (FACE_SORT_VALUE[f], FACE_SUIT[f]))
+FACE_DICTS = [
+    {'suit': FACE_SUIT_STR[f], 'value': FACE_VALUE[f], 'sortValue': FACE_SORT_VALUE[f]}
+    for f in range(NUM_FACES)
+]
+ALL_CARD_IDS = tuple(range(NUM_CARDS))
+
+
+def face_of(card_id):
+    """整数牌 -> 牌面"""
+    return card_id % NUM_FACES
+
+
+def face_from_dict(card):
+    """API 的牌字典 -> 牌面，无法识别返回 None"""
+    try:
+        return FACE_BY_KEY.get((card['suit'], card['value']))
+    except (KeyError, TypeError):
+        return None
+
+
+def faces_from_dicts(cards):
+    """一组牌字典 -> 牌面列表，有任何一张无法识别返回 None"""
+    faces = []
+    for card in cards:
+        face = face_from_dict(card)
+        if face is None:
+            return None
+        faces.append(face)
+    return faces
+
+
+def face_to_dict(face):
+    """牌面 -> API 的牌字典（返回新字典）"""
+    return dict(FACE_DICTS[face])
+
+
+def counts_to_faces(counts):
+    """牌面计数数组 -> 按显示顺序排列的牌面列表"""
+    faces = []
+    for f in SORTED_FACES:
+        n = counts[f]
+        if n:
+            faces.extend((f,) * n)
+    return faces
+
+
+def face_to_str(face):
+    return f"{FACE_VALUE[face]}{FACE_SUIT_STR[face]}"
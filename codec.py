@@ -0,0 +1,165 @@
+"""
+API 编码 - JSON（默认）与 MessagePack（紧凑）
+
+- JSON: 牌是 {"suit", "value", "sortValue"} 字典；安装了 orjson 时用 orjson 编码/解码，否则用标准库 json
+- MessagePack（Content-Type / Accept: application/msgpack，需要安装 msgpack）:
+  响应里所有 "cards" / "hand" 列表中的牌都换成牌面编码（0..53，见 cards.py），其余字段不变
+- 请求体里的牌可以是牌字典，也可以是牌面编码，两种编码都接受
+
+服务器用 negotiate() 按 Accept 选择响应编码；客户端用 accept_header() / encode_body() / decode_response()。
+"""
+import json
+
+from cards import NUM_FACES, face_from_dict, face_to_dict
+
+try:
+    import msgpack
+except ImportError:   # 可选依赖
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:   # 可选依赖
+    orjson = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MSGPACK_TYPES = (MSGPACK, 'application/x-msgpack')
+
+# 这些键下的列表是牌
+CARD_LIST_KEYS = ('cards', 'hand')
+
+
+def msgpack_available():
+    return msgpack is not None
+
+
+# ---- JSON ----
+
+if orjson is not None:
+    def encode_json(obj):
+        return orjson.dumps(obj)
+
+    def decode_json(data):
+        return orjson.loads(data)
+else:
+    def encode_json(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def decode_json(data):
+        return json.loads(data)
+
+
+# ---- 牌的紧凑表示 ----
+
+def _card_to_face(card):
+    return card if isinstance(card, int) else face_from_dict(card)
+
+
+def compact_cards(obj):
+    """把 cards / hand 列表里的牌字典换成牌面编码（返回新对象，不修改原对象）"""
+    if isinstance(obj, dict):
+        return {k: ([_card_to_face(c) for c in v] if k in CARD_LIST_KEYS and isinstance(v, list)
+                    else compact_cards(v))
+                for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [compact_cards(v) for v in obj]
+    return obj
+
+
+def expand_cards(cards):
+    """牌面编码 / 牌字典混合的列表 -> 牌字典列表"""
+    return [face_to_dict(c) if isinstance(c, int) else c for c in cards]
+
+
+def to_faces(cards):
+    """牌面编码 / 牌字典混合的列表 -> 牌面编码列表；有无法识别的牌返回 None"""
+    faces = []
+    for card in cards:
+        if isinstance(card, bool):
+            return None
+        face = card if isinstance(card, int) else face_from_dict(card)
+        if face is None or not 0 <= face < NUM_FACES:
+            return None
+        faces.append(face)
+    return faces
+
+
+# ---- 编解码 ----
+
+def encode(obj, mimetype=JSON):
+    """按 mimetype 编码响应（MessagePack 时牌换成牌面编码）"""
+    if mimetype in MSGPACK_TYPES:
+        return msgpack.packb(compact_cards(obj), use_bin_type=True)
+    return encode_json(obj)
+
+
+def decode(data, mimetype=JSON):
+    if mimetype in MSGPACK_TYPES:
+        if msgpack is None:
+            raise ValueError('服务器未安装 msgpack')
+        return msgpack.unpackb(data, raw=False)
+    return decode_json(data)
+
+
+def negotiate(accept_mimetypes):
+    """
+    按请求的 Accept（werkzeug MIMEAccept）选择响应编码
+    没有 Accept、*/* 或未安装 msgpack 时用 JSON
+    """
+    if msgpack is None:
+        return JSON
+    best = accept_mimetypes.best_match((JSON,) + MSGPACK_TYPES, default=JSON)
+    return MSGPACK if best in MSGPACK_TYPES else JSON
+
+
+def negotiate_header(accept):
+    """
+    同 negotiate()，参数为 Accept 请求头原文（不依赖 werkzeug，供 asyncio 服务器使用）
+    q 值相同时取先出现的
+    """
+    if msgpack is None or not accept:
+        return JSON
+    best, best_q = JSON, 0.0
+    for item in accept.split(','):
+        mimetype, *params = item.split(';')
+        mimetype = mimetype.strip().lower()
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if mimetype in MSGPACK_TYPES:
+            candidate = MSGPACK
+        elif mimetype in (JSON, 'application/*', '*/*'):
+            candidate = JSON
+        else:
+            continue
+        if q > best_q:
+            best, best_q = candidate, q
+    return best
+
+
+# ---- 客户端 ----
+
+def accept_header(compact=True):
+    """客户端的 Accept 头：优先 MessagePack（已安装时），否则 JSON"""
+    if compact and msgpack is not None:
+        return f'{MSGPACK}, {JSON};q=0.5'
+    return JSON
+
+
+def encode_body(obj, compact=True):
+    """客户端请求体，返回 (bytes, Content-Type)"""
+    if compact and msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True), MSGPACK
+    return encode_json(obj), JSON
+
+
+def decode_response(resp):
+    """按响应的 Content-Type 解码 requests 的响应"""
+    mimetype = resp.headers.get('Content-Type', JSON).split(';')[0].strip()
+    return decode(resp.content, mimetype)
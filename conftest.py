@@ -0,0 +1,2 @@
+# test_api.py 是对着运行中的服务器手动跑的冒烟脚本（python test_api.py），不由 pytest 收集
+collect_ignore = ['test_api.py']
@@ -0,0 +1,511 @@
+"""
+掼蛋游戏引擎 - 纯游戏逻辑，不依赖 Flask/HTTP/SSE
+服务器（server.py）和无界面模拟器（simulator.py）共用
+"""
+import random
+import rules
+from cards import (
+    NUM_FACES, NUM_RANKS, SORT_VALUES, SUIT_ORDER, FACE_BY_KEY,
+    FACE_RANK, FACE_SUIT_STR, FACE_VALUE, FACE_SORT_VALUE, ALL_CARD_IDS,
+    face_of, face_from_dict, faces_from_dicts, face_to_dict, face_to_str, counts_to_faces
+)
+
+
+class Card:
+    """牌的表示"""
+    def __init__(self, suit, value, sort_value=None):
+        self.suit = suit
+        self.value = value
+        # 用于排序的值
+        self.sort_value = sort_value or self._get_sort_value(value)
+        # 牌面编码（0..53）
+        self.face = FACE_BY_KEY.get((suit, value))
+    
+    @classmethod
+    def from_face(cls, face):
+        return cls(FACE_SUIT_STR[face], FACE_VALUE[face], FACE_SORT_VALUE[face])
+    
+    @staticmethod
+    def _get_sort_value(value):
+        return SORT_VALUES.get(value, 0)
+    
+    def to_dict(self):
+        return {
+            'suit': self.suit,
+            'value': self.value,
+            'sortValue': self.sort_value
+        }
+    
+    def __repr__(self):
+        return f"{self.value}{self.suit}"
+
+
+class Player:
+    """
+    玩家
+    手牌保存为牌面计数数组（counts[face]）和点数计数数组（rank_counts[rank]），
+    验证和移除的开销只和出的牌数有关
+    """
+    def __init__(self, player_id, name, is_ai=False):
+        self.id = player_id
+        self.name = name
+        self.is_ai = is_ai
+        self.counts = [0] * NUM_FACES       # 每种牌面的张数
+        self.rank_counts = [0] * NUM_RANKS  # 每个点数的张数
+        self.card_count = 0
+        self.level = 2   # 当前等级
+    
+    @property
+    def cards(self):
+        """手牌（按显示顺序排列的 Card 列表）"""
+        return [Card.from_face(f) for f in counts_to_faces(self.counts)]
+    
+    @cards.setter
+    def cards(self, cards):
+        self.set_faces(card.face for card in cards)
+    
+    def set_faces(self, faces):
+        """用一组牌面重置手牌"""
+        self.counts = [0] * NUM_FACES
+        self.rank_counts = [0] * NUM_RANKS
+        self.card_count = 0
+        for face in faces:
+            self.counts[face] += 1
+            self.rank_counts[FACE_RANK[face]] += 1
+            self.card_count += 1
+    
+    def add_card(self, card):
+        self.counts[card.face] += 1
+        self.rank_counts[FACE_RANK[card.face]] += 1
+        self.card_count += 1
+    
+    def has_faces(self, faces):
+        """检查玩家是否拥有这些牌面（同一牌面出现多次需要有多张）"""
+        needed = {}
+        for face in faces:
+            n = needed.get(face, 0) + 1
+            if n > self.counts[face]:
+                return False
+            needed[face] = n
+        return True
+    
+    def remove_faces(self, faces):
+        """移除一组牌面，调用前需先用 has_faces 检查"""
+        counts = self.counts
+        rank_counts = self.rank_counts
+        for face in faces:
+            counts[face] -= 1
+            rank_counts[FACE_RANK[face]] -= 1
+        self.card_count -= len(faces)
+    
+    def remove_card(self, card):
+        """移除手牌中的一张牌"""
+        face = face_from_dict(card)
+        if face is None or not self.counts[face]:
+            return False
+        self.remove_faces([face])
+        return True
+    
+    def has_cards(self, cards):
+        """检查玩家是否拥有这些牌"""
+        faces = faces_from_dicts(cards)
+        return faces is not None and self.has_faces(faces)
+    
+    def sort_cards(self):
+        """排序手牌（计数数组总是按显示顺序输出，无需排序）"""
+    
+    @staticmethod
+    def _suit_order(suit):
+        return SUIT_ORDER.get(suit, 5)
+    
+    def hand_dicts(self):
+        """手牌的 API 表示"""
+        return [face_to_dict(f) for f in counts_to_faces(self.counts)]
+    
+    def to_dict(self, show_cards=False):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'isAI': self.is_ai,
+            'level': self.level,
+            'cardCount': self.card_count,
+            'cards': self.hand_dicts() if show_cards else []
+        }
+
+
+class PlayRecord:
+    """出牌记录"""
+    def __init__(self, player_id, cards, card_type=None, is_pass=False):
+        self.player_id = player_id
+        self.cards = cards
+        self.card_type = card_type
+        self.is_pass = is_pass
+    
+    def to_dict(self):
+        return {
+            'playerId': self.player_id,
+            'cards': self.cards,
+            'cardType': self.card_type,
+            'isPass': self.is_pass
+        }
+
+
+class GameState:
+    """游戏状态"""
+    def __init__(self, on_event=None, version=0, rng=None):
+        # 出牌/过牌事件的回调，一般是所属牌桌的广播器（None 表示不推送）
+        self.on_event = on_event
+        # 洗牌用的随机数生成器，模拟器传入带种子的 random.Random 以便复现
+        self.rng = rng if rng is not None else random.Random()
+        # 状态版本号，每次开局/出牌/过牌递增；同一牌桌重新开局时延续上一局的版本号
+        self.version = version
+        self.players = [
+            Player(0, '我', is_ai=False),
+            Player(1, '右侧', is_ai=True),
+            Player(2, '对家', is_ai=True),
+            Player(3, '左侧', is_ai=True)
+        ]
+        self.current_player_id = 0
+        self.started = False
+        self.winner_id = None   # 先出完牌的玩家，非 None 表示本局结束
+        # 出牌历史；每条记录对应一次版本号递增，第 i 条的版本号为 start_version + i + 1
+        self.play_history = []
+        self.start_version = 0  # 本局开局时的版本号
+        self.last_play = None   # 最后一次出牌
+        self.last_hand_type = None  # 最后一次出牌的牌型（rules.HandType）
+        self.pass_count = 0     # 连续过牌数
+        self.current_level = 2  # 当前打的等级
+    
+    def start_game(self):
+        """开始游戏，发牌"""
+        self.started = True
+        self.winner_id = None
+        self.play_history = []
+        self.last_play = None
+        self.last_hand_type = None
+        self.pass_count = 0
+        
+        # 创建牌组（2副牌，整数编码）
+        deck = self._create_deck()
+        
+        # 洗牌
+        self.rng.shuffle(deck)
+        
+        # 发牌给每个玩家（每人27张）
+        for i, player in enumerate(self.players):
+            player.set_faces(face_of(c) for c in deck[i*27:(i+1)*27])
+        
+        # 玩家先手
+        self.current_player_id = 0
+        self.version += 1
+        self.start_version = self.version
+        self._emit_turn()
+        
+        return {
+            'success': True,
+            'message': '游戏开始，已发牌',
+            'currentPlayer': self.current_player_id
+        }
+    
+    def _create_deck(self):
+        """创建2副牌（0..107 的整数，见 cards.py）"""
+        return list(ALL_CARD_IDS)
+    
+    def get_player_hand(self, player_id):
+        """获取玩家的手牌"""
+        if not (0 <= player_id < len(self.players)):
+            return None
+        return self.players[player_id].hand_dicts()
+    
+    def validate_card_type(self, cards):
+        """验证牌型，返回最大的一种解释（见 rules.py），无效返回 None"""
+        faces = faces_from_dicts(cards)
+        if not faces:
+            return None
+        hand_type = rules.pick(rules.classify(faces, self.current_level))
+        return rules.type_to_dict(hand_type) if hand_type else None
+    
+    def can_beat(self, cards, card_type, last_play):
+        """判断是否能压过上家的牌"""
+        if not last_play:
+            return True  # 首轮可以出任何有效牌型
+        
+        faces = faces_from_dicts(cards)
+        if not faces:
+            return False
+        last_type = rules.type_from_dict(last_play['cardType'])
+        return rules.pick(rules.classify(faces, self.current_level), last_type) is not None
+    
+    def legal_moves(self, player_id):
+        """该玩家当前所有合法出法（rules.Move 列表，不含过牌）"""
+        player = self.players[player_id]
+        return rules.legal_moves(player.counts, self.last_hand_type, self.current_level)
+    
+    def play(self, player_id, cards):
+        """执行出牌（cards 为 API 的牌字典列表）"""
+        # 只在这里把 API 的牌字典转成牌面编码
+        faces = faces_from_dicts(cards)
+        if faces is None:
+            return {'success': False, 'message': '你没有这些牌'}
+        return self.play_faces(player_id, faces)
+    
+    def _check_turn(self, player_id):
+        if not self.started:
+            return {'success': False, 'message': '游戏未开始'}
+        if self.winner_id is not None:
+            return {'success': False, 'message': '本局已结束'}
+        if player_id != self.current_player_id:
+            return {'success': False, 'message': '不是你的回合'}
+        return None
+    
+    def play_faces(self, player_id, faces):
+        """执行出牌（faces 为牌面编码列表）"""
+        error = self._check_turn(player_id)
+        if error:
+            return error
+        
+        player = self.players[player_id]
+        
+        # 检查玩家是否拥有这些牌
+        if not player.has_faces(faces):
+            return {'success': False, 'message': '你没有这些牌'}
+        # 统一成服务器端的牌字典，不信任客户端传来的 sortValue 等字段
+        cards = [face_to_dict(f) for f in faces]
+        
+        # 验证牌型（查表，见 rules.py）
+        types = rules.classify(faces, self.current_level)
+        if not types:
+            return {'success': False, 'message': '无效的牌型'}
+        
+        # 如果不是首轮，检查是否能压过上家；同一手牌有多种解释时选能压过的那种
+        hand_type = rules.pick(types, self.last_hand_type)
+        if hand_type is None:
+            return {'success': False, 'message': '无法压过上家的牌'}
+        card_type = rules.type_to_dict(hand_type)
+        
+        # 执行出牌
+        player.remove_faces(faces)
+        
+        # 更新游戏状态
+        self.last_hand_type = hand_type
+        self.last_play = {
+            'playerId': player_id,
+            'cards': cards,
+            'cardType': card_type,
+            'isPass': False
+        }
+        self.pass_count = 0
+        self.version += 1
+        
+        # 记录到历史
+        record = {
+            'playerName': player.name,
+            'playerId': player_id,
+            'cards': cards,
+            'cardType': card_type,
+            'isPass': False
+        }
+        self.play_history.append(record)
+        
+        # 推送 SSE 事件
+        card_str = '、'.join([face_to_str(f) for f in faces])
+        self._emit({
+            'type': 'play',
+            'playerName': player.name,
+            'playerId': player_id,
+            'cardType': card_type['name'],
+            'cards': card_str,
+            'cardCount': player.card_count,
+            'version': self.version
+        })
+        
+        # 检查是否获胜
+        if player.card_count == 0:
+            self.winner_id = player_id
+            self._emit_turn()
+            return {
+                'success': True,
+                'message': f'{player.name} 获胜！',
+                'winner': player.name,
+                'gameOver': True
+            }
+        
+        # 转到下一个玩家
+        self._next_player()
+        self._emit_turn()
+        
+        return {
+            'success': True,
+            'message': '出牌成功',
+            'cardType': card_type,
+            'nextPlayer': self.current_player_id
+        }
+    
+    def pass_turn(self, player_id):
+        """过牌"""
+        error = self._check_turn(player_id)
+        if error:
+            return error
+        
+        player = self.players[player_id]
+        self.pass_count += 1
+        self.version += 1
+        
+        # 记录到历史
+        record = {
+            'playerName': player.name,
+            'playerId': player_id,
+            'cards': [],
+            'cardType': None,
+            'isPass': True
+        }
+        self.play_history.append(record)
+        
+        # 推送 SSE 事件
+        self._emit({
+            'type': 'pass',
+            'playerName': player.name,
+            'playerId': player_id,
+            'cardCount': player.card_count,
+            'version': self.version
+        })
+        
+        # 如果连续3个人过牌，新一轮开始
+        if self.pass_count >= 3:
+            self.last_play = None
+            self.last_hand_type = None
+            self.pass_count = 0
+        
+        # 转到下一个玩家
+        self._next_player()
+        self._emit_turn()
+        
+        return {
+            'success': True,
+            'message': '已过牌',
+            'nextPlayer': self.current_player_id
+        }
+    
+    def _emit(self, event):
+        """推送事件到牌桌的事件流"""
+        if self.on_event is not None:
+            self.on_event(event)
+    
+    def _emit_turn(self):
+        """
+        推送回合事件：轮到谁（nextPlayer）和新的状态版本号，Agent 据此判断是否轮到自己
+        本局结束时 nextPlayer 为 None，带上 winner；leading 为 True 表示新一轮首家出牌
+        """
+        if self.on_event is None:
+            return
+        over = self.winner_id is not None
+        next_player = None if over else self.current_player_id
+        self.on_event({
+            'type': 'turn',
+            'version': self.version,
+            'nextPlayer': next_player,
+            'nextPlayerName': None if over else self.players[next_player].name,
+            'leading': self.last_play is None,
+            'gameOver': over,
+            'winner': self.players[self.winner_id].name if over else None
+        })
+    
+    def _next_player(self):
+        """转到下一个玩家"""
+        self.current_player_id = (self.current_player_id + 1) % len(self.players)
+    
+    def get_state(self):
+        """获取当前游戏状态"""
+        return {
+            'started': self.started,
+            'gameOver': self.winner_id is not None,
+            'winner': self.winner_id,
+            'version': self.version,
+            'currentPlayer': self.current_player_id,
+            'currentPlayerName': self.players[self.current_player_id].name if self.started else None,
+            'currentLevel': self.current_level,
+            'players': [p.to_dict() for p in self.players],
+            'lastPlay': self.last_play,
+            'passCount': self.pass_count,
+            'playHistory': self.play_history[-10:]  # 最近10条记录
+        }
+    
+    def can_delta(self, since):
+        """能否给出版本号 since 之后的增量（since 必须在本局开局之后且不晚于当前版本）"""
+        return self.started and since is not None and self.start_version <= since <= self.version
+    
+    def events_since(self, since):
+        """
+        版本号 since 之后的出牌/过牌记录（每条带上自己的 version）
+        since 早于本局开局或晚于当前版本时无法给出增量，返回 None
+        """
+        if not self.can_delta(since):
+            return None
+        first = since - self.start_version
+        return [dict(record, version=self.start_version + i + 1)
+                for i, record in enumerate(self.play_history[first:], start=first)]
+    
+    def _delta_fields(self, events):
+        return {
+            'delta': True,
+            'version': self.version,
+            'started': self.started,
+            'gameOver': self.winner_id is not None,
+            'winner': self.winner_id,
+            'currentPlayer': self.current_player_id,
+            'currentPlayerName': self.players[self.current_player_id].name,
+            'currentLevel': self.current_level,
+            'lastPlay': self.last_play,
+            'passCount': self.pass_count,
+            'cardCounts': [p.card_count for p in self.players],
+            'events': events,
+        }
+    
+    def get_state_delta(self, since):
+        """
+        get_state 的增量版：只含轮次相关的字段、各家牌数和 since 之后的新记录，
+        不含 players 和 playHistory；无法给出增量时返回 None（调用方改用 get_state）
+        """
+        events = self.events_since(since)
+        if events is None:
+            return None
+        delta = self._delta_fields(events)
+        delta['since'] = since
+        return delta
+    
+    def get_turn_info_delta(self, player_id, since):
+        """
+        get_turn_info 的增量版：手牌只在该玩家 since 之后出过牌时才带上；
+        无法给出增量时返回 None（调用方改用 get_turn_info）
+        """
+        events = self.events_since(since)
+        if events is None:
+            return None
+        is_my_turn = player_id == self.current_player_id
+        delta = self._delta_fields(events)
+        delta.update({
+            'since': since,
+            'playerId': player_id,
+            'isMyTurn': is_my_turn,
+            'canPlay': is_my_turn and self.started and self.winner_id is None,
+        })
+        if any(e['playerId'] == player_id and not e['isPass'] for e in events):
+            delta['hand'] = self.get_player_hand(player_id)
+        return delta
+    
+    def get_turn_info(self, player_id):
+        """获取某个玩家的回合信息"""
+        is_my_turn = player_id == self.current_player_id
+        
+        return {
+            'playerId': player_id,
+            'version': self.version,
+            'isMyTurn': is_my_turn,
+            'currentPlayer': self.current_player_id,
+            'currentPlayerName': self.players[self.current_player_id].name,
+            'lastPlay': self.last_play,
+            'canPlay': is_my_turn and self.started and self.winner_id is None,
+            'passCount': self.pass_count,
+            'hand': self.get_player_hand(player_id),
+            'gameState': self.get_state()
+        }
@@ -0,0 +1,136 @@
+"""
+SSE 事件广播器 - 每个订阅者独立队列 + 环形回放缓冲
+"""
+import json
+from collections import deque
+from queue import Queue, Full, Empty
+from threading import Lock
+
+# 订阅者队列满时的策略：直接断开该订阅者。
+# 客户端重连时带上 Last-Event-ID，从环形缓冲补发错过的事件；
+# 如果错过的事件已经被挤出缓冲，则收到一条 resync 事件，需要重新拉取完整状态。
+DEFAULT_HISTORY_SIZE = 256
+DEFAULT_QUEUE_SIZE = 256
+
+
+def encode_event(seq, event):
+    """把事件编码为一条 SSE 消息（bytes），所有订阅者共享同一份"""
+    data = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {seq}\ndata: {data}\n\n".encode('utf-8')
+
+
+class Subscriber:
+    """一个事件流连接"""
+    def __init__(self, maxsize):
+        self.queue = Queue(maxsize=maxsize)
+        self.dropped = False   # 因消费过慢被断开
+
+    def offer(self, payload):
+        """非阻塞投递，队列满返回 False"""
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except Full:
+            return False
+
+    def get(self, timeout):
+        """取下一条消息；超时返回 b''，连接应结束时返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return b''
+
+    def close(self):
+        """唤醒消费者并让其退出（队列满时也保证能放进结束标记）"""
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                return
+            except Full:
+                try:
+                    self.queue.get_nowait()
+                except Empty:
+                    pass
+
+
+class EventBroker:
+    """
+    单张牌桌的事件广播器
+    subscriber_class 为订阅者的队列实现：默认的 Subscriber 供线程阻塞读取，
+    asyncio 服务器用协程读取的版本（见 async_server.AsyncSubscriber）
+    """
+    def __init__(self, history_size=DEFAULT_HISTORY_SIZE, queue_size=DEFAULT_QUEUE_SIZE, on_drop=None,
+                 subscriber_class=Subscriber):
+        self._lock = Lock()
+        self._seq = 0
+        self._history = deque(maxlen=history_size)   # (seq, payload)
+        self._subscribers = set()
+        self.queue_size = queue_size
+        self.closed = False
+        # 断开慢消费者时的回调（用于计数）
+        self.on_drop = on_drop
+        self.subscriber_class = subscriber_class
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def publish(self, event):
+        """广播事件：只编码一次，再把同一份 bytes 投递给所有订阅者"""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            payload = encode_event(seq, event)
+            self._history.append((seq, payload))
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            if not sub.offer(payload):
+                # 慢消费者：断开，由客户端重连回放
+                sub.dropped = True
+                self.unsubscribe(sub)
+                sub.close()
+                if self.on_drop is not None:
+                    self.on_drop()
+        return seq
+
+    def subscribe(self, last_event_id=None):
+        """新建订阅；last_event_id 不为空时先补发之后的事件"""
+        sub = self.subscriber_class(self.queue_size)
+        with self._lock:
+            if self.closed:
+                sub.close()
+                return sub
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._seq + 1
+                if last_event_id + 1 < oldest:
+                    # 缓冲里已经没有需要的事件，通知客户端重新同步
+                    sub.offer(encode_event(self._seq, {'type': 'resync'}))
+                else:
+                    for seq, payload in self._history:
+                        if seq > last_event_id:
+                            sub.offer(payload)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def close(self):
+        """关闭广播器，所有订阅者退出"""
+        with self._lock:
+            self.closed = True
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for sub in subscribers:
+            sub.close()
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def queue_depths(self):
+        """各订阅者当前积压的消息数"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return [sub.queue.qsize() for sub in subscribers]
@@ -7,11 +7,17 @@ class GuandanGame {
         this.gameStarted = false;
         this.selectedCards = [];
         this.gameState = null;
-        this.pollInterval = null;
+        this.polling = false; // 长轮询循环是否在运行
+        this.stateVersion = null; // 最后看到的状态版本号
         this.lastDisplayedPlayId = -1; // 追踪最后显示的出牌ID
         this.lastPlayerTurnRound = -1; // 追踪上次显示提醒的回合数
         this.displayedPlayRecords = new Set(); // 用 Set 追踪已显示的记录（防止重复）
         this.eventSource = null; // SSE 连接
+        this.lastEventId = null; // 最后收到的事件 id，重连时用于补发
+        this.socket = null; // 座位的 WebSocket 连接（服务器推送回合信息，出牌/过牌也走这条连接）
+        this.seatToken = sessionStorage.getItem(`guandan-seat-${this.playerId}`); // 认领座位得到的令牌，连接 WebSocket、取手牌和回合信息时出示
+        this.socketRequests = new Map(); // 请求 id -> 等待 result 的 resolve
+        this.nextRequestId = 0;
         
         this.initEventListeners();
     }
@@ -81,8 +87,8 @@ class GuandanGame {
                 // 连接 SSE 事件流
                 this.connectEventStream();
                 
-                // 开始定期轮询（用于非事件更新，如手牌显示）
-                this.startPolling();
+                // 优先用 WebSocket 接收回合信息；不支持或断开时退回长轮询
+                this.connectSocket();
             } else {
                 this.addLog(`❌ ${result.message}`, 'info');
             }
@@ -98,10 +104,15 @@ class GuandanGame {
             this.eventSource.close();
         }
         
-        this.eventSource = new EventSource(`${this.SERVER_URL}/game/events`);
+        // 手动重连时带上最后的事件 id，服务器会补发断线期间的事件
+        const query = this.lastEventId ? `?lastEventId=${encodeURIComponent(this.lastEventId)}` : '';
+        this.eventSource = new EventSource(`${this.SERVER_URL}/game/events${query}`);
         
         this.eventSource.onmessage = (event) => {
             try {
+                if (event.lastEventId) {
+                    this.lastEventId = event.lastEventId;
+                }
                 const data = JSON.parse(event.data);
                 
                 if (data.type === 'connected') {
@@ -111,14 +122,17 @@ class GuandanGame {
                     if (data.playerId !== this.playerId) {
                         this.addLog(`${data.playerName} 出了 ${data.cardType}: ${data.cards}`, 'play');
                     }
-                    // 更新游戏状态
-                    this.updateGameState();
                 } else if (data.type === 'pass') {
                     // 过牌事件
                     if (data.playerId !== this.playerId) {
                         this.addLog(`${data.playerName} 过了`, 'pass');
                     }
-                    // 更新游戏状态
+                } else if (data.type === 'turn') {
+                    // 每次开局/出牌/过牌之后都有一条 turn 事件（轮到谁、新的版本号），据此更新游戏状态
+                    this.refreshGameState();
+                } else if (data.type === 'resync') {
+                    // 错过的事件太多，重新拉取完整状态
+                    this.updatePlayerHand();
                     this.updateGameState();
                 }
             } catch (e) {
@@ -134,11 +148,125 @@ class GuandanGame {
         };
     }
 
+    // 认领座位，返回座位令牌；刷新页面后沿用 sessionStorage 里保存的令牌，认领失败返回 null
+    async claimSeat() {
+        const key = `guandan-seat-${this.playerId}`;
+        this.seatToken = this.seatToken || sessionStorage.getItem(key);
+        if (this.seatToken) {
+            return this.seatToken;
+        }
+        try {
+            const response = await fetch(`${this.SERVER_URL}/game/seats/${this.playerId}/claim`, {
+                method: 'POST'
+            });
+            if (response.ok) {
+                this.seatToken = (await response.json()).token;
+                sessionStorage.setItem(key, this.seatToken);
+            }
+        } catch (error) {
+            console.error('认领座位失败:', error);
+        }
+        return this.seatToken;
+    }
+
+    // 座位已认领时，取手牌和回合信息要带上令牌
+    seatHeaders() {
+        return this.seatToken ? { 'X-Seat-Token': this.seatToken } : {};
+    }
+
+    // 令牌已失效（服务器重启、牌桌关闭）：丢掉它，下次重新认领
+    forgetSeatToken() {
+        this.seatToken = null;
+        sessionStorage.removeItem(`guandan-seat-${this.playerId}`);
+    }
+
+    // 连接座位的 WebSocket（协议见服务器 SeatChannel），需要先认领座位
+    async connectSocket() {
+        const token = window.WebSocket ? await this.claimSeat() : null;
+        if (!token) {
+            // 不支持 WebSocket 或座位已被别人认领：用长轮询
+            this.startPolling();
+            return;
+        }
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const socket = new WebSocket(
+            `${protocol}//${window.location.host}/game/ws/${this.playerId}?token=${encodeURIComponent(token)}`
+        );
+        
+        socket.onopen = () => {
+            this.socket = socket;
+            this.addLog('🔌 WebSocket 已连接', 'info');
+        };
+        
+        socket.onmessage = (event) => {
+            try {
+                const message = JSON.parse(event.data);
+                if (message.type === 'turn') {
+                    this.applyTurnInfo(message);
+                } else if (message.type === 'result' || message.type === 'pong') {
+                    const resolve = this.socketRequests.get(message.id);
+                    if (resolve) {
+                        this.socketRequests.delete(message.id);
+                        resolve(message);
+                    }
+                } else if (message.type === 'error') {
+                    console.error('WebSocket 错误:', message.message);
+                    if (message.message === '座位令牌无效') {
+                        this.forgetSeatToken();
+                    }
+                }
+            } catch (e) {
+                console.error('WebSocket 消息解析失败:', e);
+            }
+        };
+        
+        socket.onclose = () => {
+            this.socket = null;
+            // 没收到结果的请求按失败处理
+            this.socketRequests.forEach(resolve => resolve({ success: false, message: '连接已断开' }));
+            this.socketRequests.clear();
+            if (this.gameStarted) {
+                this.startPolling();
+            }
+        };
+    }
+
+    socketOpen() {
+        return this.socket !== null && this.socket.readyState === WebSocket.OPEN;
+    }
+
+    // 出牌/过牌：WebSocket 已连接时在同一条连接上发送，否则用 HTTP
+    async sendAction(type, body = {}) {
+        if (this.socketOpen()) {
+            const id = ++this.nextRequestId;
+            return new Promise(resolve => {
+                this.socketRequests.set(id, resolve);
+                this.socket.send(JSON.stringify({ type, id, ...body }));
+            });
+        }
+        const response = await fetch(`${this.SERVER_URL}/game/${type}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ playerId: this.playerId, ...body })
+        });
+        return response.json();
+    }
+
+    // 事件触发的状态刷新；WebSocket 已连接时服务器会推送，不用再请求
+    refreshGameState() {
+        if (!this.socketOpen()) {
+            this.updateGameState();
+        }
+    }
+
     // 获取玩家手牌
     async updatePlayerHand() {
         try {
             const response = await fetch(
-                `${this.SERVER_URL}/game/player/${this.playerId}/hand`
+                `${this.SERVER_URL}/game/player/${this.playerId}/hand`,
+                { headers: this.seatHeaders() }
             );
             
             if (!response.ok) return;
@@ -219,23 +347,10 @@ class GuandanGame {
                 return cardData;
             });
             
-            const response = await fetch(`${this.SERVER_URL}/game/play`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    playerId: this.playerId,
-                    cards: cardsToSend
-                })
-            });
-            
-            const result = await response.json();
+            const result = await this.sendAction('play', { cards: cardsToSend });
             
             if (result.success) {
-                // 获取出牌后的游戏状态来显示牌型
-                await this.updateGameState();
-                const cardType = this.gameState?.lastPlay?.cardType?.name || '单牌';
+                const cardType = result.cardType?.name || '单牌';
                 this.addLog(`✅ 我出了 ${cardType}: ${cardStr}`, 'play');
                 
                 if (result.gameOver && result.winner) {
@@ -247,7 +362,7 @@ class GuandanGame {
                 this.selectedCards = [];
                 document.getElementById('playBtn').disabled = true;
                 await this.updatePlayerHand();
-                await this.updateGameState();
+                this.refreshGameState();
             } else {
                 this.addLog(`❌ 出牌失败: ${result.message}`, 'info');
             }
@@ -260,21 +375,11 @@ class GuandanGame {
     // 过牌
     async pass() {
         try {
-            const response = await fetch(`${this.SERVER_URL}/game/pass`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    playerId: this.playerId
-                })
-            });
-            
-            const result = await response.json();
+            const result = await this.sendAction('pass');
             
             if (result.success) {
                 this.addLog('我过了', 'pass');
-                await this.updateGameState();
+                this.refreshGameState();
             } else {
                 this.addLog(`❌ 错误: ${result.message}`, 'info');
             }
@@ -284,66 +389,102 @@ class GuandanGame {
         }
     }
 
-    // 更新游戏状态
-    async updateGameState() {
+    // 更新游戏状态（wait > 0 时长轮询，服务器挂起到轮到自己或状态版本变化）
+    // 带 since 时服务器只返回之后的变化，合并到上一次的状态上
+    async updateGameState(wait = 0) {
         try {
-            const response = await fetch(
-                `${this.SERVER_URL}/game/turn/${this.playerId}`
-            );
-            
-            if (!response.ok) return;
-            
-            const data = await response.json();
-            this.gameState = data;
-            
-            // 更新UI
-            document.getElementById('roundInfo').textContent = `${data.currentPlayerName}的回合`;
-            
-            // 检查是否轮到玩家的回合
-            // 用 passCount 作为回合标识，每当 passCount 重置时就是新的一轮
-            if (data.isMyTurn && data.canPlay) {
-                // 如果这是新的一轮（passCount 改变了），就显示提醒
-                const currentRoundId = `${data.currentPlayer}-${data.passCount}`;
-                if (currentRoundId !== this.lastPlayerTurnRound) {
-                    this.showPlayerTurnAlert();
-                    this.lastPlayerTurnRound = currentRoundId;
-                }
-            } else {
-                // 如果不是玩家的回合，重置回合标识
-                if (this.lastPlayerTurnRound !== -1) {
-                    this.hidePlayerTurnAlert();
+            let url = `${this.SERVER_URL}/game/turn/${this.playerId}`;
+            if (wait > 0) {
+                url += `?wait=${wait}`;
+                if (this.stateVersion !== null && this.gameState) {
+                    url += `&since=${this.stateVersion}`;
                 }
             }
+            const response = await fetch(url, { headers: this.seatHeaders() });
             
-            // 更新所有玩家的牌数
-            if (data.gameState && data.gameState.players) {
-                const playerMapping = {
-                    0: 'bottomCount',
-                    1: 'rightCount',
-                    2: 'topCount',
-                    3: 'leftCount'
-                };
-                
-                data.gameState.players.forEach(p => {
-                    const elementId = playerMapping[p.id];
-                    if (elementId) {
-                        document.getElementById(elementId).textContent = p.cardCount;
-                    }
-                });
-            }
-            
-            // 更新出牌显示
-            if (data.lastPlay) {
-                this.displayPlayedCards(data.lastPlay);
-            }
-            
-            // 更新按钮状态
-            document.getElementById('passBtn').disabled = !data.canPlay;
-            document.getElementById('playBtn').disabled = this.selectedCards.length === 0 || !data.canPlay;
+            if (!response.ok) return false;
             
+            this.applyTurnInfo(await response.json());
+            return true;
         } catch (error) {
             console.error('更新游戏状态失败:', error);
+            return false;
+        }
+    }
+
+    // 合并并显示回合信息（HTTP 响应或 WebSocket 推送；增量合并到上一次的状态上）
+    applyTurnInfo(data) {
+        if (data.delta && this.gameState) {
+            data = this.applyTurnDelta(this.gameState, data);
         }
+        this.gameState = data;
+        if (data.version !== undefined) {
+            this.stateVersion = data.version;
+        }
+        
+        // 更新UI
+        document.getElementById('roundInfo').textContent = `${data.currentPlayerName}的回合`;
+        
+        // 检查是否轮到玩家的回合
+        // 用 passCount 作为回合标识，每当 passCount 重置时就是新的一轮
+        if (data.isMyTurn && data.canPlay) {
+            // 如果这是新的一轮（passCount 改变了），就显示提醒
+            const currentRoundId = `${data.currentPlayer}-${data.passCount}`;
+            if (currentRoundId !== this.lastPlayerTurnRound) {
+                this.showPlayerTurnAlert();
+                this.lastPlayerTurnRound = currentRoundId;
+            }
+        } else {
+            // 如果不是玩家的回合，重置回合标识
+            if (this.lastPlayerTurnRound !== -1) {
+                this.hidePlayerTurnAlert();
+            }
+        }
+        
+        // 更新所有玩家的牌数
+        if (data.gameState && data.gameState.players) {
+            const playerMapping = {
+                0: 'bottomCount',
+                1: 'rightCount',
+                2: 'topCount',
+                3: 'leftCount'
+            };
+            
+            data.gameState.players.forEach(p => {
+                const elementId = playerMapping[p.id];
+                if (elementId) {
+                    document.getElementById(elementId).textContent = p.cardCount;
+                }
+            });
+        }
+        
+        // 更新出牌显示
+        if (data.lastPlay) {
+            this.displayPlayedCards(data.lastPlay);
+        }
+        
+        // 更新按钮状态
+        document.getElementById('passBtn').disabled = !data.canPlay;
+        document.getElementById('playBtn').disabled = this.selectedCards.length === 0 || !data.canPlay;
+    }
+
+    // 把增量响应合并到完整的回合信息上（字段见服务器 GameState.get_turn_info_delta）
+    applyTurnDelta(info, delta) {
+        const turnFields = ['version', 'isMyTurn', 'currentPlayer', 'currentPlayerName',
+                            'lastPlay', 'canPlay', 'passCount'];
+        const stateFields = ['version', 'started', 'gameOver', 'winner', 'currentPlayer',
+                             'currentPlayerName', 'currentLevel', 'lastPlay', 'passCount'];
+        const merged = { ...info };
+        turnFields.forEach(key => { merged[key] = delta[key]; });
+        if (delta.hand) {
+            merged.hand = delta.hand;
+        }
+        const state = { ...(info.gameState || {}) };
+        stateFields.forEach(key => { state[key] = delta[key]; });
+        state.players = (state.players || []).map((p, i) => ({ ...p, cardCount: delta.cardCounts[i] }));
+        state.playHistory = (state.playHistory || []).concat(delta.events).slice(-10);
+        merged.gameState = state;
+        return merged;
     }
 
     // 显示出的牌
@@ -378,14 +519,18 @@ class GuandanGame {
         return names[playerId] || '未知';
     }
 
-    // 开始定期轮询
-    startPolling() {
-        // 每1秒更新一次游戏状态（与AI轮询频率同步）
-        this.pollInterval = setInterval(async () => {
-            if (this.gameStarted) {
-                await this.updateGameState();
+    // 开始长轮询（用于非事件更新，如手牌显示）
+    async startPolling() {
+        if (this.polling) return;
+        this.polling = true;
+        while (this.gameStarted && !this.socketOpen()) {
+            const ok = await this.updateGameState(25);
+            if (!ok) {
+                // 出错时稍等再重试
+                await new Promise(resolve => setTimeout(resolve, 1000));
             }
-        }, 1000);
+        }
+        this.polling = false;
     }
 
     // 结束游戏
@@ -395,14 +540,15 @@ class GuandanGame {
         document.getElementById('playBtn').disabled = true;
         document.getElementById('passBtn').disabled = true;
         
-        if (this.pollInterval) {
-            clearInterval(this.pollInterval);
-        }
+        // 长轮询循环会在 gameStarted 变为 false 后退出
         
         if (this.eventSource) {
             this.eventSource.close();
             this.eventSource = null;
         }
+        if (this.socket) {
+            this.socket.close();
+        }
     }
 }
 
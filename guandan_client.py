@@ -0,0 +1,345 @@
+"""
+掼蛋游戏 API 客户端 - AI Agent 和测试脚本共用
+
+    client = GuandanClient('http://localhost:5000')          # 默认牌桌；GuandanClient(url, game_id='t1') 为指定牌桌
+    client.start()
+    info = client.turn(1, wait=5, since=info.version)        # TurnInfo（长轮询，增量自动合并）
+    result = client.play(1, list(move.faces))                 # ActionResult
+    if not result.success: ...
+
+- 一个 requests.Session 复用 keep-alive 连接；HTTPAdapter + Retry 对连接失败和 502/503/504 退避重试
+  （出牌/过牌不是幂等的，只在请求还没发出去时重试）
+- 每个调用都有超时，长轮询时加上等待时间
+- 默认请求紧凑编码（见 codec.py）
+- 响应解析为 TurnInfo / ActionResult / Hand / GameSnapshot；
+  服务器返回错误时抛出 GameAPIError，连接失败、超时抛出 ServerUnavailable
+- events() 订阅事件流；claim_seat() 认领座位后可以订阅该座位的私有事件流（turn 事件 + 手牌更新）
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import codec
+
+DEFAULT_TIMEOUT = 3
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.2
+DEFAULT_POOL_SIZE = 10
+# 订阅事件流时请求的心跳间隔（秒）：没有事件时至少这么久产生一次 None，调用方借此检查停止标志
+DEFAULT_HEARTBEAT = 2
+
+
+class GameAPIError(Exception):
+    """服务器返回的错误（HTTP 状态码非 2xx 且带 error 字段）"""
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class GameNotStarted(GameAPIError):
+    """牌桌还没开局（HTTP 400）"""
+
+
+class ServerUnavailable(Exception):
+    """连接失败或超时（已按 Retry 重试过）"""
+
+
+@dataclass
+class ActionResult:
+    """开局/出牌/过牌的结果"""
+    success: bool
+    message: str = ''
+    card_type: Optional[Dict] = None
+    next_player: Optional[int] = None
+    version: Optional[int] = None
+    game_over: bool = False
+    winner: Optional[str] = None
+    raw: Dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(success=bool(data.get('success')), message=data.get('message', ''),
+                   card_type=data.get('cardType'), next_player=data.get('nextPlayer'),
+                   version=data.get('version'), game_over=bool(data.get('gameOver')),
+                   winner=data.get('winner'), raw=data)
+
+
+@dataclass
+class Hand:
+    player_id: int
+    cards: List                     # 牌字典（JSON）或牌面编码（MessagePack）
+    card_count: int
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['playerId'], data['cards'], data['cardCount'])
+
+
+@dataclass
+class GameSnapshot:
+    """/game/state 的完整响应"""
+    version: Optional[int]
+    started: bool
+    game_over: bool
+    winner: Optional[str]
+    current_player: Optional[int]
+    current_level: int
+    players: List[Dict]
+    last_play: Optional[Dict]
+    play_history: List[Dict]
+    raw: Dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(version=data.get('version'), started=bool(data.get('started')),
+                   game_over=bool(data.get('gameOver')), winner=data.get('winner'),
+                   current_player=data.get('currentPlayer'), current_level=data.get('currentLevel', 2),
+                   players=data.get('players', []), last_play=data.get('lastPlay'),
+                   play_history=data.get('playHistory', []), raw=data)
+
+
+@dataclass
+class TurnInfo:
+    """/game/turn/{playerId} 的完整回合信息（增量已合并）；raw 为合并后的原始字典"""
+    player_id: int
+    version: Optional[int]
+    is_my_turn: bool
+    can_play: bool
+    current_player: Optional[int]
+    pass_count: int
+    hand: List                      # 牌字典（JSON）或牌面编码（MessagePack）
+    last_play: Optional[Dict]
+    game: GameSnapshot
+    raw: Dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(player_id=data['playerId'], version=data.get('version'),
+                   is_my_turn=bool(data.get('isMyTurn')), can_play=bool(data.get('canPlay', True)),
+                   current_player=data.get('currentPlayer'), pass_count=data.get('passCount', 0),
+                   hand=data.get('hand', []), last_play=data.get('lastPlay'),
+                   game=GameSnapshot.from_dict(data.get('gameState') or {}), raw=data)
+
+    @property
+    def level(self):
+        return self.game.current_level
+
+    @property
+    def last_card_type(self):
+        """上家出牌的 cardType 字典，首家出牌为 None"""
+        return self.last_play.get('cardType') if self.last_play else None
+
+
+# /game/turn?since= 增量响应中的字段（见 GameState.get_turn_info_delta）
+TURN_DELTA_FIELDS = ('version', 'isMyTurn', 'currentPlayer', 'currentPlayerName',
+                     'lastPlay', 'canPlay', 'passCount')
+STATE_DELTA_FIELDS = ('version', 'started', 'gameOver', 'winner', 'currentPlayer',
+                      'currentPlayerName', 'currentLevel', 'lastPlay', 'passCount')
+
+
+def apply_turn_delta(info, delta):
+    """把增量响应合并到上一次的完整回合信息（字典）上，返回新的完整回合信息"""
+    merged = dict(info)
+    for key in TURN_DELTA_FIELDS:
+        merged[key] = delta[key]
+    if 'hand' in delta:
+        merged['hand'] = delta['hand']
+    state = dict(info.get('gameState') or {})
+    for key in STATE_DELTA_FIELDS:
+        state[key] = delta[key]
+    state['players'] = [dict(p, cardCount=n) for p, n in zip(state.get('players', []), delta['cardCounts'])]
+    state['playHistory'] = (state.get('playHistory', []) + delta['events'])[-10:]
+    merged['gameState'] = state
+    return merged
+
+
+class GuandanClient:
+    """一张牌桌的 API 客户端（线程安全程度同 requests.Session：每个线程/Agent 用自己的实例）"""
+    def __init__(self, server_url='http://localhost:5000', game_id=None, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, pool_size=DEFAULT_POOL_SIZE,
+                 compact=True):
+        self.server_url = server_url.rstrip('/')
+        self.game_id = game_id
+        self.timeout = timeout
+        self.compact = compact
+        self._turns = {}   # 座位 -> 最后一次的完整回合信息（字典），用来合并增量
+        self.seat_tokens = {}   # 座位 -> claim_seat() 得到的令牌
+
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset({'GET', 'HEAD', 'DELETE'}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept'] = codec.accept_header(compact)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _path(self, suffix):
+        """牌桌内的路由：默认牌桌用旧版路由 /game/<suffix>"""
+        return f'/game/{self.game_id}/{suffix}' if self.game_id else f'/game/{suffix}'
+
+    def request(self, method, path, payload=None, timeout=None, headers=None, **params):
+        """发送请求并解码响应；返回解码后的对象（非 2xx 时抛出 GameAPIError）"""
+        kwargs = {'params': params or None, 'timeout': timeout or self.timeout, 'headers': dict(headers or {})}
+        if payload is not None:
+            body, content_type = codec.encode_body(payload, self.compact)
+            kwargs['data'] = body
+            kwargs['headers']['Content-Type'] = content_type
+        resp = self._send(method, path, **kwargs)
+        return self._decode(resp)
+
+    def _send(self, method, path, **kwargs):
+        try:
+            return self.session.request(method, self.server_url + path, **kwargs)
+        except requests.exceptions.Timeout:
+            raise ServerUnavailable("服务器响应超时")
+        except requests.exceptions.ConnectionError:
+            raise ServerUnavailable("无法连接到服务器")
+
+    @staticmethod
+    def _decode(resp):
+        content_type = resp.headers.get('Content-Type', '')
+        if content_type.startswith('text/'):
+            data = resp.text
+        else:
+            try:
+                data = codec.decode_response(resp)
+            except ValueError:
+                data = None
+        if resp.status_code >= 400:
+            message = data.get('error') if isinstance(data, dict) else None
+            message = message or f"HTTP {resp.status_code}"
+            error_class = GameNotStarted if resp.status_code == 400 and message == '游戏未开始' else GameAPIError
+            raise error_class(message, resp.status_code)
+        return data
+
+    # ---- 牌桌 ----
+
+    def create_table(self, game_id=None, start=False):
+        """创建牌桌，返回牌桌概况（字典）"""
+        payload = {'start': start}
+        if game_id is not None:
+            payload['gameId'] = game_id
+        return self.request('POST', '/game/tables', payload)
+
+    def list_tables(self):
+        return self.request('GET', '/game/tables')['tables']
+
+    def close_table(self, game_id=None):
+        return self.request('DELETE', f'/game/tables/{game_id or self.game_id}')
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def metrics(self):
+        return self.request('GET', '/metrics')
+
+    # ---- 对局 ----
+
+    def start(self):
+        return ActionResult.from_dict(self.request('POST', self._path('start')))
+
+    def hand(self, player_id):
+        return Hand.from_dict(self.request('GET', self._path(f'player/{player_id}/hand'),
+                                           headers=self._seat_headers(player_id)))
+
+    def state(self):
+        return GameSnapshot.from_dict(self.request('GET', self._path('state')))
+
+    def history(self):
+        return self.request('GET', self._path('history'))['history']
+
+    def turn(self, player_id, wait=0, since=None):
+        """
+        回合信息；wait > 0 时长轮询（服务器阻塞到轮到该玩家或版本号不等于 since）
+        带 since 且之前取过完整信息时，服务器只返回增量，这里合并后返回完整的 TurnInfo
+        """
+        params = {}
+        if wait > 0:
+            params['wait'] = wait
+        previous = self._turns.get(player_id)
+        if since is not None and previous is not None:
+            params['since'] = since
+        data = self.request('GET', self._path(f'turn/{player_id}'), timeout=self.timeout + wait,
+                            headers=self._seat_headers(player_id), **params)
+        if data.get('delta'):
+            data = apply_turn_delta(previous, data)
+        self._turns[player_id] = data
+        return TurnInfo.from_dict(data)
+
+    def play(self, player_id, cards):
+        """出牌；cards 为牌字典或牌面编码"""
+        return ActionResult.from_dict(self.request('POST', self._path('play'),
+                                                   {'playerId': player_id, 'cards': cards}))
+
+    def pass_turn(self, player_id):
+        return ActionResult.from_dict(self.request('POST', self._path('pass'), {'playerId': player_id}))
+
+    # ---- 座位与事件流 ----
+
+    def claim_seat(self, player_id):
+        """认领座位，返回座位令牌（也记在 seat_tokens 里）；已被认领时抛出 GameAPIError（409）"""
+        token = self.request('POST', self._path(f'seats/{player_id}/claim'))['token']
+        self.seat_tokens[player_id] = token
+        return token
+
+    def _seat_headers(self, player_id):
+        """认领过的座位，取手牌和回合信息时出示令牌"""
+        token = self.seat_tokens.get(player_id)
+        return {'X-Seat-Token': token} if token else None
+
+    def release_seat(self, player_id):
+        """释放 claim_seat() 认领的座位"""
+        token = self.seat_tokens.pop(player_id, None)
+        if token is not None:
+            self.request('DELETE', self._path(f'seats/{player_id}'), headers={'X-Seat-Token': token})
+
+    def events(self, player_id=None, last_event_id=None, heartbeat=DEFAULT_HEARTBEAT):
+        """
+        订阅事件流（SSE），逐条产生事件字典；player_id 不为 None 时订阅该座位的私有事件流（需要先 claim_seat）
+        - 带序号的事件有 'id' 字段，断线后作为 last_event_id 传入即可补发错过的事件
+        - 每个心跳产生一次 None，调用方借此检查停止标志
+        - 服务器关闭连接时生成器结束；连接失败、超过心跳间隔没有数据时抛出 ServerUnavailable
+        """
+        if player_id is None:
+            path, headers = self._path('events'), {}
+        else:
+            path, headers = self._path(f'seats/{player_id}/events'), {'X-Seat-Token': self.seat_tokens[player_id]}
+        headers['Accept'] = 'text/event-stream'
+        if last_event_id is not None:
+            headers['Last-Event-ID'] = str(last_event_id)
+        resp = self._send('GET', path, headers=headers, params={'heartbeat': heartbeat}, stream=True,
+                          timeout=(self.timeout, heartbeat + self.timeout))
+        with resp:
+            if resp.status_code >= 400:
+                self._decode(resp)
+            event_id, lines = None, []
+            try:
+                for line in resp.iter_lines(decode_unicode=True):
+                    if line.startswith(':'):
+                        yield None   # 心跳
+                    elif line.startswith('id:'):
+                        event_id = int(line[3:])
+                    elif line.startswith('data:'):
+                        lines.append(line[5:].strip())
+                    elif not line and lines:
+                        event = json.loads('\n'.join(lines))
+                        if event_id is not None:
+                            event['id'] = event_id
+                        event_id, lines = None, []
+                        yield event
+            except requests.exceptions.RequestException:
+                raise ServerUnavailable("事件流连接中断")
@@ -2,29 +2,220 @@
 掼蛋 LLM AI Agent - 使用 Deepseek 或其他 LLM 驱动的 AI
 """
 
-import requests
+import logging
 import time
-import json
 import threading
-import sys
 import os
-from typing import List, Dict
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+from typing import List
 from openai import OpenAI
+import codec
+import llm_cache
+import rules
+from llm_prompt import (ANSWER_MAX_TOKENS, DEFAULT_MAX_CANDIDATES, SYSTEM_PROMPT, candidate_moves,
+                        parse_choice, turn_prompt)
+from ai_agent import GuandanAIAgent, simple_websocket
+from guandan_client import GuandanClient, TurnInfo, ActionResult
+
+logger = logging.getLogger('guandan.agent')
+
+# 提示词的版本，写进决策缓存的命名空间；修改提示词后加一，旧的缓存决策不再命中
+PROMPT_VERSION = 3
+
+DEFAULT_TURN_DEADLINE = 10   # 秒
+
+
+def timed_call(decide, *args):
+    """decide(*args) -> (结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = decide(*args)
+    return result, time.perf_counter() - start
+
+
+class Speculator:
+    """
+    预测执行：轮到自己之前，在线程池里先为最可能出现的局面调用 LLM，
+    轮到自己时局面相同就接着用这个请求（claim），省掉这部分 LLM 延迟
+    
+    decide(*args) 返回 LLM 的回答文本；局面用 llm_cache.situation_key 标识；
+    用上的请求由调用方通过 settle() 记入命中统计
+    """
+    def __init__(self, decide, max_workers=2):
+        self._decide = decide
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix='llm-speculate')
+        self._jobs = {}   # 局面键 -> Future[(回答文本, LLM 耗时)]
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.saved = 0.0  # 省下的 LLM 等待时间（秒）
+    
+    def submit(self, situations):
+        """
+        开始新一轮预测：situations 为 {局面键: decide 的参数元组}
+        已经在算的局面不重复提交，不在其中的旧请求作废
+        """
+        with self._lock:
+            for key in [k for k in self._jobs if k not in situations]:
+                self._discard(key)
+            for key, args in situations.items():
+                if key not in self._jobs:
+                    self._jobs[key] = self._pool.submit(timed_call, self._decide, *args)
+                    self.started += 1
+    
+    def prepare(self, fetch):
+        """
+        在预测线程池里执行 fetch()（拉取局面后调用 submit），调用方（推送模式的事件循环）不必等它
+        线程池已关闭时忽略
+        """
+        try:
+            self._pool.submit(fetch)
+        except RuntimeError:
+            pass
+    
+    def claim(self, key):
+        """
+        轮到自己：取走该局面的预测请求（Future[(回答文本, LLM 耗时)]），没有预测返回 None
+        其余的预测都已过时，一并作废
+        """
+        with self._lock:
+            future = self._jobs.pop(key, None)
+            for other in list(self._jobs):
+                self._discard(other)
+        return future
+    
+    def settle(self, hit, saved=0.0):
+        """记录这一回合预测是否用上，以及省下的等待时间（秒）"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.saved += max(saved, 0.0)
+            else:
+                self.misses += 1
+    
+    def cancel(self):
+        """作废所有预测（例如本局结束）"""
+        with self._lock:
+            for key in list(self._jobs):
+                self._discard(key)
+    
+    def _discard(self, key):
+        # 还在排队的直接取消；已经在调用的无法中断，返回后结果丢弃
+        self._jobs.pop(key).cancel()
+        self.discarded += 1
+    
+    def stats(self):
+        turns = self.hits + self.misses
+        return {
+            'started': self.started,
+            'hits': self.hits,
+            'misses': self.misses,
+            'discarded': self.discarded,
+            'hitRate': self.hits / turns if turns else 0.0,
+            'savedSeconds': self.saved,
+        }
+    
+    def shutdown(self):
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class LLMUsage:
+    """LLM 调用的 token 数和延迟累计（预测执行在线程池里调用，所以加锁）"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0      # 命中服务商前缀缓存的 prompt tokens
+        self.completion_tokens = 0
+        self.ttft = 0.0             # 首 token 延迟之和（秒）
+        self.duration = 0.0
+    
+    def record(self, prompt_tokens, cached_tokens, completion_tokens, ttft, duration):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.completion_tokens += completion_tokens
+            self.ttft += ttft
+            self.duration += duration
+    
+    def stats(self):
+        calls = self.calls or 1
+        return {
+            'calls': self.calls,
+            'promptTokens': self.prompt_tokens,
+            'cachedTokens': self.cached_tokens,
+            'completionTokens': self.completion_tokens,
+            'avgPromptTokens': self.prompt_tokens / calls,
+            'avgTtft': self.ttft / calls,
+            'avgDuration': self.duration / calls,
+        }
+
+
+class DeadlineStats:
+    """回合期限的统计：超时次数、对冲请求，以及最近 1000 回合的 LLM 决策耗时"""
+    def __init__(self):
+        self.turns = 0
+        self.misses = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.durations = deque(maxlen=1000)
+    
+    def record(self, duration, missed, hedged, hedge_won):
+        self.turns += 1
+        self.misses += missed
+        self.hedges += hedged
+        self.hedge_wins += hedge_won
+        self.durations.append(duration)
+    
+    def stats(self):
+        ordered = sorted(self.durations)
+        
+        def quantile(q):
+            return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+        return {
+            'turns': self.turns,
+            'misses': self.misses,
+            'missRate': self.misses / self.turns if self.turns else 0.0,
+            'hedges': self.hedges,
+            'hedgeWins': self.hedge_wins,
+            'p50': quantile(0.5),
+            'p95': quantile(0.95),
+            'max': ordered[-1] if ordered else 0.0,
+        }
+
+
+def _cached_tokens(usage):
+    """usage 里命中前缀缓存的 prompt tokens（DeepSeek: prompt_cache_hit_tokens，OpenAI: prompt_tokens_details）"""
+    hit = getattr(usage, 'prompt_cache_hit_tokens', None)
+    if hit is None:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        hit = getattr(details, 'cached_tokens', None)
+    return hit or 0
+
 
 class LLMGuandanAIAgent:
     def __init__(self, server_url='http://localhost:5000', player_id=2, 
-                 api_key=None, api_base=None, model='deepseek-chat'):
+                 api_key=None, api_base=None, model='deepseek-chat', transport=None, cache=None,
+                 speculate=None, game_id=None, turn_deadline=None, hedge_after=None):
         self.server_url = server_url
         self.player_id = player_id
         self.game_history = []
         self.last_play = None
         self.stop_event = threading.Event()
         
-        # 创建带超时的 requests session
-        self.session = requests.Session()
-        self.session.timeout = 3
+        # 游戏 API 客户端（见 guandan_client.py），默认请求紧凑编码，交给 LLM 之前再换回牌字典
+        # self.client 是 LLM 客户端
+        self.game_client = GuandanClient(server_url, game_id=game_id)
+        self.session = self.game_client.session
+        # 'push'（默认，座位私有事件流）、'http'（长轮询）或 'ws'，同 ai_agent.GuandanAIAgent
+        self.transport = transport or os.getenv('AGENT_TRANSPORT', 'push')
+        if self.transport == 'ws' and simple_websocket is None:
+            raise RuntimeError("WebSocket 传输需要安装 simple-websocket")
+        self.socket = None
         
         # 玩家位置映射
         self.position_map = {
@@ -42,234 +233,373 @@ class LLMGuandanAIAgent:
         if not self.api_key:
             raise ValueError("需要提供 DEEPSEEK_API_KEY 环境变量或 api_key 参数")
         
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.api_base
-        )
+        # 决策缓存（见 llm_cache.py）：默认内存 + SQLite 文件 LLM_CACHE_PATH（设为空则只用内存），
+        # 多个 Agent 进程共用同一个文件；cache=False 关闭缓存
+        if cache is None:
+            cache = llm_cache.DecisionCache(os.getenv('LLM_CACHE_PATH', 'llm_cache.sqlite3') or None,
+                                            ttl=float(os.getenv('LLM_CACHE_TTL', llm_cache.DEFAULT_TTL)))
+        self.cache = cache or None
+        self.cache_namespace = f'{model}/v{PROMPT_VERSION}'
+        self.usage = LLMUsage()
+        # 发给 LLM 的候选出法个数上限（见 llm_prompt.candidate_moves）
+        self.max_candidates = int(os.getenv('LLM_MAX_CANDIDATES', DEFAULT_MAX_CANDIDATES))
+        
+        # 预测执行（见 Speculator）：上家开始行动时就为"上家过牌后"的局面调用 LLM；
+        # 会多花一些 LLM 调用，默认关闭，speculate=True 或环境变量 LLM_SPECULATE=1 开启
+        if speculate is None:
+            speculate = os.getenv('LLM_SPECULATE', '') not in ('', '0')
+        self.speculator = Speculator(self.get_llm_decision) if speculate else None
+        
+        # 回合期限（见 _await_llm）：LLM 超过 turn_deadline 秒（环境变量 LLM_TURN_DEADLINE，默认 10，0 表示不限）
+        # 还没有回答就改用规则 AI 的决策；hedge_after 秒（LLM_HEDGE_AFTER，默认 0 即不对冲）后还没有回答就再发一个相同的请求
+        if turn_deadline is None:
+            turn_deadline = float(os.getenv('LLM_TURN_DEADLINE', DEFAULT_TURN_DEADLINE))
+        if hedge_after is None:
+            hedge_after = float(os.getenv('LLM_HEDGE_AFTER', 0))
+        self.turn_deadline = turn_deadline
+        self.hedge_after = hedge_after
+        self.deadline_stats = DeadlineStats()
+        
+        # 有回合期限时单次请求最多等 turn_deadline 秒、不自动重试：过了期限的回答已经用不上，
+        # 不能让放弃的请求按 SDK 默认的 600 秒占着 _llm_pool 的线程（失败的请求由对冲补上）
+        limits = {'timeout': turn_deadline, 'max_retries': 0} if turn_deadline else {}
+        self.client = OpenAI(api_key=self.api_key, base_url=self.api_base, **limits)
+        # 超过期限的请求要等超时才会结束，期间继续占着线程，所以多留几个线程
+        self._llm_pool = ThreadPoolExecutor(4, thread_name_prefix='llm')
         
         # 可配置的延迟
+        self.long_poll_wait = 5
         self.poll_interval = 0.1
         self.error_retry_interval = 0.5
+        self.state_version = None
+        self.turn_info = None
         
-        self._log(f"✅ LLM AI Agent 初始化完成 (model={model}, position={self.position})")
+        self._log("✅ LLM AI Agent 初始化完成 (model=%s, position=%s)", model, self.position)
     
-    def _log(self, message):
-        """打印带方位的日志"""
-        print(f"[{self.position}(LLM)] {message}", flush=True)
+    def _log(self, message, *args, level=logging.INFO):
+        """带方位的日志；args 按 % 格式化，只在该级别开启时才格式化"""
+        if logger.isEnabledFor(level):
+            logger.log(level, "[%s(LLM)] " + message, self.position, *args)
     
-    def get_turn_info(self) -> Dict:
-        """获取该玩家的回合信息"""
+    def get_turn_info(self, wait=0, since=None) -> TurnInfo:
+        """
+        获取该玩家的回合信息
+        wait > 0 时使用长轮询；带 since 时增量响应由客户端合并成完整的回合信息
+        """
         if self.stop_event.is_set():
             raise Exception("已请求停止")
         
-        url = f'{self.server_url}/game/turn/{self.player_id}'
-        try:
-            resp = self.session.get(url, timeout=3)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            if 'error' in data:
-                raise Exception(f"服务器错误: {data['error']}")
-            
-            return data
-        except requests.exceptions.ConnectionError:
-            raise Exception("无法连接到服务器")
-        except requests.exceptions.Timeout:
-            raise Exception("服务器响应超时")
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 400:
-                raise Exception("游戏未开始")
-            raise Exception(f"HTTP {e.response.status_code}")
-        except Exception as e:
-            raise Exception(f"获取回合信息失败: {e}")
+        if self.transport == 'ws':
+            return self._socket_turn_info(wait)
+        
+        info = self.game_client.turn(self.player_id, wait=wait, since=since)
+        self.turn_info = info
+        return info
     
-    def get_hand(self) -> List[Dict]:
+    # WebSocket 传输、推送模式和错误打印与规则 AI 相同
+    _connect_socket = GuandanAIAgent._connect_socket
+    _close_socket = GuandanAIAgent._close_socket
+    _socket_call = GuandanAIAgent._socket_call
+    _socket_turn_info = GuandanAIAgent._socket_turn_info
+    _run_push = GuandanAIAgent._run_push
+    _act_on_turn = GuandanAIAgent._act_on_turn
+    _report_error = GuandanAIAgent._report_error
+    
+    def get_hand(self) -> List:
         """获取手牌"""
-        url = f'{self.server_url}/game/player/{self.player_id}/hand'
-        resp = requests.get(url)
-        data = resp.json()
-        return data['cards']
-    
-    def get_game_state(self) -> Dict:
-        """获取游戏状态"""
-        url = f'{self.server_url}/game/state'
-        resp = requests.get(url)
-        return resp.json()
-    
-    def play_cards(self, cards: List[Dict]) -> Dict:
-        """出牌"""
-        url = f'{self.server_url}/game/play'
-        payload = {
-            'playerId': self.player_id,
-            'cards': cards
-        }
-        resp = requests.post(url, json=payload)
-        return resp.json()
+        return self.game_client.hand(self.player_id).cards
+    
+    def get_game_state(self):
+        """获取游戏状态（GameSnapshot）"""
+        return self.game_client.state()
+    
+    def play_cards(self, cards: List) -> ActionResult:
+        """出牌（cards 为牌字典或牌面编码）"""
+        if self.transport == 'ws':
+            return self._socket_call(lambda sock: sock.play(cards))
+        return self.game_client.play(self.player_id, cards)
     
-    def pass_turn(self) -> Dict:
+    def pass_turn(self) -> ActionResult:
         """过牌"""
-        url = f'{self.server_url}/game/pass'
-        payload = {'playerId': self.player_id}
-        resp = requests.post(url, json=payload)
-        return resp.json()
-    
-    def format_cards_for_llm(self, cards: List[Dict]) -> str:
-        """格式化牌组给 LLM"""
-        if not cards:
-            return "无"
-        return "、".join([f"{c['value']}{c['suit']}" for c in cards])
-    
-    def get_llm_decision(self, hand: List[Dict], last_play: Dict) -> str:
+        if self.transport == 'ws':
+            return self._socket_call(lambda sock: sock.pass_turn())
+        return self.game_client.pass_turn(self.player_id)
+    
+    def get_llm_decision(self, hand_faces: List[int], last_play, level, candidates) -> str:
         """
-        使用 LLM 做决策
-        返回: 决策 ('play', 'pass', 或具体的牌组)
+        使用 LLM 做决策：固定的系统提示词 + 局面和编号的候选出法（见 llm_prompt.py），流式接收，
+        记录首 token 延迟和 token 数（self.usage）
+        last_play 为 (牌型名称, 牌面)，首家出牌为 None
+        返回: LLM 的回答文本（候选编号），调用失败返回 None
         """
         try:
-            # 格式化手牌
-            hand_str = self.format_cards_for_llm(hand)
-            
-            # 格式化上家出牌
-            if last_play and not last_play.get('isPass', True):
-                last_card_type = last_play['cardType']['name']
-                last_cards_str = self.format_cards_for_llm(last_play['cards'])
-                opponent_play = f"{last_card_type}: {last_cards_str}"
-            else:
-                opponent_play = "新一轮（首家出牌）"
+            prompt = turn_prompt(hand_faces, last_play, level, candidates)
             
-            # 构建 prompt
-            prompt = f"""你是一个掼蛋卡牌游戏的 AI 玩家。掼蛋是一个中国的四人纸牌游戏。
-
-当前手牌: {hand_str}
-
-对手最后出的牌: {opponent_play}
-
-规则说明:
-- 单牌可以压单牌（点数更大）
-- 对子可以压对子（点数更大）
-- 三张可以压三张（点数更大）
-- 炸弹（4张及以上相同的牌）可以压任何其他牌型
-- 不同牌型之间不能比较（除非你用炸弹）
-- 牌的大小顺序: 3 < 4 < 5 < 6 < 7 < 8 < 9 < 10 < J < Q < K < A < 2 < 小王 < 大王
-
-根据上述规则，决策如下：
-1. 如果能压过对手，请选择最优的牌（尽量用小牌，节约大牌）
-2. 如果无法压过对手，选择过牌
-3. 如果是新一轮，出一个最小的单牌或对子
-
-请直接回答:
-- 如果过牌，回答: "过牌"
-- 如果出牌，回答: "出牌: X X X" (用中文数字或花色字符，例如: "出牌: 3♠ 4♥ 5♦")
-
-注意: 只回答一行，不要解释理由！"""
-
-            # 调用 LLM
-            response = self.client.messages.create(
+            start = time.perf_counter()
+            ttft = None
+            parts = []
+            usage = None
+            stream = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                max_tokens=100
+                max_tokens=ANSWER_MAX_TOKENS,
+                stream=True,
+                stream_options={"include_usage": True}
             )
+            for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    parts.append(chunk.choices[0].delta.content)
+            duration = time.perf_counter() - start
             
-            decision_text = response.choices[0].message.content.strip()
-            self._log(f"LLM 决策: {decision_text}")
+            decision_text = ''.join(parts).strip()
+            if usage is not None:
+                cached = _cached_tokens(usage)
+                self.usage.record(usage.prompt_tokens, cached, usage.completion_tokens, ttft or duration, duration)
+                self._log("LLM 决策: %s（首 token %.0fms，共 %.0fms，prompt %d tokens，缓存命中 %d，completion %d）",
+                          decision_text, (ttft or duration) * 1000, duration * 1000,
+                          usage.prompt_tokens, cached, usage.completion_tokens)
+            else:
+                self._log("LLM 决策: %s（首 token %.0fms，共 %.0fms）", decision_text, (ttft or duration) * 1000, duration * 1000)
             return decision_text
         
         except Exception as e:
-            self._log(f"❌ LLM 调用失败: {e}")
-            return "过牌"  # 出错时默认过牌
-    
-    def parse_llm_decision(self, decision_text: str, hand: List[Dict]) -> tuple:
-        """
-        解析 LLM 的决策文本
-        返回: (action, cards) 其中 action 是 'play' 或 'pass'，cards 是要出的牌列表
-        """
-        if "过牌" in decision_text:
-            return ("pass", [])
-        
-        if "出牌:" in decision_text or "出牌：" in decision_text:
-            # 提取出牌的牌面
-            cards_str = decision_text.split("出牌")[1].strip().replace(":", "").replace("：", "").strip()
-            
-            # 尝试匹配手牌
-            selected_cards = []
-            
-            # 分割牌
-            card_tokens = cards_str.replace("、", " ").replace("，", " ").split()
-            
-            for token in card_tokens:
-                if not token:
-                    continue
-                
-                # 提取值和花色
-                value = token[:-1] if len(token) > 1 else token
-                suit = token[-1] if len(token) > 0 else None
-                
-                # 在手牌中查找
-                for card in hand:
-                    if card['value'] == value and card['suit'] == suit and card not in selected_cards:
-                        selected_cards.append(card)
-                        break
-            
-            if selected_cards:
-                return ("play", selected_cards)
-        
-        # 默认过牌
-        return ("pass", [])
+            self._log("❌ LLM 调用失败: %s", e, level=logging.ERROR)
+            return None  # 调用方按过牌处理，不写入缓存
     
-    def make_decision(self) -> bool:
+    def make_decision(self, info=None) -> bool:
         """做出决策"""
         try:
-            info = self.get_turn_info()
-            
-            if not isinstance(info, dict) or 'isMyTurn' not in info:
-                self._log(f"错误: 无效的回合信息")
-                return False
+            if info is None:
+                info = self.get_turn_info()
             
-            if not info['isMyTurn']:
-                self._log("不是我的回合，等待...")
+            if not info.is_my_turn:
+                self._log("不是我的回合，等待...", level=logging.DEBUG)
                 return False
             
-            hand = info.get('hand', [])
-            last_play = info.get('lastPlay')
+            hand = codec.expand_cards(info.hand)
+            self._log("轮到我了！手牌数: %d", len(hand))
             
-            self._log(f"轮到我了！手牌数: {len(hand)}")
+            level = info.level
+            last_card_type = info.last_card_type
+            last_type = rules.type_from_dict(last_card_type) if last_card_type else None
             
-            # 使用 LLM 做决策
-            decision_text = self.get_llm_decision(hand, last_play)
-            action, cards = self.parse_llm_decision(decision_text, hand)
+            # 相同局面先查决策缓存
+            hand_faces = codec.to_faces(info.hand) or []
+            key = llm_cache.situation_key(hand_faces, last_type, level, self.cache_namespace)
+            cached = self._cached_decision(key, hand_faces, last_type, level)
+            if cached is not None:
+                action, cards = cached
+            else:
+                action, cards = self._llm_decision(key, hand_faces, info.last_play, last_type, level)
             
-            if action == "pass":
-                result = self.pass_turn()
-                self._log("选择过牌")
-                return False
-            elif action == "play" and cards:
-                card_str = self.format_cards_for_llm(cards)
+            if action == "play" and cards:
+                card_str = '、'.join(f"{c['value']}{c['suit']}" for c in cards)
                 result = self.play_cards(cards)
                 
-                if result['success']:
-                    card_type = result.get('cardType', {}).get('name', '?')
-                    self._log(f"✅ 出了 {card_type}: {card_str}")
+                if result.success:
+                    card_type = (result.card_type or {}).get('name', '?')
+                    self._log("✅ 出了 %s: %s", card_type, card_str)
                     return True
                 else:
-                    self._log(f"❌ 出牌失败: {result.get('message', '未知错误')}")
+                    self._log("❌ 出牌失败: %s", result.message or '未知错误', level=logging.WARNING)
                     # 出牌失败就过牌
                     self.pass_turn()
                     return False
             else:
-                # 无法解析，过牌
                 result = self.pass_turn()
-                self._log("无法解析 LLM 决策，选择过牌")
+                self._log("选择过牌")
                 return False
         
         except Exception as e:
-            self._log(f"错误: {e}")
+            self._log("错误: %s", e, level=logging.ERROR)
             return False
     
+    def _llm_decision(self, key, hand_faces, last_play, last_type, level):
+        """
+        让 LLM 从候选出法里选一个（见 llm_prompt.py），返回 (action, cards)
+        压不过时不调用 LLM 直接过牌；LLM 超过回合期限、调用失败或回答无效时改用规则 AI 的决策；
+        只缓存 LLM 明确给出的选择
+        """
+        start = time.perf_counter()
+        counts = rules.counts_from_faces(hand_faces)
+        candidates = candidate_moves(counts, last_type, level, self.max_candidates)
+        if not candidates:
+            return ("pass", [])
+        args = (hand_faces, self._describe_last(last_play), level, candidates)
+        # 预测执行已经为这个局面发出的请求直接接着用
+        spec = self.speculator.claim(key) if self.speculator is not None else None
+        first = spec or self._submit_llm(args)
+        pending = {first} if first is not None else set()
+        # LLM 请求在后台进行，同时算好规则 AI 的决策（与 GuandanAIAgent.make_decision 相同）作为兜底
+        fallback = GuandanAIAgent.choose_move(rules.legal_moves(counts, last_type, level), last_type is None)
+        decision_text = self._await_llm(pending, spec, args, start)
+        
+        choice = parse_choice(decision_text, len(candidates), allow_pass=last_type is not None)
+        if choice is None:
+            if decision_text is not None:
+                self._log("⚠️  LLM 回答无效: %r，改用规则决策", decision_text, level=logging.WARNING)
+            move = fallback
+        else:
+            move = candidates[choice - 1] if choice else None
+            if self.cache is not None:
+                self.cache.put(key, llm_cache.encode_decision(move, level))
+        if move is None:
+            return ("pass", [])
+        return ("play", rules.move_to_dicts(move))
+    
+    def _await_llm(self, pending, spec, args, start):
+        """
+        等 LLM 的回答，最多等到回合期限（从回合开始 start 算起 turn_deadline 秒）:
+        - hedge_after 秒后还没有回答就再发一个相同的请求，先返回的有效回答为准
+        - 预测执行的请求（spec）失败时补发一次普通请求
+        返回回答文本；超过期限或请求都失败时返回 None。超时的请求无法中断，返回后结果丢弃
+        请求抛出异常或被取消（Agent 退出时线程池以 cancel_futures=True 关闭）都算作失败
+        """
+        deadline = start + self.turn_deadline if self.turn_deadline else None
+        hedge_at = None
+        if self.hedge_after and (deadline is None or self.hedge_after < self.turn_deadline):
+            hedge_at = start + self.hedge_after
+        hedge = winner = None
+        text = None
+        duration = 0.0
+        timed_out = False
+        while pending and text is None:
+            wake = hedge_at if hedge is None and hedge_at is not None else deadline
+            timeout = None if wake is None else max(wake - time.perf_counter(), 0.0)
+            # 被 cancel() 取消的 Future 不会让 wait() 返回，先挑出来按失败处理
+            cancelled = {future for future in pending if future.cancelled()}
+            if cancelled:
+                done, pending = cancelled, pending - cancelled
+            else:
+                done, pending = wait(pending, timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text, duration = future.result()
+                except CancelledError:
+                    text = None
+                except Exception as e:
+                    self._log("LLM 请求失败: %s", e, level=logging.WARNING)
+                    text = None
+                if text is not None:
+                    winner = future
+                    break
+                if future is spec and not pending:
+                    retry = self._submit_llm(args)
+                    if retry is not None:
+                        pending.add(retry)
+            if not done:
+                if hedge is None and hedge_at is not None:
+                    hedge = self._submit_llm(args)
+                    if hedge is None:
+                        hedge_at = None
+                    else:
+                        pending.add(hedge)
+                else:
+                    timed_out = True
+                    break
+        
+        elapsed = time.perf_counter() - start
+        if self.speculator is not None:
+            hit = spec is not None and winner is spec
+            self.speculator.settle(hit, duration - elapsed if hit else 0.0)
+        self.deadline_stats.record(elapsed, timed_out, hedge is not None, hedge is not None and winner is hedge)
+        if timed_out:
+            self._log("⏱️  LLM 超过回合期限 (%.1fs)，改用规则决策", self.turn_deadline, level=logging.WARNING)
+        return text
+    
+    def _submit_llm(self, args):
+        """在 LLM 线程池里发一个请求，返回 Future；线程池已关闭（Agent 正在退出）时返回 None"""
+        try:
+            return self._llm_pool.submit(timed_call, self.get_llm_decision, *args)
+        except RuntimeError:
+            return None
+    
+    @staticmethod
+    def _describe_last(last_play):
+        """回合信息里的 lastPlay -> (牌型名称, 牌面)，首家出牌为 None"""
+        if not last_play or last_play.get('isPass', True):
+            return None
+        return (last_play['cardType']['name'], codec.to_faces(last_play.get('cards', [])) or [])
+    
+    def _cached_decision(self, key, hand_faces, last_type, level):
+        """缓存里相同局面的决策，落到当前手牌上返回 (action, cards)；未命中返回 None"""
+        if self.cache is None:
+            return None
+        decision = self.cache.get(key)
+        if decision is None:
+            return None
+        try:
+            move = llm_cache.resolve(decision, rules.counts_from_faces(hand_faces), last_type, level)
+        except LookupError:
+            self.cache.mark_unusable()
+            return None
+        self._log("♻️  决策缓存命中", level=logging.DEBUG)
+        if move is None:
+            return ("pass", [])
+        return ("play", rules.move_to_dicts(move))
+    
+    def _on_event(self, event):
+        """
+        推送模式：上家开始行动时预测；本局结束时作废所有预测
+        事件里没有手牌和上一手的牌面，拉取回合信息放到预测线程池里做，不耽误事件流
+        """
+        if self.speculator is None or event.get('type') != 'turn':
+            return
+        if event.get('gameOver'):
+            self.speculator.cancel()
+        elif event.get('nextPlayer') == (self.player_id - 1) % 4:
+            self.speculator.prepare(self._fetch_and_speculate)
+    
+    def _fetch_and_speculate(self):
+        """预测线程池里：拉取完整的回合信息，还是上家在行动就预测（已经轮到自己时不再预测）"""
+        try:
+            info = self.game_client.turn(self.player_id)
+        except Exception as e:
+            self._log("预测执行跳过: %s", e, level=logging.DEBUG)
+            return
+        if info.current_player == (self.player_id - 1) % 4:
+            self._speculate(info)
+    
+    def _speculate(self, info):
+        """
+        上家正要行动：为上家过牌后自己面对的局面提前调用 LLM
+        - 最后一手是自己出的（另外两家已过）：上家再过就轮到自己首家出牌
+        - 最后一手是别人出的：上家过牌后自己要压的还是这一手
+        上家首家出牌时自己要面对的牌无法预知，不做预测
+        """
+        last_play = info.last_play
+        if info.game.game_over or not last_play:
+            return
+        hand_faces = codec.to_faces(info.hand) or []
+        if last_play.get('playerId') == self.player_id:
+            last_type, last_play = None, None
+        else:
+            last_type = rules.type_from_dict(last_play['cardType'])
+            last_play = self._describe_last(last_play)
+        level = info.level
+        key = llm_cache.situation_key(hand_faces, last_type, level, self.cache_namespace)
+        candidates = candidate_moves(rules.counts_from_faces(hand_faces), last_type, level, self.max_candidates)
+        if not candidates or (self.cache is not None and self.cache.contains(key)):
+            # 压不过（不用问 LLM）或已有缓存
+            self.speculator.cancel()
+            return
+        self._log("🔮 预测执行: %s", "首家出牌" if last_type is None else "压过当前出牌", level=logging.DEBUG)
+        self.speculator.submit({key: (hand_faces, last_play, level, candidates)})
+    
     def run(self, max_turns=None):
         """AI Agent 主循环"""
         self._log("LLM AI Agent 启动")
+        if self.transport == 'push' and self._run_push(max_turns):
+            self._on_stopped()
+            return
         turns = 0
         consecutive_errors = 0
         
@@ -278,38 +608,59 @@ class LLMGuandanAIAgent:
                 if self.stop_event.is_set():
                     break
                 
-                info = self.get_turn_info()
+                info = self.get_turn_info(wait=self.long_poll_wait, since=self.state_version)
                 consecutive_errors = 0
                 
-                if not isinstance(info, dict) or 'isMyTurn' not in info:
-                    if turns == 0 or turns % 10 == 0:
-                        self._log("等待游戏开始...")
-                else:
-                    if info['isMyTurn']:
-                        self.make_decision()
+                version = info.version
+                # 本局结束后 canPlay 为 False，不再做决策
+                if info.is_my_turn and info.can_play:
+                    if version is not None and version == self.state_version:
+                        if self.stop_event.wait(self.poll_interval):
+                            break
+                    self.make_decision(info)
+                elif self.speculator is not None and info.current_player == (self.player_id - 1) % 4:
+                    self._speculate(info)
+                self.state_version = version
                 
-                if self.stop_event.wait(self.poll_interval):
+                if version is None and self.stop_event.wait(self.poll_interval):
                     break
                 turns += 1
             
             except Exception as e:
-                error_msg = str(e)
                 consecutive_errors += 1
-                
-                if "已请求停止" in error_msg:
+                if not self._report_error(e, consecutive_errors):
                     break
                 
-                if "游戏未开始" in error_msg:
-                    if consecutive_errors <= 1:
-                        self._log("⏳ 等待游戏开始...")
-                elif "无法连接" in error_msg or "超时" in error_msg:
-                    if consecutive_errors % 10 == 1:
-                        self._log(f"⚠️  {error_msg}")
-                else:
-                    self._log(f"❌ {error_msg}")
-                
                 if self.stop_event.wait(self.error_retry_interval):
                     break
                 turns += 1
         
+        self._on_stopped()
+    
+    def _on_stopped(self):
+        """主循环退出：关闭连接，打印决策缓存的命中统计"""
+        self._close_socket()
+        if self.cache is not None:
+            stats = self.cache.stats()
+            self._log("决策缓存: 命中 %d 次, 未命中 %d 次, 命中率 %.0f%%",
+                      stats['hits'], stats['misses'], stats['hitRate'] * 100)
+        if self.usage.calls:
+            stats = self.usage.stats()
+            self._log("LLM 调用 %d 次: 平均 prompt %.0f tokens（缓存命中共 %d）, completion 共 %d tokens, "
+                      "平均首 token %.0fms, 平均耗时 %.0fms",
+                      stats['calls'], stats['avgPromptTokens'], stats['cachedTokens'], stats['completionTokens'],
+                      stats['avgTtft'] * 1000, stats['avgDuration'] * 1000)
+        if self.deadline_stats.turns:
+            stats = self.deadline_stats.stats()
+            self._log("回合期限 %s: LLM 决策 %d 次, 超时 %d 次 (%.1f%%), 对冲请求 %d 次（先返回 %d 次）, "
+                      "耗时 p50 %.0fms / p95 %.0fms / 最长 %.0fms",
+                      f'{self.turn_deadline:.1f}s' if self.turn_deadline else '不限', stats['turns'], stats['misses'], stats['missRate'] * 100,
+                      stats['hedges'], stats['hedgeWins'], stats['p50'] * 1000, stats['p95'] * 1000, stats['max'] * 1000)
+        self._llm_pool.shutdown(wait=False, cancel_futures=True)
+        if self.speculator is not None:
+            stats = self.speculator.stats()
+            self._log("预测执行: 发起 %d 次, 命中 %d 次, 命中率 %.0f%%, 作废 %d 次, 共节省 %.1f 秒",
+                      stats['started'], stats['hits'], stats['hitRate'] * 100,
+                      stats['discarded'], stats['savedSeconds'])
+            self.speculator.shutdown()
         self._log("🛑 LLM AI Agent 已停止")
@@ -0,0 +1,188 @@
+"""
+LLM 决策缓存 - 相同局面直接复用 LLM 之前的决策，不再调用 LLM
+
+局面的规范编码（situation_key）只包含提示词里决定决策的信息:
+    等级、手牌各点数的张数（不分花色，逢人配单独计数）、上家出牌的牌型（首家出牌为 lead）、命名空间（模型 + 提示词版本）
+决策按牌型 + 点数保存（encode_decision）；复用时在当前手牌的合法出法里找牌型和点数组成都相同的一手（resolve），
+找不到（例如缓存里是同花顺，而这手牌只凑得出普通顺子）就当作未命中。
+
+两级存储:
+- 内存：LRU + TTL，命中只是一次字典查找
+- SQLite（可选）：同一个文件可以被多个 Agent 进程共享（WAL 模式），内存未命中时查询，命中后放回内存
+
+    cache = DecisionCache('llm_cache.sqlite3')
+    key = situation_key(faces, last_type, level, namespace='deepseek-chat/v1')
+    decision = cache.get(key)        # None 表示未命中
+    cache.put(key, encode_decision(move, level))
+    cache.stats()                    # {'hits': ..., 'misses': ..., 'hitRate': ...}
+"""
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import rules
+from cards import FACE_RANK, NUM_RANKS
+
+logger = logging.getLogger('guandan.llm_cache')
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL = 7 * 24 * 3600   # 秒
+
+PASS = {'action': 'pass'}
+
+
+# ---- 规范编码 ----
+
+def rank_counts(faces, level):
+    """各点数的张数（不含逢人配）和逢人配张数"""
+    wild = rules.wild_face(level)
+    counts = [0] * NUM_RANKS
+    n_wild = 0
+    for face in faces:
+        if face == wild:
+            n_wild += 1
+        else:
+            counts[FACE_RANK[face]] += 1
+    return counts, n_wild
+
+
+def situation_key(faces, last_type, level, namespace=''):
+    """局面的规范编码（字符串）；faces 为手牌牌面，last_type 为上家的 HandType（首家出牌为 None）"""
+    counts, n_wild = rank_counts(faces, level)
+    hand = ''.join('%x' % n for n in counts)
+    last = 'lead' if last_type is None else f'{last_type.kind}:{last_type.key}:{last_type.size}'
+    return f'{namespace}|L{level}|{hand}+{n_wild}|{last}'
+
+
+def encode_decision(move, level):
+    """要出的 rules.Move -> 可缓存的决策（牌型 + 点数）；move 为 None 表示过牌"""
+    if move is None:
+        return PASS
+    counts, n_wild = rank_counts(move.faces, level)
+    return {'action': 'play', 'kind': move.hand_type.kind, 'ranks': counts, 'wild': n_wild}
+
+
+def resolve(decision, counts, last_type, level):
+    """
+    把缓存的决策落到当前手牌上：返回 rules.Move，过牌返回 None
+    当前手牌里没有牌型和点数组成都相同的合法出法时抛出 LookupError（按未命中处理），
+    牌型必须一致，顺子不会被当成同花顺复用，反之亦然；没有记录牌型的旧决策也按未命中处理
+    counts 为长度 54 的手牌牌面计数
+    """
+    if decision.get('action') == 'pass':
+        return None
+    kind = decision.get('kind')
+    target = (decision['ranks'], decision['wild'])
+    for move in rules.legal_moves(counts, last_type, level):
+        if (move.hand_type.kind == kind and len(move.faces) == sum(target[0]) + target[1]
+                and rank_counts(move.faces, level) == target):
+            return move
+    raise LookupError('当前手牌没有与缓存决策相同的出法')
+
+
+# ---- 存储 ----
+
+class DecisionCache:
+    """
+    LRU + TTL 的内存缓存，可选 SQLite 持久化（path 为 None 时只用内存）
+    线程安全；多个进程可以共用同一个 SQLite 文件
+    """
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()   # key -> (过期时间, 决策)
+        self._lock = Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.unusable = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS decisions ('
+                             'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            self._db.execute('DELETE FROM decisions WHERE expires_at <= ?', (time.time(),))
+
+    def get(self, key):
+        """命中返回决策字典，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+            value = self._load(key, now)
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value[0], value[1])
+            return value[1]
+
+    def put(self, key, decision):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, decision)
+            if self._db is not None:
+                try:
+                    self._db.execute('INSERT OR REPLACE INTO decisions VALUES (?, ?, ?)',
+                                     (key, json.dumps(decision, separators=(',', ':')), expires_at))
+                except sqlite3.Error as e:
+                    logger.warning("写入决策缓存失败: %s", e)
+
+    def contains(self, key):
+        """是否有未过期的决策（不计入命中统计）"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                return True
+            return self._load(key, now) is not None
+
+    def mark_unusable(self):
+        """get() 取到了决策，但无法用在当前手牌上（见 resolve）；统计时按未命中计"""
+        with self._lock:
+            self.unusable += 1
+
+    def _remember(self, key, expires_at, decision):
+        self._memory[key] = (expires_at, decision)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute('SELECT value, expires_at FROM decisions WHERE key = ? AND expires_at > ?',
+                                   (key, now)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("读取决策缓存失败: %s", e)
+            return None
+        return None if row is None else (row[1], json.loads(row[0]))
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits - self.unusable
+        return {
+            'hits': hits,
+            'memoryHits': self.memory_hits,
+            'diskHits': self.disk_hits,
+            'unusable': self.unusable,
+            'misses': self.misses + self.unusable,
+            'hitRate': hits / lookups if lookups else 0.0,
+            'size': len(self._memory),
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
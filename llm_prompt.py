@@ -0,0 +1,104 @@
+"""
+LLM 座位的紧凑提示词
+
+- 系统提示词（SYSTEM_PROMPT）是固定文本：规则、策略和回答格式只在这里出现一次，
+  每次请求都原样放在最前面，服务商的前缀缓存（DeepSeek / OpenAI 的 prompt caching）可以命中
+- 每回合的用户消息只有局面：等级、手牌、要压的牌，手牌按点数计数（"3×2 K 配"），不逐张列花色
+- 再附上编号的候选出法（candidate_moves：合法出法去重、预排序后取前几个），LLM 只回答编号，
+  由 parse_choice 严格解析；候选都是合法出法，不会再有被服务器拒绝的出牌
+
+    candidates = candidate_moves(counts, last_type, level)
+    messages = [{'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': turn_prompt(hand_faces, last_play, level, candidates)}]
+    choice = parse_choice(answer, len(candidates), allow_pass=last_type is not None)
+"""
+import re
+
+import rules
+from cards import BIG_JOKER, SMALL_JOKER, VALUES, NUM_RANKS
+from llm_cache import rank_counts
+
+# 点数的写法（下标为点数序号），逢人配写作 "配"
+RANK_NAMES = VALUES + [SMALL_JOKER, BIG_JOKER]
+RANK_BY_NAME = {name: rank for rank, name in enumerate(RANK_NAMES)}
+WILD_NAME = '配'
+
+DEFAULT_MAX_CANDIDATES = 12
+ANSWER_MAX_TOKENS = 4   # 回答只是一个编号
+
+SYSTEM_PROMPT = """你是掼蛋 AI 玩家（两副牌，四人，对家是队友）。每回合给出:
+等级: 当前打几；级牌在单/对/三/炸中大于 A、小于小王
+手牌: 各点数的张数，如 "3×2 K 配" 是两张 3、一张 K、一张逢人配（红桃级牌，可当除王以外的任意牌）
+上家: 要压的牌，"无" 表示新一轮由你首家出牌
+
+牌型: 单牌、对子、三张、三带二、顺子（5 张，A 可当 1）、连对（3 连对）、钢板（2 连三张），同牌型同张数才能比大小
+炸弹: 4~10 张同点数（张数多的大）、同花顺、天王炸（4 张王），可以压任何非炸弹；4、5 张炸 < 同花顺 < 6 张及以上的炸 < 天王炸
+点数大小: 2 < 3 < ... < K < A < 级牌 < 小王 < 大王
+
+候选: 你可以出的牌，每行 "编号 牌型 点数"，已按推荐程度排序（1 最推荐）；跟牌时 0 表示过牌
+
+策略: 能压就用最小的能压过的牌，节约大牌和炸弹；不压队友；压不过就过牌。
+
+只回答你选的候选编号（一个数字），不要任何其它文字。"""
+
+_CHOICE_RE = re.compile(r'\d{1,3}', re.ASCII)
+
+
+def format_ranks(faces, level):
+    """牌面 -> 点数计数写法，按大小顺序，逢人配在最后，如 '3×2 K 配'"""
+    counts, n_wild = rank_counts(faces, level)
+    order = rules.rank_order(level)
+    parts = [RANK_NAMES[r] if counts[r] == 1 else f'{RANK_NAMES[r]}×{counts[r]}'
+             for r in sorted(range(NUM_RANKS), key=order.__getitem__) if counts[r]]
+    if n_wild:
+        parts.append(WILD_NAME if n_wild == 1 else f'{WILD_NAME}×{n_wild}')
+    return ' '.join(parts)
+
+
+def candidate_moves(counts, last_type, level, limit=DEFAULT_MAX_CANDIDATES):
+    """
+    给 LLM 选的候选出法：合法出法按牌型和点数组成去重（只是花色不同的同一手只留一个），
+    按 rules.search_key 预排序后取前 limit 个；counts 为长度 54 的手牌牌面计数
+    """
+    seen = set()
+    moves = []
+    for move in rules.legal_moves(counts, last_type, level):
+        ranks, n_wild = rank_counts(move.faces, level)
+        ident = (move.hand_type, tuple(ranks), n_wild)
+        if ident not in seen:
+            seen.add(ident)
+            moves.append(move)
+    moves.sort(key=rules.search_key(counts, level))
+    return moves[:limit]
+
+
+def describe_move(move, level):
+    """'对子 7×2'"""
+    return f'{rules.type_name(move.hand_type)} {format_ranks(move.faces, level)}'
+
+
+def turn_prompt(hand_faces, last_play, level, candidates):
+    """
+    每回合的用户消息；last_play 为 (牌型名称, 牌面)，首家出牌为 None；candidates 见 candidate_moves
+    """
+    last = '无' if last_play is None else f'{last_play[0]} {format_ranks(last_play[1], level)}'
+    lines = [f'等级: {RANK_NAMES[rules.level_rank(level)]}', f'手牌: {format_ranks(hand_faces, level)}',
+             f'上家: {last}', '候选:']
+    if last_play is not None:
+        lines.append('0 过牌')
+    lines.extend(f'{i} {describe_move(move, level)}' for i, move in enumerate(candidates, 1))
+    return '\n'.join(lines)
+
+
+def parse_choice(text, count, allow_pass):
+    """
+    严格解析编号回答：去掉首尾空白后只能是一个数字，1..count 为候选，allow_pass 时 0 为过牌
+    其它回答返回 None
+    """
+    text = (text or '').strip()
+    if not _CHOICE_RE.fullmatch(text):
+        return None
+    choice = int(text)
+    if 1 <= choice <= count or (choice == 0 and allow_pass):
+        return choice
+    return None
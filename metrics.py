@@ -0,0 +1,199 @@
+"""
+轻量指标库 - Counter / Gauge / Histogram，输出 Prometheus 文本格式（text/plain; version=0.0.4）
+
+    REQUESTS = registry.counter('http_requests_total', '请求数', ['route', 'method'])
+    REQUESTS.labels('/game/play', 'POST').inc()
+    LATENCY = registry.histogram('http_request_duration_seconds', '请求耗时', ['route'])
+    LATENCY.labels('/game/play').observe(0.003)
+    registry.gauge('tables', '牌桌数', callback=lambda: len(tables))   # 抓取时才计算
+
+不依赖 prometheus_client；每个指标一把锁，记录一次只做几次加法。
+"""
+import bisect
+import math
+from threading import Lock
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 默认桶（秒）：覆盖 0.5ms 的引擎调用到 30s 的长轮询
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """带标签的指标；labels(...) 返回某组标签值对应的子指标（首次使用时创建）"""
+    type_name = ''
+
+    def __init__(self, name, help_text, label_names=(), callback=None):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        # callback() 在抓取时调用：返回数值，或 {标签值元组: 数值}
+        self.callback = callback
+        self._lock = Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} 需要标签 {self.label_names}")
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        """[(后缀, 标签值元组, 额外标签, 数值)]"""
+        if self.callback is not None:
+            value = self.callback()
+            if isinstance(value, dict):
+                return [('', labels, None, v) for labels, v in sorted(value.items())]
+            return [('', (), None, value)]
+        with self._lock:
+            children = sorted(self._children.items())
+        return [sample for values, child in children for sample in child.samples(values)]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type_name}']
+        for suffix, values, extra, value in self._samples():
+            labels = _format_labels(self.label_names, values, extra)
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class _Value:
+    def __init__(self):
+        self._lock = Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, values):
+        return [('', values, None, self.value)]
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """可增可减的当前值，也可以用 callback 在抓取时计算"""
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._lock = Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # 最后一个是 +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def samples(self, values):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            samples.append(('_bucket', values, f'le="{_format_value(float(bound))}"', cumulative))
+        samples.append(('_sum', values, None, total))
+        samples.append(('_count', values, None, cumulative))
+        return samples
+
+
+class Histogram(_Metric):
+    """分桶直方图（桶为累计计数）"""
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class MetricsRegistry:
+    """一组指标，render() 输出全部指标的文本格式"""
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._metrics = []
+
+    def _register(self, metric):
+        if not metric.label_names and metric.callback is None:
+            metric.labels()   # 无标签的指标从 0 开始就出现在输出里
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=(), callback=None):
+        return self._register(Counter(self.prefix + name, help_text, label_names, callback))
+
+    def gauge(self, name, help_text, label_names=(), callback=None):
+        return self._register(Gauge(self.prefix + name, help_text, label_names, callback))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self.prefix + name, help_text, label_names, buckets))
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
@@ -0,0 +1,537 @@
+"""
+本地 LLM 替身 - OpenAI 兼容的 chat completions 服务（aiohttp），不联网、不花钱地压测和回归测试 LLM 座位
+
+- 回答：先按脚本规则（正则匹配最后一条用户消息 -> 固定回答），否则解析用户消息里的局面（格式见 llm_prompt.py），
+  用 policies.py 的策略选一手，回答它在候选列表里的编号（过牌为 0）
+- 延迟：首个 token 的延迟按分布抽样（--latency），加上未命中前缀缓存的 prompt tokens 的处理时间
+  （--prefill-tokens-per-second），之后按 --tokens-per-second 逐个输出（支持 stream）
+- 前缀缓存：见过的系统提示词算作缓存命中，usage 里给出 cached_tokens（OpenAI）和 prompt_cache_hit_tokens（DeepSeek）
+- 错误：按比例返回 429/500/503 等（--errors）
+- 确定性：每个请求的随机数只由 --seed、用户消息和该消息第几次出现决定，与并发顺序无关
+- usage 按粗略的分词估计 token 数；GET /stats 返回请求数、错误数、token 数和延迟分位数
+
+用法:
+    pip install aiohttp
+    python mock_llm_server.py --port 8001 --latency lognormal:-0.5,0.4 --errors 429:0.02
+    LLM 座位指向它: LLMGuandanAIAgent(api_base='http://127.0.0.1:8001', api_key='mock')
+                    或 DEEPSEEK_API_BASE=http://127.0.0.1:8001 DEEPSEEK_API_KEY=mock python start_ai.py
+
+    # 压测：在已启动的游戏服务器上开 25 张牌桌、100 个 LLM 座位，各打 2 局
+    python mock_llm_server.py --load-test 100 --games 2 --game-server http://localhost:5000
+
+脚本文件是 JSON 列表，按顺序取第一条匹配的规则（没有 match 的规则匹配所有用户消息）:
+    [{"match": "上家: 无", "reply": "1"}, {"reply": "0"}]
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+import time
+import zlib
+
+from aiohttp import web
+
+import rules
+from cards import NUM_FACES, NUM_RANKS, SMALL_JOKER_FACE, SMALL_JOKER_RANK
+from llm_prompt import RANK_BY_NAME, WILD_NAME, describe_move
+from policies import POLICIES, get_policy
+from simulator import TurnView
+
+logger = logging.getLogger('guandan.mock_llm')
+
+DEFAULT_LATENCY = 'fixed:0'
+DEFAULT_TOKENS_PER_SECOND = 0   # 0 表示整段回答立即输出
+DEFAULT_PREFILL_TOKENS_PER_SECOND = 0   # 0 表示 prompt 长短不影响延迟
+DEFAULT_STRATEGY = 'rule'
+PLAYERS = 4
+CARDS_PER_PLAYER = 27
+
+# 粗略分词：每个非 ASCII 字符一个 token，ASCII 每 4 个字符一个
+_TOKEN_RE = re.compile(r'[\x00-\x7f]{1,4}|[^\x00-\x7f]')
+# 用户消息里的点数写法（见 llm_prompt.format_ranks）
+_TOKEN_SEP_RE = re.compile(r'[\s、，,]+')
+_RANK_TOKEN_RE = re.compile(r'^(10|[2-9JQKA]|小王|大王|配)(?:[♠♥♦♣]|Joker)?(?:[×xX*](\d+))?$')
+
+
+def split_tokens(text):
+    return _TOKEN_RE.findall(text)
+
+
+def count_tokens(text):
+    return len(split_tokens(text))
+
+
+# ---- 配置解析 ----
+
+def parse_latency(spec):
+    """
+    延迟分布 -> sample(rng) 返回秒数（不小于 0）
+    fixed:0.5 / uniform:0.2,1.5 / normal:0.8,0.2 / lognormal:-0.5,0.4 / exp:0.6（均值）
+    """
+    kind, _, args = spec.partition(':')
+    try:
+        params = [float(x) for x in args.split(',')] if args else []
+        samplers = {
+            'fixed': lambda rng: params[0],
+            'uniform': lambda rng: rng.uniform(params[0], params[1]),
+            'normal': lambda rng: rng.gauss(params[0], params[1]),
+            'lognormal': lambda rng: rng.lognormvariate(params[0], params[1]),
+            'exp': lambda rng: rng.expovariate(1 / params[0]) if params[0] > 0 else 0.0,
+        }
+        sample = samplers[kind]
+        sample(random.Random(0))
+    except (KeyError, IndexError, ValueError, ZeroDivisionError):
+        raise ValueError(f"无法识别的延迟分布: {spec}（例如 fixed:0.5、uniform:0.2,1.5、lognormal:-0.5,0.4）") from None
+    return lambda rng: max(sample(rng), 0.0)
+
+
+def parse_errors(spec):
+    """'429:0.02,500:0.01' -> [(429, 0.02), (500, 0.01)]"""
+    errors = []
+    for item in filter(None, (s.strip() for s in (spec or '').split(','))):
+        status, _, rate = item.partition(':')
+        errors.append((int(status), float(rate)))
+    if sum(rate for _, rate in errors) > 1:
+        raise ValueError("错误比例之和不能超过 1")
+    return errors
+
+
+def load_script(path):
+    """脚本文件 -> [(编译后的正则或 None, 回答)]"""
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    return [(re.compile(e['match']) if e.get('match') else None, e['reply']) for e in entries]
+
+
+# ---- 根据提示词出牌 ----
+
+def parse_ranks(text):
+    """
+    点数写法 -> (各点数张数, 逢人配张数)；'3×2 5 配'、'3 3 5' 都可以，带花色（'3♠'）时忽略花色
+    有无法识别的片段或没有牌时返回 None
+    """
+    counts = [0] * NUM_RANKS
+    n_wild = 0
+    for token in filter(None, _TOKEN_SEP_RE.split(text.strip())):
+        match = _RANK_TOKEN_RE.match(token)
+        if match is None:
+            return None
+        n = int(match.group(2) or 1)
+        if match.group(1) == WILD_NAME:
+            n_wild += n
+        else:
+            counts[RANK_BY_NAME[match.group(1)]] += n
+    if not any(counts) and not n_wild:
+        return None
+    return counts, n_wild
+
+
+def faces_from_ranks(counts, n_wild, level):
+    """点数计数 -> 一组牌面（花色按 ♠♥♦♣ 轮流分配，跳过逢人配），用来还原用户消息里的局面"""
+    wild = rules.wild_face(level)
+    faces = [wild] * n_wild
+    for rank, n in enumerate(counts):
+        if rank >= SMALL_JOKER_RANK:
+            faces.extend([SMALL_JOKER_FACE + rank - SMALL_JOKER_RANK] * n)
+            continue
+        candidates = [suit * 13 + rank for suit in range(4) if suit * 13 + rank != wild]
+        faces.extend(candidates[i % len(candidates)] for i in range(n))
+    return faces
+
+
+def parse_situation(prompt):
+    """
+    从 llm_prompt.turn_prompt 的用户消息里取出 (手牌牌面, 上家牌型或 None, 等级)
+    不是这种格式时返回 None
+    """
+    level = re.search(r'等级[:：]\s*(\S+)', prompt)
+    hand = re.search(r'手牌[:：]\s*(.*)', prompt)
+    last = re.search(r'上家[:：]\s*(.*)', prompt)
+    if level is None or hand is None or level.group(1) not in RANK_BY_NAME:
+        return None
+    level = RANK_BY_NAME[level.group(1)] + 2
+    parsed = parse_ranks(hand.group(1))
+    if parsed is None:
+        return None
+    last_type = None
+    if last is not None and last.group(1).strip() != '无':
+        name, _, ranks = last.group(1).strip().partition(' ')
+        last_parsed = parse_ranks(ranks)
+        types = rules.classify(faces_from_ranks(*last_parsed, level), level) if last_parsed else ()
+        last_type = next((t for t in types if rules.type_name(t) == name), types[0] if types else None)
+    return faces_from_ranks(*parsed, level), last_type, level
+
+
+def decide(prompt, policy, rng):
+    """
+    按策略回答用户消息：策略选中的一手在候选里的编号，过牌为 "0"
+    选中的一手不在候选里时回答最推荐的 "1"；消息里没有局面时回答 "0"
+    """
+    situation = parse_situation(prompt)
+    if situation is None:
+        return "0"
+    faces, last_type, level = situation
+    counts = [0] * NUM_FACES
+    for face in faces:
+        counts[face] += 1
+    card_counts = [CARDS_PER_PLAYER] * PLAYERS
+    card_counts[0] = len(faces)
+    view = TurnView(0, counts, last_type, None if last_type is None else 1, level, card_counts, 0)
+    move = policy(view, rng)
+    if move is None:
+        return "0"
+    candidates = dict((text, index) for index, text in re.findall(r'^(\d+) (.+)$', prompt, re.M))
+    return candidates.get(describe_move(move, level), "1")
+
+
+# ---- 服务 ----
+
+class MockLLM:
+    """回答、延迟、错误的生成和统计（只在服务的事件循环线程里使用）"""
+    def __init__(self, strategy=DEFAULT_STRATEGY, latency=DEFAULT_LATENCY,
+                 tokens_per_second=DEFAULT_TOKENS_PER_SECOND, errors=None, script=None, seed=0,
+                 prefill_tokens_per_second=DEFAULT_PREFILL_TOKENS_PER_SECOND):
+        self.policy = get_policy(strategy)
+        self.latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.errors = parse_errors(errors) if isinstance(errors, str) else list(errors or [])
+        self.script = load_script(script) if isinstance(script, str) else list(script or [])
+        self.seed = seed
+        self._occurrences = {}   # 用户消息 crc32 -> 出现次数
+        self._prefixes = set()   # 见过的系统提示词 crc32（前缀缓存）
+        self.requests = 0
+        self.statuses = {}
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.ttft = []           # 首个 token 的延迟（秒）
+        self.durations = []      # 整个请求的耗时（秒）
+
+    def rng_for(self, prompt):
+        """该请求的随机数：同一用户消息第 n 次出现时总是同一个序列"""
+        digest = zlib.crc32(prompt.encode('utf-8'))
+        n = self._occurrences.get(digest, 0)
+        self._occurrences[digest] = n + 1
+        return random.Random(f'{self.seed}|{digest}|{n}')
+
+    def cached_prefix(self, system):
+        """系统提示词命中前缀缓存时返回它的 token 数，否则记住它并返回 0"""
+        digest = zlib.crc32(system.encode('utf-8'))
+        if digest in self._prefixes:
+            return count_tokens(system)
+        self._prefixes.add(digest)
+        return 0
+
+    def error_for(self, rng):
+        """按比例抽一个错误状态码，不出错返回 None"""
+        roll = rng.random()
+        for status, rate in self.errors:
+            if roll < rate:
+                return status
+            roll -= rate
+        return None
+
+    def reply(self, prompt, rng):
+        for pattern, text in self.script:
+            if pattern is None or pattern.search(prompt):
+                return text
+        return decide(prompt, self.policy, rng)
+
+    def record(self, status, prompt_tokens=0, completion_tokens=0, ttft=None, duration=None, cached_tokens=0):
+        self.requests += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        self.completion_tokens += completion_tokens
+        if ttft is not None:
+            self.ttft.append(ttft)
+            self.durations.append(duration)
+
+    def stats(self):
+        def quantile(values, q):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+        return {
+            'requests': self.requests,
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+            'promptTokens': self.prompt_tokens,
+            'cachedTokens': self.cached_tokens,
+            'completionTokens': self.completion_tokens,
+            'ttftP50': quantile(self.ttft, 0.5),
+            'ttftP95': quantile(self.ttft, 0.95),
+            'durationP50': quantile(self.durations, 0.5),
+            'durationP95': quantile(self.durations, 0.95),
+        }
+
+
+_ERROR_TYPES = {429: 'rate_limit_exceeded', 500: 'server_error', 503: 'service_unavailable'}
+
+
+def _content(message):
+    content = message.get('content')
+    if isinstance(content, list):   # [{'type': 'text', 'text': ...}]
+        content = ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+    return content or ''
+
+
+def _chunk(completion_id, created, model, delta, finish_reason=None):
+    return {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+
+def create_app(mock):
+    counter = iter(range(1, 2 ** 63))
+
+    async def chat_completions(request):
+        start = time.perf_counter()
+        try:
+            body = await request.json()
+        except (ValueError, UnicodeDecodeError):
+            mock.record(400)
+            return web.json_response({'error': {'message': '请求体不是合法 JSON', 'type': 'invalid_request_error'}},
+                                     status=400)
+        messages = body.get('messages') or []
+        # 回答、脚本和随机数只看最后一条用户消息（局面），token 数按所有消息计
+        prompt = next((_content(m) for m in reversed(messages) if m.get('role') == 'user'), '')
+        model = body.get('model', 'mock')
+        rng = mock.rng_for(prompt)
+        prompt_tokens = sum(count_tokens(_content(m)) for m in messages)
+        cached = 0
+        if messages and messages[0].get('role') == 'system':
+            cached = mock.cached_prefix(_content(messages[0]))
+        ttft = mock.latency(rng)
+        if mock.prefill_tokens_per_second:
+            ttft += (prompt_tokens - cached) / mock.prefill_tokens_per_second
+
+        status = mock.error_for(rng)
+        if status is not None:
+            mock.record(status)
+            headers = {'retry-after': '0'} if status == 429 else None
+            return web.json_response({'error': {'message': f'模拟错误 {status}',
+                                                'type': _ERROR_TYPES.get(status, 'server_error'),
+                                                'code': status}},
+                                     status=status, headers=headers)
+
+        pieces = split_tokens(mock.reply(prompt, rng))
+        finish_reason = 'stop'
+        max_tokens = body.get('max_tokens') or body.get('max_completion_tokens')
+        if max_tokens and len(pieces) > max_tokens:
+            pieces = pieces[:max_tokens]
+            finish_reason = 'length'
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(pieces),
+                 'total_tokens': prompt_tokens + len(pieces),
+                 'prompt_tokens_details': {'cached_tokens': cached},
+                 'prompt_cache_hit_tokens': cached, 'prompt_cache_miss_tokens': prompt_tokens - cached}
+        per_token = 1 / mock.tokens_per_second if mock.tokens_per_second else 0.0
+        completion_id = f'chatcmpl-mock-{next(counter)}'
+        created = int(time.time())
+
+        await asyncio.sleep(ttft)
+        if not body.get('stream'):
+            await asyncio.sleep(per_token * len(pieces))
+            mock.record(200, prompt_tokens, len(pieces), ttft, time.perf_counter() - start, cached)
+            return web.json_response({
+                'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(pieces)},
+                             'finish_reason': finish_reason}],
+                'usage': usage,
+            })
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+
+        async def send(data):
+            await response.write(b'data: ' + json.dumps(data, ensure_ascii=False).encode('utf-8') + b'\n\n')
+
+        await send(_chunk(completion_id, created, model, {'role': 'assistant', 'content': ''}))
+        for i, piece in enumerate(pieces):
+            if i and per_token:
+                await asyncio.sleep(per_token)
+            await send(_chunk(completion_id, created, model, {'content': piece}))
+        await send(_chunk(completion_id, created, model, {}, finish_reason))
+        if (body.get('stream_options') or {}).get('include_usage'):
+            await send({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                        'model': model, 'choices': [], 'usage': usage})
+        await response.write(b'data: [DONE]\n\n')
+        mock.record(200, prompt_tokens, len(pieces), ttft, time.perf_counter() - start, cached)
+        return response
+
+    async def models(request):
+        return web.json_response({'object': 'list', 'data': [{'id': 'mock', 'object': 'model', 'owned_by': 'mock'}]})
+
+    async def stats(request):
+        return web.json_response(mock.stats())
+
+    app = web.Application()
+    # OpenAI SDK 的 base_url 带不带 /v1 都可以
+    for prefix in ('', '/v1'):
+        app.router.add_post(prefix + '/chat/completions', chat_completions)
+        app.router.add_get(prefix + '/models', models)
+    app.router.add_get('/stats', stats)
+    return app
+
+
+def serve_in_background(mock, host='127.0.0.1', port=0):
+    """在后台线程的事件循环里启动服务，返回 (base_url, stop)"""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {}
+
+    async def start():
+        runner = web.AppRunner(create_app(mock))
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        state['runner'] = runner
+        state['port'] = runner.addresses[0][1]
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True, name='mock-llm')
+    thread.start()
+    started.wait()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(state['runner'].cleanup(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(10)
+
+    return f"http://{host}:{state['port']}", stop
+
+
+# ---- 压测 ----
+
+def run_load_test(game_server, api_base, seats, games=1, transport=None, model='mock', prefix='llm-load'):
+    """
+    在 game_server 上开 seats // 4 张牌桌，每个座位一个 LLMGuandanAIAgent（决策缓存关闭），
+    每张牌桌打 games 局；返回统计
+    """
+    from guandan_client import GameAPIError, GuandanClient
+    from llm_ai_agent import LLMGuandanAIAgent
+
+    table_ids = [f'{prefix}-{i}' for i in range(seats // PLAYERS)]
+    admin = GuandanClient(game_server)
+    for game_id in table_ids:
+        try:
+            admin.create_table(game_id)
+        except GameAPIError:
+            pass   # 牌桌已存在
+    agents = [LLMGuandanAIAgent(server_url=game_server, player_id=seat, game_id=game_id, api_key='mock',
+                                api_base=api_base, model=model, transport=transport, cache=False)
+              for game_id in table_ids for seat in range(PLAYERS)]
+    threads = [threading.Thread(target=agent.run, daemon=True) for agent in agents]
+    for thread in threads:
+        thread.start()
+
+    finished = []
+    errors = []
+
+    def drive(game_id):
+        """
+        订阅牌桌事件流：连上后开局，收到本局结束的回合事件后开下一局
+        不用座位 0 的 /game/turn 长轮询，轮到座位 0 时它会立即返回，LLM 思考期间驱动会空转
+        """
+        client = GuandanClient(game_server, game_id=game_id)
+        played, last_event_id, started = 0, None, False
+        try:
+            while played < games:
+                # 服务器断开事件流时带上 last_event_id 重连，补发错过的事件
+                for event in client.events(last_event_id=last_event_id):
+                    if event is None:
+                        continue
+                    last_event_id = event.get('id', last_event_id)
+                    kind = event.get('type')
+                    if kind == 'connected' and not started:
+                        # 先订阅再开局，不会错过这一局的任何事件
+                        started = True
+                        client.start()
+                    elif kind == 'turn' and event.get('gameOver'):
+                        played += 1
+                        finished.append(game_id)
+                        if played >= games:
+                            break
+                        client.start()
+                    elif kind == 'closed':
+                        return
+        except Exception as e:
+            errors.append(f'{game_id}: {e}')
+
+    start = time.perf_counter()
+    drivers = [threading.Thread(target=drive, args=(game_id,), daemon=True) for game_id in table_ids]
+    for thread in drivers:
+        thread.start()
+    for thread in drivers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    for agent in agents:
+        agent.stop_event.set()
+    for thread in threads:
+        thread.join(10)
+    for game_id in table_ids:
+        try:
+            admin.close_table(game_id)
+        except Exception:
+            pass
+    return {'tables': len(table_ids), 'seats': len(agents), 'games': len(finished),
+            'errors': errors, 'elapsed': elapsed}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地 LLM 替身（OpenAI 兼容）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--strategy', default=DEFAULT_STRATEGY, choices=sorted(POLICIES), help='没有脚本规则匹配时的出牌策略')
+    parser.add_argument('--script', help='脚本规则 JSON 文件')
+    parser.add_argument('--latency', default=DEFAULT_LATENCY, help='首个 token 的延迟分布（秒），例如 lognormal:-0.5,0.4')
+    parser.add_argument('--tokens-per-second', type=float, default=DEFAULT_TOKENS_PER_SECOND,
+                        help='之后每秒输出的 token 数，0 表示立即输出')
+    parser.add_argument('--prefill-tokens-per-second', type=float, default=DEFAULT_PREFILL_TOKENS_PER_SECOND,
+                        help='每秒处理的未缓存 prompt tokens（计入首 token 延迟），0 表示不计')
+    parser.add_argument('--errors', default='', help='错误比例，例如 429:0.02,500:0.01')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--load-test', type=int, metavar='SEATS', help='在游戏服务器上跑 SEATS 个 LLM 座位（4 的倍数）')
+    parser.add_argument('--game-server', default='http://localhost:5000')
+    parser.add_argument('--games', type=int, default=1, help='压测时每张牌桌打几局')
+    parser.add_argument('--transport', choices=('push', 'http', 'ws'), help='压测时 Agent 的传输方式')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format='%(message)s')
+
+    try:
+        mock = MockLLM(args.strategy, args.latency, args.tokens_per_second, args.errors, args.script, args.seed,
+                       args.prefill_tokens_per_second)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.load_test:
+        if args.load_test % PLAYERS:
+            parser.error('--load-test 必须是 4 的倍数')
+        api_base, stop = serve_in_background(mock, args.host, args.port)
+        try:
+            result = run_load_test(args.game_server, api_base, args.load_test, args.games, args.transport)
+        finally:
+            stop()
+        stats = mock.stats()
+        print(f"{result['seats']} 个 LLM 座位 / {result['tables']} 张牌桌: 完成 {result['games']} 局, "
+              f"用时 {result['elapsed']:.1f} 秒")
+        print(f"LLM 请求 {stats['requests']} 次 ({stats['requests'] / result['elapsed']:.1f}/s), "
+              f"状态码 {stats['statuses']}, prompt tokens {stats['promptTokens']}（缓存命中 {stats['cachedTokens']}）, "
+              f"completion tokens {stats['completionTokens']}")
+        print(f"首 token 延迟 p50 {stats['ttftP50'] * 1000:.0f}ms / p95 {stats['ttftP95'] * 1000:.0f}ms, "
+              f"请求耗时 p50 {stats['durationP50'] * 1000:.0f}ms / p95 {stats['durationP95'] * 1000:.0f}ms")
+        for error in result['errors']:
+            print(f"⚠️  {error}")
+    else:
+        print(f"本地 LLM 替身: http://{args.host}:{args.port}（策略 {args.strategy}，延迟 {args.latency}）")
+        web.run_app(create_app(mock), host=args.host, port=args.port, print=None)
@@ -0,0 +1,86 @@
+"""
+对局策略 - 供模拟器和锦标赛使用
+
+策略是一个可调用对象: policy(view, rng) -> rules.Move 或 None（过牌），view 见 simulator.TurnView。
+锦标赛在多个进程中运行，进程之间只传递策略名，由 get_policy(name) 在各进程内取得策略。
+"""
+import rules
+from simulator import random_policy, greedy_policy
+
+
+def _is_partner(view):
+    """上家是否是队友"""
+    return view.last_player is not None and (view.last_player - view.seat) % 2 == 0
+
+
+def rule_policy(view, rng):
+    """GuandanAIAgent 的规则策略（与 HTTP 版 AI 使用同一个 choose_move）"""
+    from ai_agent import GuandanAIAgent
+    return GuandanAIAgent.choose_move(view.moves, view.leading, rng)
+
+
+def search_policy(view, rng):
+    """
+    一步前瞻搜索：
+    1. 能一手出完就出完
+    2. 对每种出法估算出完后剩余的点数组数，选剩余最少的；相同时先出非炸弹、小牌
+    3. 不压队友；对手剩牌不多（<= 6 张）时才用炸弹
+    """
+    moves = view.moves
+    if not moves:
+        return None
+    hand_size = view.card_counts[view.seat]
+    for move in moves:
+        if len(move.faces) == hand_size:
+            return move
+    if not view.leading:
+        if _is_partner(view):
+            return None
+        if view.card_counts[view.last_player] > 6:
+            moves = [m for m in moves if not m.hand_type.power]
+            if not moves:
+                return None
+    return min(moves, key=rules.search_key(view.counts, view.level))
+
+
+def llm_stub_policy(view, rng):
+    """
+    不联网的 LLM 替身：随机生成一条 LLM 风格的回答（候选编号），再走 LLMGuandanAIAgent 的严格解析和兜底流程。
+    回答大多是最推荐的几个候选之一，也会有过牌和无效的回答，用来评估解析/兜底逻辑。
+    """
+    from llm_prompt import candidate_moves, parse_choice
+
+    candidates = candidate_moves(view.counts, view.last_type, view.level)
+    if not candidates:
+        return None
+    roll = rng.random()
+    if roll < 0.1:
+        text = "0"
+    elif roll < 0.2:
+        # 不是编号或编号越界
+        text = rng.choice(["出牌: 3", "过牌", str(len(candidates) + 1), "1."])
+    else:
+        text = str(rng.randint(1, min(3, len(candidates))))
+
+    choice = parse_choice(text, len(candidates), allow_pass=not view.leading)
+    if choice is None:
+        # 与 LLMGuandanAIAgent._llm_decision 相同：改用规则 AI 的决策
+        return rule_policy(view, rng)
+    return candidates[choice - 1] if choice else None
+
+
+POLICIES = {
+    'random': random_policy,
+    'greedy': greedy_policy,
+    'rule': rule_policy,
+    'search': search_policy,
+    'llm-stub': llm_stub_policy,
+}
+
+
+def get_policy(name):
+    """按名字取策略，未知名字抛出 ValueError"""
+    try:
+        return POLICIES[name]
+    except KeyError:
+        raise ValueError(f"未知策略: {name}（可选: {', '.join(POLICIES)}）") from None
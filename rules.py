@@ -0,0 +1,569 @@
+"""
+掼蛋牌型规则 - 查表式牌型识别与比较
+
+牌型识别不做分支判断，而是查预先计算好的表：
+    key = 点数计数签名（每个点数 4 bit，共 15 个点数）+ 逢人配张数 * WILD_UNIT
+每个打牌等级一张表（首次使用时生成），表里存这手牌所有可能的解释。
+
+另外提供合法出牌生成（legal_moves），服务器和 AI Agent 共用。
+
+支持的牌型：单牌、对子、三张、三带二、顺子（5 张）、连对（3 连对）、
+钢板（2 连三张）、炸弹（4~10 张）、同花顺、天王炸（4 张王），
+以及级牌（打几就是几，单/对/三/炸中大于 A）和红桃级牌逢人配（可替代除王以外的任何牌）。
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from cards import (
+    NUM_FACES, NUM_RANKS, FACE_RANK, FACE_SUIT, JOKER_SUIT,
+    SMALL_JOKER_RANK, BIG_JOKER_RANK, faces_from_dicts, face_to_dict,
+)
+
+# 牌型
+SINGLE = 'single'
+PAIR = 'pair'
+TRIPLE = 'triple'
+FULL_HOUSE = 'full_house'
+STRAIGHT = 'straight'
+TUBE = 'tube'
+PLATE = 'plate'
+BOMB = 'bomb'
+STRAIGHT_FLUSH = 'straight_flush'
+JOKER_BOMB = 'joker_bomb'
+
+KIND_NAMES = {
+    SINGLE: '单牌',
+    PAIR: '对子',
+    TRIPLE: '三张',
+    FULL_HOUSE: '三带二',
+    STRAIGHT: '顺子',
+    TUBE: '连对',
+    PLATE: '钢板',
+    STRAIGHT_FLUSH: '同花顺',
+    JOKER_BOMB: '天王炸',
+}
+# 对外的 rank 字段：非炸弹为牌型序号，炸弹 >= 10 且按炸弹大小递增
+KIND_RANKS = {
+    SINGLE: 1, PAIR: 2, TRIPLE: 3, FULL_HOUSE: 4,
+    STRAIGHT: 5, TUBE: 6, PLATE: 7,
+}
+
+# 一手牌的一种解释
+#   kind: 牌型；key: 同牌型同张数时比大小用；size: 张数；
+#   power: 炸弹威力（非炸弹为 0），炸弹之间先比 power 再比 key
+HandType = namedtuple('HandType', ['kind', 'key', 'size', 'power'])
+
+# 炸弹威力：4、5 张炸 < 同花顺 < 6~10 张炸 < 天王炸
+STRAIGHT_FLUSH_POWER = 55
+JOKER_BOMB_POWER = 200
+MIN_BOMB_SIZE = 4
+MAX_BOMB_SIZE = 10   # 8 张同点数 + 2 张逢人配
+
+
+def bomb_power(size):
+    return size * 10
+
+
+BITS_PER_RANK = 4
+RANK_UNIT = [1 << (BITS_PER_RANK * r) for r in range(NUM_RANKS)]
+WILD_UNIT = 1 << (BITS_PER_RANK * NUM_RANKS)
+FACE_UNIT = [RANK_UNIT[FACE_RANK[f]] for f in range(NUM_FACES)]
+HEART = 1
+
+# 顺序型牌（顺子/连对/钢板）中 A 既可以当最小也可以当最大：A 2 3 ... K A
+SEQUENCE_RANKS = [12] + list(range(13))
+SEQUENCE_SHAPES = {
+    # 牌型: (连续点数个数, 每个点数张数)
+    STRAIGHT: (5, 1),
+    TUBE: (3, 2),
+    PLATE: (2, 3),
+}
+
+
+def level_rank(level):
+    """打牌等级（2..14，与 sortValue 一致）-> 级牌点数序号"""
+    return level - 2
+
+
+def wild_face(level):
+    """该等级的逢人配（红桃级牌）牌面"""
+    return HEART * 13 + level_rank(level)
+
+
+def rank_order(level):
+    """
+    单/对/三/炸中点数的大小顺序（数组下标为点数序号）
+    级牌排在 A 之上、小王之下
+    """
+    lr = level_rank(level)
+    order = [0] * NUM_RANKS
+    value = 0
+    for r in range(13):
+        if r == lr:
+            continue
+        order[r] = value
+        value += 1
+    order[lr] = 12
+    order[SMALL_JOKER_RANK] = 13
+    order[BIG_JOKER_RANK] = 14
+    return order
+
+
+def _sig(counts):
+    """{点数: 张数} -> 签名"""
+    return sum(RANK_UNIT[r] * n for r, n in counts.items())
+
+
+def _base_patterns(level):
+    """不含逢人配时所有合法牌型: [(点数计数, HandType)]"""
+    order = rank_order(level)
+    patterns = []
+    for r in range(NUM_RANKS):
+        k = order[r]
+        patterns.append(({r: 1}, HandType(SINGLE, k, 1, 0)))
+        patterns.append(({r: 2}, HandType(PAIR, k, 2, 0)))
+    for r in range(13):
+        k = order[r]
+        patterns.append(({r: 3}, HandType(TRIPLE, k, 3, 0)))
+        for n in range(MIN_BOMB_SIZE, MAX_BOMB_SIZE + 1):
+            patterns.append(({r: n}, HandType(BOMB, k, n, bomb_power(n))))
+        # 三带二：对子可以是任意其他点数（包括一对小王或一对大王）
+        for p in range(NUM_RANKS):
+            if p != r:
+                patterns.append(({r: 3, p: 2}, HandType(FULL_HOUSE, k, 5, 0)))
+    patterns.append(({SMALL_JOKER_RANK: 2, BIG_JOKER_RANK: 2},
+                     HandType(JOKER_BOMB, 0, 4, JOKER_BOMB_POWER)))
+    for kind, (length, width) in SEQUENCE_SHAPES.items():
+        for start in range(len(SEQUENCE_RANKS) - length + 1):
+            counts = {SEQUENCE_RANKS[start + i]: width for i in range(length)}
+            patterns.append((counts, HandType(kind, start, length * width, 0)))
+    return patterns
+
+
+def _removals(counts, n):
+    """从点数计数中去掉 n 张非王牌（由逢人配顶替）的所有结果"""
+    if n == 0:
+        yield counts
+        return
+    for r in list(counts):
+        if r >= SMALL_JOKER_RANK:
+            continue
+        rest = dict(counts)
+        rest[r] -= 1
+        if not rest[r]:
+            del rest[r]
+        yield from _removals(rest, n - 1)
+
+
+def _sort_types(types):
+    # 最大的解释排最前
+    return tuple(sorted(set(types), key=lambda t: (t.power, t.key), reverse=True))
+
+
+def build_table(level):
+    """生成某个等级的牌型表: {签名 + 逢人配数 * WILD_UNIT: (HandType, ...)}"""
+    table = {}
+    for counts, hand_type in _base_patterns(level):
+        for n_wild in range(3):
+            for rest in _removals(counts, n_wild):
+                table.setdefault(_sig(rest) + n_wild * WILD_UNIT, []).append(hand_type)
+    return {key: _sort_types(types) for key, types in table.items()}
+
+
+_levels = {}
+
+
+def level_tables(level):
+    """
+    某个等级的查找表 (table, units, straights)，首次使用时生成
+    units[face]: 该牌面对签名的贡献（逢人配为 WILD_UNIT）
+    straights: 含顺子解释的签名 -> 最大的顺子解释（用于同花顺判断）
+    """
+    data = _levels.get(level)
+    if data is None:
+        table = build_table(level)
+        units = list(FACE_UNIT)
+        units[wild_face(level)] = WILD_UNIT
+        straights = {}
+        for key, types in table.items():
+            for t in types:
+                if t.kind == STRAIGHT:
+                    straights[key] = t
+                    break
+        data = _levels[level] = (table, units, straights)
+    return data
+
+
+def get_table(level):
+    return level_tables(level)[0]
+
+
+def signature(faces, level):
+    """一组牌面 -> 查表用的签名"""
+    units = level_tables(level)[1]
+    sig = 0
+    for f in faces:
+        sig += units[f]
+    return sig
+
+
+def classify(faces, level=2):
+    """
+    识别一组牌面的所有合法解释，按从大到小排列；不合法返回空元组
+    """
+    table, units, straights = level_tables(level)
+    sig = 0
+    for f in faces:
+        sig += units[f]
+    types = table.get(sig, ())
+    if sig in straights and _is_flush(faces, level):
+        t = straights[sig]
+        types = (HandType(STRAIGHT_FLUSH, t.key, 5, STRAIGHT_FLUSH_POWER),) + types
+    return types
+
+
+def _is_flush(faces, level):
+    """除逢人配外的牌是否同一花色（不含王）"""
+    wild = wild_face(level)
+    suit = None
+    for f in faces:
+        if f == wild:
+            continue
+        s = FACE_SUIT[f]
+        if s == JOKER_SUIT or (suit is not None and s != suit):
+            return False
+        suit = s
+    return True
+
+
+def beats(hand_type, last_type):
+    """hand_type 能否压过 last_type"""
+    if hand_type.power:
+        if not last_type.power:
+            return True
+        return (hand_type.power, hand_type.key) > (last_type.power, last_type.key)
+    return (hand_type.kind == last_type.kind and hand_type.size == last_type.size
+            and hand_type.key > last_type.key)
+
+
+def pick(types, last_type=None):
+    """
+    从一手牌的几种解释中选一种：
+    首家出牌取最大的解释；跟牌时优先同牌型压过，其次用炸弹；压不过返回 None
+    """
+    if not types:
+        return None
+    if last_type is None:
+        return types[0]
+    bomb = None
+    for t in types:
+        if beats(t, last_type):
+            if not t.power:
+                return t
+            if bomb is None:
+                bomb = t
+    return bomb
+
+
+def type_name(hand_type):
+    if hand_type.kind == BOMB:
+        return f'炸弹({hand_type.size}张)'
+    return KIND_NAMES[hand_type.kind]
+
+
+def type_rank(hand_type):
+    """对外的 rank 字段：4 张炸 14、5 张炸 15、同花顺 16、6~10 张炸 17~21、天王炸 22"""
+    if hand_type.kind == BOMB:
+        return 10 + hand_type.size + (1 if hand_type.size >= 6 else 0)
+    if hand_type.kind == STRAIGHT_FLUSH:
+        return 16
+    if hand_type.kind == JOKER_BOMB:
+        return 22
+    return KIND_RANKS[hand_type.kind]
+
+
+def type_to_dict(hand_type):
+    """API 边界上的牌型表示"""
+    return {
+        'name': type_name(hand_type),
+        'rank': type_rank(hand_type),
+        'kind': hand_type.kind,
+        'key': hand_type.key,
+        'size': hand_type.size,
+    }
+
+
+def type_from_dict(data):
+    """type_to_dict 的逆操作"""
+    kind = data['kind']
+    size = data['size']
+    if kind == BOMB:
+        power = bomb_power(size)
+    elif kind == STRAIGHT_FLUSH:
+        power = STRAIGHT_FLUSH_POWER
+    elif kind == JOKER_BOMB:
+        power = JOKER_BOMB_POWER
+    else:
+        power = 0
+    return HandType(kind, data['key'], size, power)
+
+
+# ---------------------------------------------------------------------------
+# 合法出牌生成
+# ---------------------------------------------------------------------------
+
+# 一种出法：牌型解释 + 具体出哪些牌面（已排序）
+Move = namedtuple('Move', ['hand_type', 'faces'])
+
+KIND_ORDER = {kind: i for i, kind in enumerate(
+    [SINGLE, PAIR, TRIPLE, FULL_HOUSE, STRAIGHT, TUBE, PLATE, BOMB, STRAIGHT_FLUSH, JOKER_BOMB])}
+# 每个点数对应的牌面（按花色顺序）
+RANK_FACES = [[f for f in range(NUM_FACES) if FACE_RANK[f] == r] for r in range(NUM_RANKS)]
+# 对局中命中的基本都是同一回合内的重复调用（Agent 选牌、校验、兜底），跨局几乎不会重复；
+# 4096 项约 6MB，命中率与更大的缓存相差无几（见 python bench.py 的缓存命中率）
+LEGAL_MOVES_CACHE_SIZE = 4096
+
+
+def _take(counts, needs, wild, n_wild, suit=None):
+    """
+    按 {点数: 张数} 从手牌中取具体牌面，自然牌不够时用逢人配补，补不上返回 None
+    suit 不为空时只取该花色（同花顺）
+    """
+    faces = []
+    for r, k in needs.items():
+        if suit is None:
+            rank_faces = RANK_FACES[r]
+        else:
+            rank_faces = (suit * 13 + r,)
+        for f in rank_faces:
+            if f == wild:
+                continue
+            c = counts[f]
+            if c >= k:
+                faces.extend((f,) * k)
+                k = 0
+                break
+            if c:
+                faces.extend((f,) * c)
+                k -= c
+        if k:
+            if r >= SMALL_JOKER_RANK or k > n_wild:
+                return None
+            faces.extend((wild,) * k)
+            n_wild -= k
+    return faces
+
+
+def _mixed_suits(faces, counts, wild):
+    """
+    顺子的非同花取法：faces 里的自然牌都是同一花色时，把其中一张换成同点数、别的花色的牌
+    已经不同花时原样返回；换不了（这些点数在手里只有这一花色）返回 None
+    """
+    suits = {FACE_SUIT[f] for f in faces if f != wild}
+    if len(suits) != 1:
+        return faces
+    suit = suits.pop()
+    for i, f in enumerate(faces):
+        if f == wild:
+            continue
+        for g in RANK_FACES[FACE_RANK[f]]:
+            if g != wild and counts[g] and FACE_SUIT[g] != suit:
+                return faces[:i] + [g] + faces[i + 1:]
+    return None
+
+
+SEQUENCE_WINDOWS = {
+    kind: [(start, [SEQUENCE_RANKS[start + i] for i in range(length)], width)
+           for start in range(len(SEQUENCE_RANKS) - length + 1)]
+    for kind, (length, width) in SEQUENCE_SHAPES.items()
+}
+
+
+def _candidates(natural, n_wild, kinds, order):
+    """
+    按牌型枚举 (点数计数, 按该计数理解的牌型)，只保留自然牌 + 逢人配凑得齐的
+    """
+    def deficit(needs):
+        d = 0
+        for r, k in needs.items():
+            if natural[r] < k:
+                if r >= SMALL_JOKER_RANK:
+                    return n_wild + 1
+                d += k - natural[r]
+        return d
+
+    if SINGLE in kinds:
+        for r in range(NUM_RANKS):
+            if natural[r]:
+                yield {r: 1}, HandType(SINGLE, order[r], 1, 0)
+    if PAIR in kinds:
+        for r in range(NUM_RANKS):
+            if natural[r] >= 2 or (r < SMALL_JOKER_RANK and natural[r] + n_wild >= 2):
+                yield {r: 2}, HandType(PAIR, order[r], 2, 0)
+    if TRIPLE in kinds or FULL_HOUSE in kinds:
+        triples = [r for r in range(13) if natural[r] + n_wild >= 3]
+        if TRIPLE in kinds:
+            for r in triples:
+                yield {r: 3}, HandType(TRIPLE, order[r], 3, 0)
+        if FULL_HOUSE in kinds:
+            for t in triples:
+                spare = n_wild - max(0, 3 - natural[t])
+                for p in range(NUM_RANKS):
+                    if p == t:
+                        continue
+                    if natural[p] >= 2 or (p < SMALL_JOKER_RANK and natural[p] + spare >= 2):
+                        yield {t: 3, p: 2}, HandType(FULL_HOUSE, order[t], 5, 0)
+    for kind in (STRAIGHT, TUBE, PLATE):
+        if kind not in kinds:
+            continue
+        for start, ranks, width in SEQUENCE_WINDOWS[kind]:
+            needs = {r: width for r in ranks}
+            if deficit(needs) <= n_wild:
+                yield needs, HandType(kind, start, len(ranks) * width, 0)
+    if BOMB in kinds:
+        for r in range(13):
+            for size in range(MIN_BOMB_SIZE, natural[r] + n_wild + 1):
+                yield {r: size}, HandType(BOMB, order[r], size, bomb_power(size))
+    if JOKER_BOMB in kinds and natural[SMALL_JOKER_RANK] == 2 and natural[BIG_JOKER_RANK] == 2:
+        yield ({SMALL_JOKER_RANK: 2, BIG_JOKER_RANK: 2},
+               HandType(JOKER_BOMB, 0, 4, JOKER_BOMB_POWER))
+
+
+# 顺子窗口: (start, 点数列表, 点数位图)
+STRAIGHT_WINDOW_MASKS = [(start, ranks, sum(1 << r for r in ranks))
+                         for start, ranks, _ in SEQUENCE_WINDOWS[STRAIGHT]]
+_straight_window_cache = {}
+
+
+def _straight_windows(mask, n_wild):
+    """某花色点数位图下，用 n_wild 张逢人配能凑成的顺子窗口（缓存）"""
+    key = (mask, n_wild)
+    windows = _straight_window_cache.get(key)
+    if windows is None:
+        windows = _straight_window_cache[key] = tuple(
+            (start, ranks) for start, ranks, window_mask in STRAIGHT_WINDOW_MASKS
+            if (window_mask & ~mask).bit_count() <= n_wild)
+    return windows
+
+
+_orders = {}
+
+
+@lru_cache(maxsize=LEGAL_MOVES_CACHE_SIZE)
+def _legal_moves(counts, last_type, level):
+    wild = wild_face(level)
+    n_wild = counts[wild]
+    natural = [0] * NUM_RANKS
+    suit_masks = [0, 0, 0, 0, 0]   # 每个花色有哪些点数（位图，逢人配除外）
+    for f in range(NUM_FACES):
+        c = counts[f]
+        if c and f != wild:
+            r = FACE_RANK[f]
+            natural[r] += c
+            suit_masks[FACE_SUIT[f]] |= 1 << r
+    order = _orders.get(level)
+    if order is None:
+        order = _orders[level] = rank_order(level)
+
+    if last_type is None:
+        kinds = KIND_ORDER
+    else:
+        # 跟牌只需要同牌型和炸弹
+        kinds = {last_type.kind, BOMB, STRAIGHT_FLUSH, JOKER_BOMB}
+
+    candidates = []
+    for needs, pattern in _candidates(natural, n_wild, kinds, order):
+        # 按点数计数理解就压不过的直接跳过（逢人配的其他理解方式会作为别的计数枚举到）
+        if last_type is not None and not beats(pattern, last_type):
+            continue
+        faces = _take(counts, needs, wild, n_wild)
+        if faces is not None:
+            candidates.append(faces)
+            if pattern.kind == STRAIGHT:
+                # 按花色顺序取到的五张可能正好同花（只会被理解为同花顺），另取一组不同花的作为普通顺子
+                mixed = _mixed_suits(faces, counts, wild)
+                if mixed is not None and mixed is not faces:
+                    candidates.append(mixed)
+    if STRAIGHT_FLUSH in kinds:
+        for suit in range(4):
+            mask = suit_masks[suit]
+            if not mask:
+                continue
+            for start, ranks in _straight_windows(mask, n_wild):
+                if last_type is not None and not beats(
+                        HandType(STRAIGHT_FLUSH, start, 5, STRAIGHT_FLUSH_POWER), last_type):
+                    continue
+                faces = _take(counts, {r: 1 for r in ranks}, wild, n_wild, suit=suit)
+                if faces is not None:
+                    candidates.append(faces)
+    # 单独的逢人配（自然牌里没有级牌时才需要）
+    for k in range(1, n_wild + 1):
+        candidates.append([wild] * k)
+
+    # 每组牌面用 classify/pick 得到与服务器一致的解释
+    moves = {}
+    for faces in candidates:
+        faces = tuple(sorted(faces))
+        if faces in moves:
+            continue
+        hand_type = pick(classify(faces, level), last_type)
+        if hand_type is not None:
+            moves[faces] = Move(hand_type, faces)
+    return tuple(sorted(moves.values(), key=_move_sort_key))
+
+
+def _move_sort_key(move):
+    t = move.hand_type
+    return (t.power, KIND_ORDER[t.kind], t.size, t.key, move.faces)
+
+
+def legal_moves(counts, last_type=None, level=2):
+    """
+    列出手牌所有合法出法（不含过牌），从小到大排列
+    counts: 长度 54 的牌面计数；last_type: 上家的 HandType，首家出牌为 None
+    结果按 (手牌计数, 上家牌型, 等级) 缓存
+    """
+    return _legal_moves(tuple(counts), last_type, level)
+
+
+def counts_from_faces(faces):
+    counts = [0] * NUM_FACES
+    for f in faces:
+        counts[f] += 1
+    return counts
+
+
+def legal_moves_for_cards(hand, last_card_type=None, level=2):
+    """
+    API 边界的便捷版本：hand 是牌字典列表，last_card_type 是上家出牌的 cardType 字典
+    """
+    faces = faces_from_dicts(hand) or []
+    last_type = type_from_dict(last_card_type) if last_card_type else None
+    return legal_moves(counts_from_faces(faces), last_type, level)
+
+
+def move_to_dicts(move):
+    """出法 -> API 的牌字典列表"""
+    return [face_to_dict(f) for f in move.faces]
+
+
+def _groups_after(rank_counts, move, wild):
+    """出完 move 后手里还剩几组点数（每组点数至少要出一手，逢人配不计）"""
+    remaining = list(rank_counts)
+    for face in move.faces:
+        if face != wild:
+            remaining[FACE_RANK[face]] -= 1
+    return sum(1 for n in remaining if n)
+
+
+def search_key(counts, level):
+    """
+    出法的排序键（越小越好）：出完后剩余的点数组数少、非炸弹、张数多、点数小优先
+    counts 为长度 54 的手牌牌面计数；policies.search_policy 和 LLM 的候选列表都按它排序
+    """
+    wild = wild_face(level)
+    rank_counts = [0] * NUM_RANKS
+    for face, n in enumerate(counts):
+        if n and face != wild:
+            rank_counts[FACE_RANK[face]] += n
+    return lambda m: (_groups_after(rank_counts, m, wild), m.hand_type.power, -len(m.faces), m.hand_type.key)
@@ -1,495 +1,613 @@
 """
 掼蛋游戏服务器 - Flask后端
 """
-from flask import Flask, request, jsonify, send_file, Response
+from flask import Flask, request, jsonify, send_file, Response, g
 from flask_cors import CORS
-import random
 import json
-from enum import Enum
+import logging
 import os
-from queue import Queue
-from threading import Lock
+import secrets
+import threading
+import time
+import uuid
+from threading import Lock, Condition
+import codec
+from event_broker import EventBroker, Subscriber
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+# 游戏逻辑在 engine.py
+from engine import GameState
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:   # 可选依赖：pip install flask-sock（没有时不提供 WebSocket 路由）
+    Sock = None
+
+logger = logging.getLogger('guandan.server')
 
 # 获取当前目录
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 app = Flask(__name__, static_folder=BASE_DIR, static_url_path='')
 CORS(app)
-
-# 全局游戏状态
-game_state = None
-
-# SSE 事件队列和锁
-sse_event_queue = Queue()
-sse_lock = Lock()
-
-class CardSuit(Enum):
-    """花色"""
-    SPADE = '♠'
-    HEART = '♥'
-    DIAMOND = '♦'
-    CLUB = '♣'
-    JOKER = 'Joker'
-
-class Card:
-    """牌的表示"""
-    def __init__(self, suit, value, sort_value=None):
-        self.suit = suit
-        self.value = value
-        # 用于排序的值
-        self.sort_value = sort_value or self._get_sort_value(value)
-    
-    @staticmethod
-    def _get_sort_value(value):
-        value_map = {
-            '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7,
-            '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14,
-            '小王': 14.5, '大王': 15
-        }
-        return value_map.get(value, 0)
+sock = Sock(app) if Sock is not None else None
+
+# 旧版单桌路由（/game/play 等）使用的默认牌桌 id
+DEFAULT_GAME_ID = 'default'
+
+# SSE 心跳间隔（秒）
+SSE_HEARTBEAT_INTERVAL = 15
+
+# 长轮询最长等待时间（秒）
+LONG_POLL_MAX_WAIT = 30
+
+# 每张牌桌在同一版本内最多缓存多少份编码好的响应（完整视图 + 各 since 的增量，按编码分别缓存）
+PAYLOAD_CACHE_SIZE = 64
+
+# 指标（/metrics）；牌桌和 SSE 相关的 gauge 在抓取时计算，见 TableRegistry 之后
+metrics = MetricsRegistry(prefix='guandan_')
+HTTP_REQUESTS = metrics.counter('http_requests_total', 'HTTP 请求数', ['route', 'method', 'status'])
+HTTP_LATENCY = metrics.histogram('http_request_duration_seconds',
+                                 'HTTP 请求处理耗时（秒），SSE 只计到开始推流', ['route', 'method'])
+GAMES_STARTED = metrics.counter('games_started_total', '开局次数')
+PLAYS = metrics.counter('plays_total', '成功出牌次数')
+PASSES = metrics.counter('passes_total', '成功过牌次数')
+REJECTIONS = metrics.counter('rejections_total', '被拒绝的出牌/过牌', ['action', 'reason'])
+PAYLOAD_CACHE = metrics.counter('payload_cache_total', '按版本缓存的响应编码命中/未命中次数', ['result'])
+PAYLOAD_CACHE_HIT = PAYLOAD_CACHE.labels('hit')
+PAYLOAD_CACHE_MISS = PAYLOAD_CACHE.labels('miss')
+SSE_DROPPED = metrics.counter('sse_dropped_subscribers_total', '因消费过慢被断开的事件流连接数')
+WS_CONNECTIONS = metrics.gauge('ws_connections', '当前座位 WebSocket 连接数')
+WS_MESSAGES = metrics.counter('ws_messages_total', '座位 WebSocket 收到的消息数', ['type'])
+
+# GameState 返回的失败原因 -> 指标标签
+REJECTION_REASONS = {
+    '你没有这些牌': 'not_owned',
+    '无效的牌型': 'invalid_type',
+    '无法压过上家的牌': 'cannot_beat',
+    '不是你的回合': 'not_your_turn',
+    '游戏未开始': 'not_started',
+    '本局已结束': 'game_over',
+}
+
+
+def _record_result(table, action, player_id, result):
+    """出牌/过牌结果计入指标，失败原因写 debug 日志"""
+    if result['success']:
+        (PLAYS if action == 'play' else PASSES).inc()
+        return
+    reason = REJECTION_REASONS.get(result.get('message'), 'other')
+    REJECTIONS.labels(action, reason).inc()
+    logger.debug("牌桌 %s 玩家 %s %s 被拒绝: %s", table.id, player_id, action, result.get('message'))
+
+
+class GameTable:
+    """一张牌桌：游戏状态 + 独立的锁和事件广播器"""
+    # 事件流订阅者的队列实现（asyncio 服务器换成协程版本）
+    subscriber_class = Subscriber
+    
+    def __init__(self, game_id):
+        self.id = game_id
+        self.lock = Lock()        # 每张牌桌一把锁，牌桌之间互不竞争
+        # 状态变化时唤醒长轮询
+        self.changed = Condition(self.lock)
+        self.broker = EventBroker(on_drop=SSE_DROPPED.inc, subscriber_class=self.subscriber_class)
+        # 已认领的座位：座位 -> 令牌 / 私有事件流（公共事件 + 该座位的手牌更新）
+        # 修改时整体替换（持有 self.lock），指标等不持锁的读取拿到的总是完整的字典
+        self.seat_tokens = {}
+        self.seat_brokers = {}
+        self.game_state = None
+        self.closed = False
+        self.created_at = time.time()
+        # 写进 ETag，同名牌桌关闭后重建时版本号从头开始，不会与旧的 ETag 混淆
+        self.epoch = uuid.uuid4().hex[:8]
+        # 当前版本下各视图编码好的响应（(视图, 编码) -> bytes），版本变化时整体作废
+        self._payloads = {}
+        self._payloads_version = None
+    
+    def start(self, rng=None):
+        """开始（或重新开始）本桌的一局游戏；rng 为洗牌用的随机数生成器（默认随机）"""
+        with self.lock:
+            version = self.game_state.version if self.game_state else 0
+            self.game_state = GameState(on_event=self._publish, version=version, rng=rng)
+            result = self.game_state.start_game()
+            result['version'] = self.game_state.version
+            for player_id in self.seat_brokers:
+                self._publish_hand(player_id)
+            self._payloads.clear()
+            self._notify()
+        GAMES_STARTED.inc()
+        logger.info("牌桌 %s 开局", self.id)
+        return result
     
-    def to_dict(self):
-        return {
-            'suit': self.suit,
-            'value': self.value,
-            'sortValue': self.sort_value
-        }
+    def play(self, player_id, cards):
+        """出牌；cards 里的牌可以是牌字典或牌面编码（见 codec.py）"""
+        faces = codec.to_faces(cards)
+        if faces is None:
+            result = {'success': False, 'message': '你没有这些牌'}
+            _record_result(self, 'play', player_id, result)
+            return result
+        with self.lock:
+            result = self.game_state.play_faces(player_id, faces)
+            if result['success']:
+                result['version'] = self.game_state.version
+                if player_id in self.seat_brokers:
+                    self._publish_hand(player_id)
+                self._payloads.clear()
+                self._notify()
+        _record_result(self, 'play', player_id, result)
+        return result
     
-    def __repr__(self):
-        return f"{self.value}{self.suit}"
-
-
-class Player:
-    """玩家"""
-    def __init__(self, player_id, name, is_ai=False):
-        self.id = player_id
-        self.name = name
-        self.is_ai = is_ai
-        self.cards = []  # 手牌
-        self.level = 2   # 当前等级
-    
-    def add_card(self, card):
-        self.cards.append(card)
-    
-    def remove_card(self, card):
-        """移除手牌中的一张牌"""
-        for i, c in enumerate(self.cards):
-            if c.suit == card['suit'] and c.value == card['value']:
-                self.cards.pop(i)
-                return True
-        return False
-    
-    def has_cards(self, cards):
-        """检查玩家是否拥有这些牌"""
-        for card in cards:
-            found = False
-            for hand_card in self.cards:
-                if hand_card.suit == card['suit'] and hand_card.value == card['value']:
-                    found = True
-                    break
-            if not found:
+    def pass_turn(self, player_id):
+        with self.lock:
+            result = self.game_state.pass_turn(player_id)
+            if result['success']:
+                result['version'] = self.game_state.version
+                self._payloads.clear()
+                self._notify()
+        _record_result(self, 'pass', player_id, result)
+        return result
+    
+    def _notify(self):
+        """状态变化：唤醒长轮询和 WebSocket 推送（调用方需持有 self.lock）"""
+        self.changed.notify_all()
+    
+    def _publish(self, event):
+        """引擎的事件：发到公共事件流，并转发到已认领座位的私有事件流（调用方需持有 self.lock）"""
+        self.broker.publish(event)
+        for broker in self.seat_brokers.values():
+            broker.publish(event)
+    
+    def _publish_hand(self, player_id):
+        """把该座位当前的手牌推到它的私有事件流（调用方需持有 self.lock）"""
+        state = self.game_state
+        hand = state.get_player_hand(player_id)
+        self.seat_brokers[player_id].publish({
+            'type': 'hand',
+            'playerId': player_id,
+            'version': state.version,
+            'cardCount': len(hand),
+            'cards': hand
+        })
+    
+    def claim_seat(self, player_id):
+        """认领座位，返回座位令牌（访问私有事件流时出示）；座位已被认领时返回 None"""
+        with self.lock:
+            if self.closed or player_id in self.seat_tokens:
+                return None
+            token = secrets.token_urlsafe(16)
+            broker = EventBroker(on_drop=SSE_DROPPED.inc, subscriber_class=self.subscriber_class)
+            self.seat_tokens = {**self.seat_tokens, player_id: token}
+            self.seat_brokers = {**self.seat_brokers, player_id: broker}
+        logger.info("牌桌 %s 座位 %s 已被认领", self.id, player_id)
+        return token
+    
+    def seat_authorized(self, player_id, token):
+        expected = self.seat_tokens.get(player_id)
+        return expected is not None and bool(token) and secrets.compare_digest(expected, token)
+    
+    def seat_readable(self, player_id, token):
+        """手牌、回合信息：未认领的座位谁都能看，已认领的座位要出示它的令牌"""
+        return player_id not in self.seat_tokens or self.seat_authorized(player_id, token)
+    
+    def release_seat(self, player_id, token):
+        """释放座位，关闭它的私有事件流；令牌不对时返回 False"""
+        with self.lock:
+            if not self.seat_authorized(player_id, token):
                 return False
+            broker = self.seat_brokers[player_id]
+            self.seat_tokens = {k: v for k, v in self.seat_tokens.items() if k != player_id}
+            self.seat_brokers = {k: v for k, v in self.seat_brokers.items() if k != player_id}
+        broker.publish({'type': 'closed', 'gameId': self.id})
+        broker.close()
         return True
     
-    def sort_cards(self):
-        """排序手牌"""
-        self.cards.sort(key=lambda c: (c.sort_value, self._suit_order(c.suit)))
-    
-    @staticmethod
-    def _suit_order(suit):
-        order = {CardSuit.SPADE.value: 0, CardSuit.HEART.value: 1, 
-                 CardSuit.DIAMOND.value: 2, CardSuit.CLUB.value: 3, CardSuit.JOKER.value: 4}
-        return order.get(suit, 5)
-    
-    def to_dict(self, show_cards=False):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'isAI': self.is_ai,
-            'level': self.level,
-            'cardCount': len(self.cards),
-            'cards': [c.to_dict() for c in self.cards] if show_cards else []
-        }
-
-
-class PlayRecord:
-    """出牌记录"""
-    def __init__(self, player_id, cards, card_type=None, is_pass=False):
-        self.player_id = player_id
-        self.cards = cards
-        self.card_type = card_type
-        self.is_pass = is_pass
+    def brokers(self):
+        """公共事件流和各座位私有事件流的广播器"""
+        return [self.broker, *self.seat_brokers.values()]
+    
+    @property
+    def version(self):
+        return self.game_state.version if self.game_state else 0
+    
+    def payload(self, view, build, mimetype=codec.JSON):
+        """
+        view 在当前版本按 mimetype 编码的响应（bytes）；同一版本、同一编码内 build() 只调用、编码一次
+        调用方需持有 self.lock
+        """
+        version = self.version
+        if self._payloads_version != version:
+            self._payloads.clear()
+            self._payloads_version = version
+        key = (view, mimetype)
+        data = self._payloads.get(key)
+        if data is not None:
+            PAYLOAD_CACHE_HIT.inc()
+            return data
+        PAYLOAD_CACHE_MISS.inc()
+        data = codec.encode(build(), mimetype)
+        if len(self._payloads) < PAYLOAD_CACHE_SIZE:
+            self._payloads[key] = data
+        return data
+    
+    def etag(self, view, since=None, mimetype=codec.JSON):
+        """
+        某个视图在当前版本的 ETag（调用方需持有 self.lock）
+        view 区分 state / turn-<玩家>；增量响应的内容与 since 有关，since 也写进 ETag
+        不同编码的响应字节不同，MessagePack 的 ETag 另加后缀
+        """
+        tag = f'{self.epoch}-{self.version}-{view}'
+        if since is not None:
+            tag = f'{tag}-since{since}'
+        return tag if mimetype == codec.JSON else f'{tag}-msgpack'
+    
+    def turn_ready(self, player_id, since=None):
+        """长轮询的结束条件：牌桌关闭、状态版本号不再等于 since，或轮到该玩家"""
+        if self.closed:
+            return True
+        state = self.game_state
+        if state is None:
+            return False
+        if since is not None and state.version != since:
+            return True
+        return (state.started and state.winner_id is None
+                and state.current_player_id == player_id)
+    
+    def wait_for_turn(self, player_id, since=None, timeout=0):
+        """
+        长轮询：阻塞到轮到该玩家、或状态版本号不再等于 since、或超时
+        调用方需持有 self.lock
+        """
+        return self.changed.wait_for(lambda: self.turn_ready(player_id, since), timeout=timeout)
+    
+    def close(self):
+        """关闭牌桌，通知正在监听的事件流和长轮询退出"""
+        with self.lock:
+            self.closed = True
+            self._notify()
+            brokers = self.brokers()
+            self.seat_tokens, self.seat_brokers = {}, {}
+        for broker in brokers:
+            broker.publish({'type': 'closed', 'gameId': self.id})
+            broker.close()
     
     def to_dict(self):
+        state = self.game_state
         return {
-            'playerId': self.player_id,
-            'cards': self.cards,
-            'cardType': self.card_type,
-            'isPass': self.is_pass
+            'gameId': self.id,
+            'started': bool(state and state.started),
+            'currentPlayer': state.current_player_id if state else None,
+            'subscribers': self.broker.subscriber_count(),
+            'claimedSeats': sorted(self.seat_tokens),
+            'createdAt': self.created_at
         }
 
 
-class GameState:
-    """游戏状态"""
-    def __init__(self):
-        self.players = [
-            Player(0, '我', is_ai=False),
-            Player(1, '右侧', is_ai=True),
-            Player(2, '对家', is_ai=True),
-            Player(3, '左侧', is_ai=True)
-        ]
-        self.current_player_id = 0
-        self.started = False
-        self.play_history = []  # 出牌历史
-        self.last_play = None   # 最后一次出牌
-        self.pass_count = 0     # 连续过牌数
-        self.current_level = 2  # 当前打的等级
-    
-    def start_game(self):
-        """开始游戏，发牌"""
-        self.started = True
-        self.play_history = []
-        self.last_play = None
-        self.pass_count = 0
-        
-        # 创建牌组（2副牌）
-        deck = self._create_deck()
-        
-        # 洗牌
-        random.shuffle(deck)
-        
-        # 发牌给每个玩家（每人27张）
-        for i, player in enumerate(self.players):
-            player.cards = deck[i*27:(i+1)*27]
-            player.sort_cards()
-        
-        # 玩家先手
-        self.current_player_id = 0
-        
-        return {
-            'success': True,
-            'message': '游戏开始，已发牌',
-            'currentPlayer': self.current_player_id
-        }
-    
-    def _create_deck(self):
-        """创建2副牌"""
-        suits = [CardSuit.SPADE.value, CardSuit.HEART.value, 
-                 CardSuit.DIAMOND.value, CardSuit.CLUB.value]
-        values = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-        deck = []
-        
-        # 创建2副牌
-        for _ in range(2):
-            for suit in suits:
-                for value in values:
-                    deck.append(Card(suit, value))
-            # 添加大小王
-            deck.append(Card(CardSuit.JOKER.value, '小王'))
-            deck.append(Card(CardSuit.JOKER.value, '大王'))
-        
-        return deck
-    
-    def get_player_hand(self, player_id):
-        """获取玩家的手牌"""
-        if not (0 <= player_id < len(self.players)):
-            return None
-        return [c.to_dict() for c in self.players[player_id].cards]
-    
-    def validate_card_type(self, cards):
-        """验证牌型"""
-        if not cards:
-            return None
-        
-        card_values = [c['value'] for c in cards]
-        card_count = len(cards)
-        print(f"[validate_card_type] 验证 {card_count} 张牌: 值={card_values}")
-        
-        # 单牌
-        if len(cards) == 1:
-            print(f"[validate_card_type] ✅ 识别为单牌")
-            return {'name': '单牌', 'rank': 1}
-        
-        # 对子
-        if len(cards) == 2:
-            if cards[0]['value'] == cards[1]['value']:
-                print(f"[validate_card_type] ✅ 识别为对子")
-                return {'name': '对子', 'rank': 2}
-        
-        # 三张
-        if len(cards) == 3:
-            if cards[0]['value'] == cards[1]['value'] == cards[2]['value']:
-                print(f"[validate_card_type] ✅ 识别为三张")
-                return {'name': '三张', 'rank': 3}
-        
-        # 炸弹（4张及以上相同）
-        if len(cards) >= 4:
-            values = [c['value'] for c in cards]
-            if len(set(values)) == 1:
-                print(f"[validate_card_type] ✅ 识别为炸弹({len(cards)}张)")
-                return {'name': f'炸弹({len(cards)}张)', 'rank': 10 + len(cards)}
-            else:
-                print(f"[validate_card_type] ❌ {card_count}张牌但值不同: {set(values)}")
-        
-        print(f"[validate_card_type] ❌ 无法识别的牌型")
-        return None
-    
-    def can_beat(self, cards, card_type, last_play):
-        """判断是否能压过上家的牌"""
-        if not last_play:
-            return True  # 首轮可以出任何有效牌型
-        
-        last_type = last_play['cardType']
-        last_cards = last_play['cards']
-        
-        # 调试输出
-        print(f"[can_beat] 尝试用 {card_type['name']}(rank={card_type['rank']}) 压过 {last_type['name']}(rank={last_type['rank']})")
-        
-        # 炸弹可以压任何非炸弹
-        if card_type['rank'] >= 10 and last_type['rank'] < 10:
-            print(f"[can_beat] ✅ 炸弹压非炸弹")
-            return True
-        
-        # 同类型比大小
-        if card_type['name'] == last_type['name']:
-            result = cards[0]['sortValue'] > last_cards[0]['sortValue']
-            print(f"[can_beat] 同类型比较: {cards[0]['sortValue']} > {last_cards[0]['sortValue']} = {result}")
-            return result
-        
-        print(f"[can_beat] ❌ 牌型不同且不是炸弹")
-        return False
-    
-    def play(self, player_id, cards):
-        """执行出牌"""
-        if not self.started:
-            return {'success': False, 'message': '游戏未开始'}
-        
-        if player_id != self.current_player_id:
-            return {'success': False, 'message': '不是你的回合'}
-        
-        player = self.players[player_id]
-        
-        # 检查玩家是否拥有这些牌
-        if not player.has_cards(cards):
-            return {'success': False, 'message': '你没有这些牌'}
-        
-        # 验证牌型
-        card_type = self.validate_card_type(cards)
-        if not card_type:
-            return {'success': False, 'message': '无效的牌型'}
-        
-        # 如果不是首轮，检查是否能压过上家
-        if self.last_play and not self.can_beat(cards, card_type, self.last_play):
-            return {'success': False, 'message': '无法压过上家的牌'}
-        
-        # 执行出牌
-        for card in cards:
-            player.remove_card(card)
-        
-        # 更新游戏状态
-        self.last_play = {
-            'playerId': player_id,
-            'cards': cards,
-            'cardType': card_type,
-            'isPass': False
-        }
-        self.pass_count = 0
-        
-        # 记录到历史
-        record = {
-            'playerName': player.name,
-            'playerId': player_id,
-            'cards': cards,
-            'cardType': card_type,
-            'isPass': False
-        }
-        self.play_history.append(record)
-        
-        # 推送 SSE 事件
-        card_str = '、'.join([f"{c['value']}{c['suit']}" for c in cards])
-        sse_event_queue.put({
-            'type': 'play',
-            'playerName': player.name,
-            'playerId': player_id,
-            'cardType': card_type['name'],
-            'cards': card_str,
-            'cardCount': len(player.cards)
-        })
-        
-        # 检查是否获胜
-        if len(player.cards) == 0:
-            return {
-                'success': True,
-                'message': f'{player.name} 获胜！',
-                'winner': player.name,
-                'gameOver': True
-            }
-        
-        # 转到下一个玩家
-        self._next_player()
-        
-        return {
-            'success': True,
-            'message': '出牌成功',
-            'nextPlayer': self.current_player_id
-        }
-    
-    def pass_turn(self, player_id):
-        """过牌"""
-        if not self.started:
-            return {'success': False, 'message': '游戏未开始'}
-        
-        if player_id != self.current_player_id:
-            return {'success': False, 'message': '不是你的回合'}
-        
-        player = self.players[player_id]
-        self.pass_count += 1
-        
-        # 记录到历史
-        record = {
-            'playerName': player.name,
-            'playerId': player_id,
-            'cards': [],
-            'cardType': None,
-            'isPass': True
-        }
-        self.play_history.append(record)
-        
-        # 推送 SSE 事件
-        sse_event_queue.put({
-            'type': 'pass',
-            'playerName': player.name,
-            'playerId': player_id,
-            'cardCount': len(player.cards)
-        })
-        
-        # 如果连续3个人过牌，新一轮开始
-        if self.pass_count >= 3:
-            self.last_play = None
-            self.pass_count = 0
-        
-        # 转到下一个玩家
-        self._next_player()
-        
-        return {
-            'success': True,
-            'message': '已过牌',
-            'nextPlayer': self.current_player_id
-        }
+class TableRegistry:
+    """牌桌注册表，按 game id 管理多张牌桌"""
+    def __init__(self, table_class=GameTable):
+        self._tables = {}
+        self.table_class = table_class
+        # 只保护注册表本身的增删，单张牌桌的读写用牌桌自己的锁
+        self._lock = Lock()
+    
+    def create(self, game_id=None):
+        """创建牌桌，game_id 已存在时返回 None"""
+        game_id = game_id or uuid.uuid4().hex[:12]
+        with self._lock:
+            if game_id in self._tables:
+                return None
+            table = self.table_class(game_id)
+            self._tables[game_id] = table
+            return table
+    
+    def get(self, game_id):
+        return self._tables.get(game_id)
+    
+    def get_or_create(self, game_id):
+        table = self._tables.get(game_id)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(game_id)
+                if table is None:
+                    table = self.table_class(game_id)
+                    self._tables[game_id] = table
+        return table
+    
+    def close(self, game_id):
+        """关闭并移除牌桌，返回是否存在"""
+        with self._lock:
+            table = self._tables.pop(game_id, None)
+        if table is None:
+            return False
+        table.close()
+        return True
     
-    def _next_player(self):
-        """转到下一个玩家"""
-        self.current_player_id = (self.current_player_id + 1) % len(self.players)
+    def tables(self):
+        with self._lock:
+            return list(self._tables.values())
     
-    def get_state(self):
-        """获取当前游戏状态"""
-        return {
-            'started': self.started,
-            'currentPlayer': self.current_player_id,
-            'currentPlayerName': self.players[self.current_player_id].name if self.started else None,
-            'currentLevel': self.current_level,
-            'players': [p.to_dict() for p in self.players],
-            'lastPlay': self.last_play,
-            'passCount': self.pass_count,
-            'playHistory': self.play_history[-10:]  # 最近10条记录
-        }
+    def list(self):
+        return [t.to_dict() for t in self.tables()]
     
-    def get_turn_info(self, player_id):
-        """获取某个玩家的回合信息"""
-        is_my_turn = player_id == self.current_player_id
-        
-        return {
-            'playerId': player_id,
-            'isMyTurn': is_my_turn,
-            'currentPlayer': self.current_player_id,
-            'currentPlayerName': self.players[self.current_player_id].name,
-            'lastPlay': self.last_play,
-            'canPlay': is_my_turn and self.started,
-            'passCount': self.pass_count,
-            'hand': self.get_player_hand(player_id),
-            'gameState': self.get_state()
-        }
+    def __len__(self):
+        return len(self._tables)
+
+
+# 全局牌桌注册表
+registry = TableRegistry()
+
+
+def _brokers():
+    return [broker for table in registry.tables() for broker in table.brokers()]
+
+
+def _queue_depths():
+    return [depth for broker in _brokers() for depth in broker.queue_depths()]
+
+
+metrics.gauge('tables', '当前牌桌数', callback=lambda: len(registry))
+metrics.gauge('sse_subscribers', '当前事件流连接数（含座位私有事件流）',
+              callback=lambda: sum(broker.subscriber_count() for broker in _brokers()))
+metrics.gauge('sse_queued_messages', '所有事件流连接积压的消息总数', callback=lambda: sum(_queue_depths()))
+metrics.gauge('sse_queue_depth_max', '单个事件流连接的最大积压消息数',
+              callback=lambda: max(_queue_depths(), default=0))
+
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _observe_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # 用路由模板做标签（/game/<game_id>/play），避免每张牌桌一组指标
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.labels(route, request.method).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(route, request.method, response.status_code).inc()
+    return response
+
+
+def _lookup_table(game_id):
+    """查找牌桌；默认牌桌在第一次访问时自动创建（浏览器/Agent 可能先于开局连接）"""
+    if game_id == DEFAULT_GAME_ID:
+        return registry.get_or_create(game_id)
+    return registry.get(game_id)
+
+
+def _since_arg():
+    """?since=<版本号>，返回 (since, 错误响应)"""
+    since = request.args.get('since')
+    if since is None:
+        return None, None
+    try:
+        return int(since), None
+    except ValueError:
+        return None, (jsonify({'error': 'since 参数无效'}), 400)
+
+
+def _response_mimetype():
+    """按 Accept 选择响应编码：application/msgpack 或 JSON（见 codec.py）"""
+    return codec.negotiate(request.accept_mimetypes)
+
+
+def _request_data():
+    """请求体：Content-Type 为 MessagePack 时按 MessagePack 解码，否则按 JSON"""
+    if request.mimetype in codec.MSGPACK_TYPES:
+        try:
+            data = codec.decode(request.get_data(), request.mimetype)
+        except ValueError:
+            data = None
+    else:
+        data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+
+def _bytes_response(data, mimetype=codec.JSON, status=200):
+    """直接返回已编码的响应体"""
+    response = Response(data, status=status, mimetype=mimetype)
+    # 同一 URL 的响应编码取决于 Accept
+    response.vary.add('Accept')
+    return response
+
+
+def _respond(obj, status=200):
+    """按 Accept 编码的响应"""
+    mimetype = _response_mimetype()
+    return _bytes_response(codec.encode(obj, mimetype), mimetype, status)
+
+
+def _versioned_response(data, etag, mimetype=codec.JSON):
+    """
+    带 ETag 的响应（data 为已编码的 bytes）
+    data 为 None 表示客户端的 If-None-Match 命中，返回 304
+    """
+    if data is None:
+        response = Response(status=304)
+        response.vary.add('Accept')
+    else:
+        response = _bytes_response(data, mimetype)
+    response.set_etag(etag)
+    # 允许缓存但每次都要带 If-None-Match 重新验证
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _table_or_error(game_id, require_started=False):
+    """查找牌桌，返回 (table, 错误响应)"""
+    table = registry.get(game_id)
+    if table is None:
+        return None, (jsonify({'error': '牌桌不存在'}), 404)
+    if not table.game_state or (require_started and not table.game_state.started):
+        return None, (jsonify({'error': '游戏未开始'}), 400)
+    return table, None
 
 
 # API 路由
 
-@app.route('/game/start', methods=['POST'])
-def start_game():
-    """开始新游戏"""
-    global game_state
-    game_state = GameState()
-    result = game_state.start_game()
+@app.route('/game/tables', methods=['POST'])
+def create_table():
+    """创建牌桌，可选指定 gameId，可选立即开局"""
+    data = _request_data()
+    game_id = data.get('gameId')
+    if game_id is not None and (not isinstance(game_id, str) or not game_id
+                                or '/' in game_id or game_id == 'tables'):
+        return jsonify({'error': '无效的 gameId'}), 400
+    
+    table = registry.create(game_id)
+    if table is None:
+        return jsonify({'error': '牌桌已存在'}), 409
+    
+    start_result = table.start() if data.get('start') else None
+    result = table.to_dict()
+    if start_result:
+        result['start'] = start_result
+    return jsonify(result), 201
+
+
+@app.route('/game/tables', methods=['GET'])
+def list_tables():
+    """列出所有牌桌"""
+    tables = registry.list()
+    return jsonify({'total': len(tables), 'tables': tables})
+
+
+@app.route('/game/tables/<game_id>', methods=['GET'])
+def get_table(game_id):
+    """获取牌桌概况"""
+    table = registry.get(game_id)
+    if table is None:
+        return jsonify({'error': '牌桌不存在'}), 404
+    return jsonify(table.to_dict())
+
+
+@app.route('/game/tables/<game_id>', methods=['DELETE'])
+def close_table(game_id):
+    """关闭牌桌"""
+    if not registry.close(game_id):
+        return jsonify({'error': '牌桌不存在'}), 404
+    return jsonify({'success': True, 'gameId': game_id})
+
+
+@app.route('/game/start', methods=['POST'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/start', methods=['POST'])
+def start_game(game_id):
+    """开始新游戏（旧版路由会自动创建默认牌桌）"""
+    table = _lookup_table(game_id)
+    if table is None:
+        return jsonify({'error': '牌桌不存在'}), 404
+    
+    result = table.start()
+    result['gameId'] = table.id
     return jsonify(result)
 
 
-@app.route('/game/player/<int:player_id>/hand', methods=['GET'])
-def get_player_hand(player_id):
+@app.route('/game/player/<int:player_id>/hand', methods=['GET'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/player/<int:player_id>/hand', methods=['GET'])
+def get_player_hand(game_id, player_id):
     """获取玩家手牌"""
-    if not game_state or not game_state.started:
-        return jsonify({'error': '游戏未开始'}), 400
+    table, error = _table_or_error(game_id, require_started=True)
+    if error:
+        return error
     
-    hand = game_state.get_player_hand(player_id)
-    if hand is None:
-        return jsonify({'error': '玩家不存在'}), 404
+    if not table.seat_readable(player_id, _seat_token()):
+        return jsonify({'error': '座位令牌无效'}), 403
     
-    return jsonify({
-        'playerId': player_id,
-        'cardCount': len(hand),
-        'cards': hand
-    })
+    mimetype = _response_mimetype()
+    with table.lock:
+        state = table.game_state
+        if not 0 <= player_id < len(state.players):
+            return jsonify({'error': '玩家不存在'}), 404
+        
+        def build():
+            hand = state.get_player_hand(player_id)
+            return {
+                'playerId': player_id,
+                'cardCount': len(hand),
+                'cards': hand
+            }
+        data = table.payload(f'hand{player_id}', build, mimetype)
+    return _bytes_response(data, mimetype)
 
 
-@app.route('/game/play', methods=['POST'])
-def play():
+@app.route('/game/play', methods=['POST'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/play', methods=['POST'])
+def play(game_id):
     """出牌"""
-    if not game_state or not game_state.started:
-        return jsonify({'error': '游戏未开始'}), 400
+    table, error = _table_or_error(game_id, require_started=True)
+    if error:
+        return error
     
-    data = request.json
+    data = _request_data()
     player_id = data.get('playerId')
     cards = data.get('cards', [])
     
     if player_id is None:
         return jsonify({'error': 'playerId 必须'}), 400
+    if not isinstance(cards, list):
+        return jsonify({'error': 'cards 必须是列表'}), 400
     
-    result = game_state.play(player_id, cards)
-    return jsonify(result)
+    result = table.play(player_id, cards)
+    return _respond(result)
 
 
-@app.route('/game/pass', methods=['POST'])
-def pass_turn():
+@app.route('/game/pass', methods=['POST'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/pass', methods=['POST'])
+def pass_turn(game_id):
     """过牌"""
-    if not game_state or not game_state.started:
-        return jsonify({'error': '游戏未开始'}), 400
+    table, error = _table_or_error(game_id, require_started=True)
+    if error:
+        return error
     
-    data = request.json
+    data = _request_data()
     player_id = data.get('playerId')
     
     if player_id is None:
         return jsonify({'error': 'playerId 必须'}), 400
     
-    result = game_state.pass_turn(player_id)
-    return jsonify(result)
+    result = table.pass_turn(player_id)
+    return _respond(result)
 
 
-@app.route('/game/events', methods=['GET'])
-def game_events():
-    """SSE 事件流端点"""
+def _last_event_id(value):
+    """Last-Event-ID 请求头或 ?lastEventId= 的值，无效时为 None"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _heartbeat_interval(value):
+    """?heartbeat=<秒>：客户端要求的心跳间隔（1 ~ SSE_HEARTBEAT_INTERVAL），Agent 用短心跳及时响应停止"""
+    try:
+        return min(max(float(value), 1.0), SSE_HEARTBEAT_INTERVAL) if value else SSE_HEARTBEAT_INTERVAL
+    except ValueError:
+        return SSE_HEARTBEAT_INTERVAL
+
+
+def _event_stream(broker, connected):
+    """订阅 broker 并返回 SSE 响应；connected 为第一条（不带 id 的）连接确认事件"""
+    # 断线重连时浏览器会带上 Last-Event-ID，也支持用查询参数传入
+    last_event_id = _last_event_id(request.headers.get('Last-Event-ID') or request.args.get('lastEventId'))
+    heartbeat = _heartbeat_interval(request.args.get('heartbeat'))
+    sub = broker.subscribe(last_event_id)
+    
     def event_generator():
-        # 创建一个局部队列来接收事件
-        local_queue = Queue()
-        
-        # 发送初始连接确认
-        yield f"data: {json.dumps({'type': 'connected'})}\n\n"
-        
-        while True:
-            try:
-                # 从全局队列获取事件（阻塞等待，超时 30 秒）
-                event = sse_event_queue.get(timeout=30)
-                yield f"data: {json.dumps(event)}\n\n"
-            except:
-                # 超时或其他异常，发送心跳保持连接
-                yield f": heartbeat\n\n"
+        try:
+            # 发送初始连接确认（不带 id，不影响客户端的 Last-Event-ID）
+            yield f"data: {json.dumps(connected)}\n\n".encode('utf-8')
+            
+            while True:
+                payload = sub.get(timeout=heartbeat)
+                if payload is None:
+                    # 牌桌关闭、座位释放或消费过慢被断开
+                    break
+                # 超时则发送心跳保持连接
+                yield payload or b": heartbeat\n\n"
+        finally:
+            broker.unsubscribe(sub)
     
     return Response(
         event_generator(),
@@ -501,34 +619,321 @@ def game_events():
     )
 
 
-@app.route('/game/state', methods=['GET'])
-def get_state():
-    """获取游戏状态"""
-    if not game_state:
-        return jsonify({'error': '游戏未开始'}), 400
-    
-    return jsonify(game_state.get_state())
+@app.route('/game/events', methods=['GET'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/events', methods=['GET'])
+def game_events(game_id):
+    """SSE 事件流端点"""
+    table = _lookup_table(game_id)
+    if table is None:
+        return jsonify({'error': '牌桌不存在'}), 404
+    return _event_stream(table.broker, {'type': 'connected', 'gameId': table.id})
 
 
-@app.route('/game/turn/<int:player_id>', methods=['GET'])
-def get_turn(player_id):
-    """获取玩家的回合信息"""
-    if not game_state:
-        return jsonify({'error': '游戏未开始'}), 400
-    
-    return jsonify(game_state.get_turn_info(player_id))
+def _seat_token():
+    """座位令牌：X-Seat-Token 请求头，或 ?token=（EventSource 不能设置请求头）"""
+    return request.headers.get('X-Seat-Token') or request.args.get('token')
 
 
-@app.route('/game/history', methods=['GET'])
-def get_history():
+@app.route('/game/seats/<int:player_id>/claim', methods=['POST'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/seats/<int:player_id>/claim', methods=['POST'])
+def claim_seat(game_id, player_id):
+    """认领座位，返回访问该座位私有事件流的令牌"""
+    table = _lookup_table(game_id)
+    if table is None:
+        return jsonify({'error': '牌桌不存在'}), 404
+    if not 0 <= player_id < 4:
+        return jsonify({'error': '玩家不存在'}), 404
+    token = table.claim_seat(player_id)
+    if token is None:
+        return jsonify({'error': '座位已被认领'}), 409
+    return jsonify({'gameId': table.id, 'playerId': player_id, 'token': token})
+
+
+@app.route('/game/seats/<int:player_id>', methods=['DELETE'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/seats/<int:player_id>', methods=['DELETE'])
+def release_seat(game_id, player_id):
+    """释放座位（需要座位令牌）"""
+    table = registry.get(game_id)
+    if table is None:
+        return jsonify({'error': '牌桌不存在'}), 404
+    if not table.release_seat(player_id, _seat_token()):
+        return jsonify({'error': '座位令牌无效'}), 403
+    return jsonify({'success': True, 'gameId': table.id, 'playerId': player_id})
+
+
+@app.route('/game/seats/<int:player_id>/events', methods=['GET'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/seats/<int:player_id>/events', methods=['GET'])
+def seat_events(game_id, player_id):
+    """座位的私有 SSE 事件流：公共事件（含 turn）+ 该座位的手牌更新（hand），需要座位令牌"""
+    table = registry.get(game_id)
+    if table is None:
+        return jsonify({'error': '牌桌不存在'}), 404
+    with table.lock:
+        broker = table.seat_brokers.get(player_id) if table.seat_authorized(player_id, _seat_token()) else None
+    if broker is None:
+        return jsonify({'error': '座位令牌无效'}), 403
+    return _event_stream(broker, {'type': 'connected', 'gameId': table.id, 'playerId': player_id})
+
+
+class SeatChannel:
+    """
+    一个座位的 WebSocket 连接：出牌/过牌从这条连接发上来，回合信息从这条连接推下去
+
+    客户端 -> 服务器:
+        {"type": "play", "cards": [...], "id": 1}   出牌（牌字典或牌面编码）
+        {"type": "pass", "id": 2}                   过牌
+        {"type": "sync"}                            重新推送完整回合信息
+        {"type": "ping", "id": 3}
+    服务器 -> 客户端:
+        {"type": "turn", ...}      回合信息：连接后（开局后）先推完整的，之后每次版本变化推增量（同 /game/turn?since=）
+        {"type": "result", "id": 1, "action": "play", "success": ..., ...}   动作结果，字段同 /game/play
+        {"type": "pong", "id": 3} / {"type": "error", "message": ...} / {"type": "closed"}
+    JSON 用文本帧；?encoding=msgpack 时用二进制帧（MessagePack，牌为牌面编码，见 codec.py）
+    连接时要出示座位令牌（X-Seat-Token 请求头或 ?token=，见 claim_seat），否则回复 error 后断开
+    """
+    def __init__(self, ws, table, player_id, mimetype=codec.JSON):
+        self.ws = ws
+        self.table = table
+        self.player_id = player_id
+        self.mimetype = mimetype
+        self.version = None        # 最后推送给客户端的版本号，None 表示下次推完整信息
+        self.closed = False
+        self._send_lock = Lock()   # 推送线程和处理消息的线程都会发送
+    
+    def serve(self):
+        """处理客户端消息直到连接断开；推送在单独的线程里等待状态变化"""
+        WS_CONNECTIONS.inc()
+        pusher = threading.Thread(target=self._push_loop, daemon=True)
+        pusher.start()
+        try:
+            while not self.closed:
+                message = self.ws.receive(timeout=SSE_HEARTBEAT_INTERVAL)
+                if message is not None:
+                    self._handle(message)
+        except ConnectionClosed:
+            pass
+        finally:
+            self.closed = True
+            with self.table.lock:
+                self.table.changed.notify_all()
+            pusher.join(timeout=1)
+            WS_CONNECTIONS.dec()
+    
+    def _send(self, data):
+        """发送已编码的消息；JSON 用文本帧"""
+        with self._send_lock:
+            self.ws.send(data.decode('utf-8') if self.mimetype == codec.JSON else data)
+    
+    def _reply(self, message):
+        self._send(codec.encode(message, self.mimetype))
+    
+    def _turn_message(self):
+        """当前版本的回合信息消息（已编码），客户端已有上一版本时为增量；调用方需持有 table.lock"""
+        state = self.table.game_state
+        since, player_id = self.version, self.player_id
+        if state.can_delta(since):
+            data = self.table.payload(f'ws-turn{player_id}-since{since}', lambda: dict(
+                state.get_turn_info_delta(player_id, since), type='turn'), self.mimetype)
+        else:
+            data = self.table.payload(f'ws-turn{player_id}', lambda: dict(
+                state.get_turn_info(player_id), type='turn'), self.mimetype)
+        self.version = state.version
+        return data
+    
+    def _push_loop(self):
+        table = self.table
+        
+        def changed():
+            return (self.closed or table.closed
+                    or (table.game_state is not None and table.game_state.version != self.version))
+        
+        try:
+            while True:
+                with table.lock:
+                    if not table.changed.wait_for(changed, timeout=SSE_HEARTBEAT_INTERVAL):
+                        continue
+                    if self.closed:
+                        return
+                    data = None if table.closed else self._turn_message()
+                if data is None:
+                    self._reply({'type': 'closed', 'gameId': table.id})
+                    self.ws.close()
+                    return
+                self._send(data)
+        except ConnectionClosed:
+            self.closed = True
+    
+    def _handle(self, message):
+        try:
+            binary = isinstance(message, bytes) and self.mimetype != codec.JSON
+            data = codec.decode(message, codec.MSGPACK if binary else codec.JSON)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            WS_MESSAGES.labels('invalid').inc()
+            self._reply({'type': 'error', 'message': '无效的消息'})
+            return
+        
+        kind = data.get('type')
+        WS_MESSAGES.labels(kind if kind in ('play', 'pass', 'sync', 'ping') else 'other').inc()
+        reply = {'type': 'result', 'id': data.get('id'), 'action': kind}
+        state = self.table.game_state
+        if kind in ('play', 'pass') and (state is None or not state.started):
+            reply.update(success=False, message='游戏未开始')
+        elif kind == 'play':
+            cards = data.get('cards', [])
+            if not isinstance(cards, list):
+                reply.update(success=False, message='cards 必须是列表')
+            else:
+                reply.update(self.table.play(self.player_id, cards))
+        elif kind == 'pass':
+            reply.update(self.table.pass_turn(self.player_id))
+        elif kind == 'sync':
+            with self.table.lock:
+                if self.table.game_state is None:
+                    return
+                self.version = None
+                turn = self._turn_message()
+            self._send(turn)
+            return
+        elif kind == 'ping':
+            reply = {'type': 'pong', 'id': data.get('id')}
+        else:
+            reply = {'type': 'error', 'id': data.get('id'), 'message': f'未知的消息类型: {kind}'}
+        self._reply(reply)
+
+
+def _seat_socket_error(table, player_id, token):
+    """
+    WebSocket 连接前的检查，通过时返回 None
+    这条连接可以替座位出牌/过牌，所以和座位私有事件流一样要出示 claim 得到的座位令牌
+    """
+    if table is None:
+        return '牌桌不存在'
+    if not 0 <= player_id < 4:
+        return '玩家不存在'
+    if not table.seat_authorized(player_id, token):
+        return '座位令牌无效'
+    return None
+
+
+def seat_socket(ws, game_id, player_id):
+    """座位的 WebSocket 通道（协议见 SeatChannel）"""
+    mimetype = codec.JSON
+    if request.args.get('encoding') == 'msgpack' and codec.msgpack_available():
+        mimetype = codec.MSGPACK
+    table = _lookup_table(game_id)
+    error = _seat_socket_error(table, player_id, _seat_token())
+    if error:
+        SeatChannel(ws, table, player_id, mimetype)._reply({'type': 'error', 'message': error})
+        return
+    SeatChannel(ws, table, player_id, mimetype).serve()
+
+
+if sock is not None:
+    # flask-sock 的 route 装饰器不返回函数，两条路由分别注册
+    sock.route('/game/ws/<int:player_id>', defaults={'game_id': DEFAULT_GAME_ID},
+               endpoint='seat_socket_default')(seat_socket)
+    sock.route('/game/<game_id>/ws/<int:player_id>')(seat_socket)
+
+
+@app.route('/game/state', methods=['GET'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/state', methods=['GET'])
+def get_state(game_id):
+    """
+    获取游戏状态
+    支持 If-None-Match（版本未变返回 304）和 ?since=<版本号>（只返回之后的变化）
+    """
+    since, error = _since_arg()
+    if error:
+        return error
+    table, error = _table_or_error(game_id)
+    if error:
+        return error
+    
+    mimetype = _response_mimetype()
+    with table.lock:
+        state = table.game_state
+        delta = state.can_delta(since)
+        etag = table.etag('state', since if delta else None, mimetype)
+        if request.if_none_match.contains_weak(etag):
+            data = None
+        elif delta:
+            data = table.payload(f'state-since{since}', lambda: state.get_state_delta(since), mimetype)
+        else:
+            data = table.payload('state', state.get_state, mimetype)
+    return _versioned_response(data, etag, mimetype)
+
+
+@app.route('/game/turn/<int:player_id>', methods=['GET'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/turn/<int:player_id>', methods=['GET'])
+def get_turn(game_id, player_id):
+    """
+    获取玩家的回合信息
+    支持长轮询: ?wait=<秒>&since=<版本号>，阻塞到轮到该玩家或状态版本变化
+    带 since 时只返回该版本之后的变化（见 GameState.get_turn_info_delta）；支持 If-None-Match
+    """
+    since, error = _since_arg()
+    if error:
+        return error
+    try:
+        wait = min(float(request.args.get('wait', 0)), LONG_POLL_MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'wait 参数无效'}), 400
+    
+    if wait > 0:
+        table = _lookup_table(game_id)
+        if table is None:
+            return jsonify({'error': '牌桌不存在'}), 404
+        if not table.seat_readable(player_id, _seat_token()):
+            return jsonify({'error': '座位令牌无效'}), 403
+        with table.lock:
+            # 游戏尚未开始时也可以等待开局
+            table.wait_for_turn(player_id, since, timeout=wait)
+    
+    table, error = _table_or_error(game_id)
+    if error:
+        return error
+    if not table.seat_readable(player_id, _seat_token()):
+        return jsonify({'error': '座位令牌无效'}), 403
+    
+    mimetype = _response_mimetype()
+    with table.lock:
+        state = table.game_state
+        delta = state.can_delta(since)
+        etag = table.etag(f'turn{player_id}', since if delta else None, mimetype)
+        if request.if_none_match.contains_weak(etag):
+            data = None
+        elif delta:
+            data = table.payload(f'turn{player_id}-since{since}',
+                                 lambda: state.get_turn_info_delta(player_id, since), mimetype)
+        else:
+            data = table.payload(f'turn{player_id}', lambda: state.get_turn_info(player_id), mimetype)
+    return _versioned_response(data, etag, mimetype)
+
+
+@app.route('/game/history', methods=['GET'], defaults={'game_id': DEFAULT_GAME_ID})
+@app.route('/game/<game_id>/history', methods=['GET'])
+def get_history(game_id):
     """获取完整的出牌历史"""
-    if not game_state:
-        return jsonify({'error': '游戏未开始'}), 400
+    table, error = _table_or_error(game_id)
+    if error:
+        return error
     
-    return jsonify({
-        'total': len(game_state.play_history),
-        'history': game_state.play_history
-    })
+    mimetype = _response_mimetype()
+    with table.lock:
+        history = table.game_state.play_history
+        data = table.payload('history', lambda: {
+            'total': len(history),
+            'history': history
+        }, mimetype)
+    return _bytes_response(data, mimetype)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 文本格式的指标"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
 
 @app.route('/health', methods=['GET'])
@@ -554,4 +959,6 @@ def serve_static(filename):
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
     app.run(debug=True, port=5000, host='0.0.0.0')
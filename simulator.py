@@ -0,0 +1,147 @@
+"""
+掼蛋无界面模拟器 - 不经过 HTTP/SSE，在进程内直接驱动 GameState
+
+用法:
+    sim = Simulator([greedy_policy] * 4, seed=42)
+    for result in sim.run(1000):
+        ...
+
+策略（policy）是一个可调用对象: policy(view, rng) -> rules.Move 或 None（过牌）
+    view: TurnView，包含座位、手牌计数、上家牌型、各家剩余牌数，view.moves 为所有合法出法
+    rng:  该局的 random.Random，策略需要随机性时用它以保证可复现
+"""
+import random
+import time
+from collections import namedtuple
+
+import rules
+from engine import GameState
+
+# 一局的结果
+#   seed: 本局种子；winner: 先出完牌的座位（超过回合上限为 None）；
+#   team: 获胜队伍（0 = 座位 0/2，1 = 座位 1/3）；turns: 总回合数（含过牌）；
+#   card_counts: 结束时各家剩余牌数；rejected: 被引擎拒绝的出牌次数（按过牌处理）
+GameResult = namedtuple('GameResult', ['seed', 'winner', 'team', 'turns', 'card_counts', 'rejected'])
+
+DEFAULT_MAX_TURNS = 2000
+
+
+class TurnView:
+    """某个座位在自己回合看到的信息"""
+    __slots__ = ('seat', 'counts', 'last_type', 'last_player', 'level',
+                 'card_counts', 'pass_count', '_moves')
+
+    def __init__(self, seat, counts, last_type, last_player, level, card_counts, pass_count):
+        self.seat = seat
+        self.counts = counts            # 长度 54 的牌面计数
+        self.last_type = last_type      # 上家牌型（rules.HandType），首家出牌为 None
+        self.last_player = last_player  # 上家座位，首家出牌为 None
+        self.level = level
+        self.card_counts = card_counts  # 各座位剩余牌数
+        self.pass_count = pass_count
+        self._moves = None
+
+    @property
+    def leading(self):
+        return self.last_type is None
+
+    @property
+    def moves(self):
+        """所有合法出法（从小到大），首次访问时计算"""
+        if self._moves is None:
+            self._moves = rules.legal_moves(self.counts, self.last_type, self.level)
+        return self._moves
+
+
+def random_policy(view, rng):
+    """随机出一种合法出法；跟牌时有一半概率过牌"""
+    moves = view.moves
+    if not moves or (not view.leading and rng.random() < 0.5):
+        return None
+    return rng.choice(moves)
+
+
+def greedy_policy(view, rng):
+    """总是出最小的合法出法，不压队友的牌"""
+    moves = view.moves
+    if not moves:
+        return None
+    if not view.leading and view.last_player is not None and (view.last_player - view.seat) % 2 == 0:
+        # 队友的牌不压
+        return None
+    return moves[0]
+
+
+class Simulator:
+    """在一个循环里连续跑完整对局"""
+    def __init__(self, policies, seed=None, level=2, max_turns=DEFAULT_MAX_TURNS):
+        if len(policies) != 4:
+            raise ValueError("需要 4 个座位的策略")
+        self.policies = list(policies)
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.level = level
+        self.max_turns = max_turns
+
+    def play_game(self, seed):
+        """用给定种子跑一局，返回 GameResult"""
+        rng = random.Random(seed)
+        state = GameState(rng=rng)
+        state.current_level = self.level
+        state.start_game()
+        players = state.players
+        policies = self.policies
+
+        turns = 0
+        rejected = 0
+        while state.winner_id is None and turns < self.max_turns:
+            seat = state.current_player_id
+            last_player = state.last_play['playerId'] if state.last_play else None
+            view = TurnView(seat, players[seat].counts, state.last_hand_type, last_player,
+                            state.current_level, [p.card_count for p in players], state.pass_count)
+            move = policies[seat](view, rng)
+            if move is None:
+                state.pass_turn(seat)
+            elif not state.play_faces(seat, move.faces)['success']:
+                rejected += 1
+                state.pass_turn(seat)
+            turns += 1
+
+        winner = state.winner_id
+        return GameResult(seed, winner, None if winner is None else winner % 2, turns,
+                          [p.card_count for p in players], rejected)
+
+    def seeds(self, n_games, start=0):
+        """第 start..start+n_games-1 局的种子（由 Simulator 的种子确定）"""
+        return [derive_seed(self.seed, i) for i in range(start, start + n_games)]
+
+    def run(self, n_games, start=0):
+        """依次跑 n_games 局，逐局产出 GameResult"""
+        for seed in self.seeds(n_games, start):
+            yield self.play_game(seed)
+
+
+def derive_seed(base_seed, index):
+    """从基础种子和局序号得到该局种子，与运行在哪个进程无关"""
+    return (base_seed * 1000003 + index) % (2 ** 63)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='掼蛋无界面模拟器')
+    parser.add_argument('--games', type=int, default=1000, help='对局数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    sim = Simulator([greedy_policy, random_policy, greedy_policy, random_policy], seed=args.seed)
+    start = time.perf_counter()
+    wins = [0, 0]
+    unfinished = 0
+    for result in sim.run(args.games):
+        if result.team is None:
+            unfinished += 1
+        else:
+            wins[result.team] += 1
+    elapsed = time.perf_counter() - start
+    print(f"{args.games} 局，用时 {elapsed:.2f}s（{args.games / elapsed:.0f} 局/秒）")
+    print(f"座位 0/2（greedy）胜 {wins[0]}，座位 1/3（random）胜 {wins[1]}，未结束 {unfinished}")
@@ -3,7 +3,8 @@
 可以启动 3 个规则引擎 AI，或 2 个规则引擎 + 1 个 LLM AI
 """
 
-import sys
+import logging
+import os
 import time
 import threading
 from typing import List
@@ -67,12 +68,14 @@ def shutdown_agents():
     for agent in agents:
         agent.stop_event.set()
     for t in threads:
-        t.join(timeout=5)
+        t.join(timeout=6)
     print("✅ 所有 AI Agent 已停止")
     print("=" * 50)
 
 
 if __name__ == '__main__':
+    # 日志级别用环境变量 LOG_LEVEL 调整（DEBUG 时输出每回合的详细信息）
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), format='%(message)s')
     print("掼蛋 AI Agent 混合启动器")
     print("=" * 50)
     print("使用方式:")
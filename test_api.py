@@ -2,29 +2,31 @@
 快速测试脚本 - 验证API功能
 """
 
-import requests
-import json
-import time
+from guandan_client import GuandanClient, GameAPIError
 
 BASE_URL = 'http://localhost:5000'
 
+# compact=False：用 JSON 编码，牌是牌字典，方便打印
+client = GuandanClient(BASE_URL, compact=False)
+
+
 def test_health():
     """测试服务器是否在线"""
     try:
-        resp = requests.get(f'{BASE_URL}/health')
-        print(f"✅ 服务器在线: {resp.json()}")
+        print(f"✅ 服务器在线: {client.health()}")
         return True
     except Exception as e:
         print(f"❌ 服务器离线: {e}")
         return False
 
+
 def test_static_files():
     """测试静态文件是否能访问"""
     files_to_test = ['index.html', 'game.js', 'style.css']
     
     for file in files_to_test:
         try:
-            resp = requests.get(f'{BASE_URL}/{file}')
+            resp = client.session.get(f'{BASE_URL}/{file}', timeout=client.timeout)
             if resp.status_code == 200:
                 size = len(resp.content)
                 print(f"✅ {file} ({size} bytes)")
@@ -33,74 +35,68 @@ def test_static_files():
         except Exception as e:
             print(f"❌ {file} - {e}")
 
+
 def test_game_flow():
     """测试游戏流程"""
     print("\n=== 游戏流程测试 ===")
     
     # 1. 开始游戏
     print("1. 开始游戏...")
-    resp = requests.post(f'{BASE_URL}/game/start')
-    if resp.status_code != 200:
-        print(f"❌ 开始游戏失败: {resp.text}")
+    try:
+        result = client.start()
+    except GameAPIError as e:
+        print(f"❌ 开始游戏失败: {e}")
         return
-    
-    result = resp.json()
-    print(f"✅ {result['message']}")
+    print(f"✅ {result.message}")
     
     # 2. 获取玩家手牌
     print("2. 获取玩家手牌...")
-    resp = requests.get(f'{BASE_URL}/game/player/0/hand')
-    if resp.status_code != 200:
-        print(f"❌ 获取手牌失败: {resp.text}")
+    try:
+        hand = client.hand(0)
+    except GameAPIError as e:
+        print(f"❌ 获取手牌失败: {e}")
         return
-    
-    data = resp.json()
-    print(f"✅ 玩家0有 {data['cardCount']} 张牌")
-    print(f"   前3张: {[f\"{c['value']}{c['suit']}\" for c in data['cards'][:3]]}")
+    print(f"✅ 玩家0有 {hand.card_count} 张牌")
+    first_three = [f"{c['value']}{c['suit']}" for c in hand.cards[:3]]
+    print(f"   前3张: {first_three}")
     
     # 3. 获取游戏状态
     print("3. 获取游戏状态...")
-    resp = requests.get(f'{BASE_URL}/game/state')
-    if resp.status_code != 200:
-        print(f"❌ 获取状态失败: {resp.text}")
+    try:
+        state = client.state()
+    except GameAPIError as e:
+        print(f"❌ 获取状态失败: {e}")
         return
-    
-    state = resp.json()
-    print(f"✅ 当前玩家: {state['currentPlayerName']}")
-    print(f"   开始状态: {state['started']}")
-    print(f"   玩家数: {len(state['players'])}")
+    print(f"✅ 当前玩家: {state.raw['currentPlayerName']}")
+    print(f"   开始状态: {state.started}")
+    print(f"   玩家数: {len(state.players)}")
     
     # 4. 出第一张牌
     print("4. 玩家0出第一张牌...")
-    first_card = data['cards'][0]
-    resp = requests.post(f'{BASE_URL}/game/play', json={
-        'playerId': 0,
-        'cards': [first_card]
-    })
-    
-    if resp.status_code != 200:
-        print(f"❌ 出牌失败: {resp.text}")
+    try:
+        result = client.play(0, [hand.cards[0]])
+    except GameAPIError as e:
+        print(f"❌ 出牌失败: {e}")
         return
-    
-    result = resp.json()
-    if result['success']:
-        print(f"✅ 出牌成功")
-        print(f"   下一个玩家: {result['nextPlayer']}")
+    if result.success:
+        print("✅ 出牌成功")
+        print(f"   下一个玩家: {result.next_player}")
     else:
-        print(f"❌ 出牌失败: {result['message']}")
+        print(f"❌ 出牌失败: {result.message}")
     
     # 5. 获取历史
     print("5. 获取出牌历史...")
-    resp = requests.get(f'{BASE_URL}/game/history')
-    if resp.status_code != 200:
-        print(f"❌ 获取历史失败: {resp.text}")
+    try:
+        history = client.history()
+    except GameAPIError as e:
+        print(f"❌ 获取历史失败: {e}")
         return
-    
-    history = resp.json()
-    print(f"✅ 历史记录: {history['total']} 条")
-    if history['history']:
-        last = history['history'][-1]
-        print(f"   最后一次: {last['playerName']} {'过' if last['isPass'] else f\"出{last['cardType']['name']}\"}")
+    print(f"✅ 历史记录: {len(history)} 条")
+    if history:
+        last = history[-1]
+        action = '过' if last['isPass'] else f"出{last['cardType']['name']}"
+        print(f"   最后一次: {last['playerName']} {action}")
+
 
 if __name__ == '__main__':
     print("="*50)
@@ -0,0 +1,16 @@
+"""
+批量引擎与 engine.GameState 的交叉校验（同 python batch_engine.py --check N）
+
+两个引擎用同样的动作（合法出法、过牌、乱出的牌）推进，逐步比对结果码和完整状态。
+    python -m pytest -q test_batch_engine.py
+"""
+import pytest
+
+pytest.importorskip('numpy')
+
+import batch_engine  # noqa: E402
+
+
+@pytest.mark.parametrize('level', [2, 5, 14])
+def test_cross_check_matches_game_state(level):
+    assert batch_engine.cross_check(20, seed=level, level=level) > 0
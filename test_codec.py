@@ -0,0 +1,75 @@
+"""
+codec 的测试：JSON / MessagePack 编解码、牌的紧凑表示、Accept 协商
+
+    python -m pytest -q test_codec.py
+"""
+import pytest
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import codec
+from cards import face_to_dict
+
+needs_msgpack = pytest.mark.skipif(not codec.msgpack_available(), reason='未安装 msgpack')
+
+HAND = [face_to_dict(f) for f in (0, 14, 52, 53)]
+
+
+def test_compact_cards_replaces_card_lists_only():
+    obj = {'playerId': 1, 'hand': HAND, 'lastPlay': {'cards': HAND[:2], 'cardType': {'name': '对子'}},
+           'history': [{'cards': HAND[2:]}]}
+    compact = codec.compact_cards(obj)
+    assert compact == {'playerId': 1, 'hand': [0, 14, 52, 53],
+                       'lastPlay': {'cards': [0, 14], 'cardType': {'name': '对子'}},
+                       'history': [{'cards': [52, 53]}]}
+    assert obj['hand'] == HAND   # 不修改原对象
+
+
+def test_to_faces_and_expand_cards():
+    assert codec.to_faces(HAND) == [0, 14, 52, 53]
+    assert codec.to_faces([HAND[0], 53]) == [0, 53]
+    for bad in ([True], [54], [-1], [{'suit': '?', 'value': '2'}]):
+        assert codec.to_faces(bad) is None
+    assert codec.expand_cards([0, HAND[1]]) == HAND[:2]
+
+
+def test_json_round_trip():
+    obj = {'playerName': '玩家', 'cards': HAND}
+    assert codec.decode(codec.encode(obj), codec.JSON) == obj
+
+
+@needs_msgpack
+def test_msgpack_round_trip():
+    obj = {'playerName': '玩家', 'cards': HAND, 'version': 3}
+    data = codec.encode(obj, codec.MSGPACK)
+    assert codec.decode(data, codec.MSGPACK) == {'playerName': '玩家', 'cards': [0, 14, 52, 53], 'version': 3}
+    assert len(data) < len(codec.encode(obj))
+    body, content_type = codec.encode_body({'cards': [0, 14]})
+    assert content_type == codec.MSGPACK and codec.decode(body, content_type) == {'cards': [0, 14]}
+    assert codec.encode_body({'cards': [0]}, compact=False)[1] == codec.JSON
+
+
+ACCEPT_HEADERS = [
+    None,
+    '*/*',
+    'application/json',
+    'application/msgpack',
+    'application/x-msgpack',
+    'application/msgpack, application/json;q=0.5',
+    'application/json, application/msgpack;q=0.5',
+    'application/msgpack;q=0.2, */*;q=0.8',
+    'text/html',
+]
+
+
+@needs_msgpack
+@pytest.mark.parametrize('accept', ACCEPT_HEADERS)
+def test_negotiate_header_matches_werkzeug(accept):
+    # asyncio 服务器用 negotiate_header，Flask 用 negotiate，两者必须一致
+    assert codec.negotiate_header(accept) == codec.negotiate(parse_accept_header(accept, MIMEAccept))
+
+
+@needs_msgpack
+def test_accept_header():
+    assert codec.negotiate_header(codec.accept_header()) == codec.MSGPACK
+    assert codec.negotiate_header(codec.accept_header(compact=False)) == codec.JSON
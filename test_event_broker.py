@@ -0,0 +1,81 @@
+"""
+event_broker.EventBroker 的测试：广播、Last-Event-ID 补发、resync、断开慢消费者
+
+    python -m pytest -q test_event_broker.py
+"""
+import json
+
+from event_broker import EventBroker, encode_event
+
+
+def drain(sub):
+    """订阅者队列里现有的消息 -> [(id, 事件)]；None（连接结束）记为 (None, None)"""
+    messages = []
+    while not sub.queue.empty():
+        payload = sub.queue.get_nowait()
+        if payload is None:
+            messages.append((None, None))
+            continue
+        head, data = payload.decode('utf-8').strip().split('\n')
+        messages.append((int(head[len('id: '):]), json.loads(data[len('data: '):])))
+    return messages
+
+
+def test_encode_event():
+    assert encode_event(3, {'type': 'pass', 'playerName': '玩家'}) == \
+        'id: 3\ndata: {"type":"pass","playerName":"玩家"}\n\n'.encode('utf-8')
+
+
+def test_publish_reaches_every_subscriber():
+    broker = EventBroker()
+    first, second = broker.subscribe(), broker.subscribe()
+    assert broker.publish({'n': 1}) == 1
+    assert broker.publish({'n': 2}) == 2
+    assert drain(first) == drain(second) == [(1, {'n': 1}), (2, {'n': 2})]
+    assert broker.subscriber_count() == 2 and broker.last_seq == 2
+
+
+def test_replay_after_last_event_id():
+    broker = EventBroker(history_size=8)
+    for n in range(5):
+        broker.publish({'n': n})
+    assert drain(broker.subscribe(last_event_id=3)) == [(4, {'n': 3}), (5, {'n': 4})]
+    assert drain(broker.subscribe(last_event_id=5)) == []
+    # 不带 Last-Event-ID 的新连接不补发
+    assert drain(broker.subscribe()) == []
+
+
+def test_resync_when_history_overflowed():
+    broker = EventBroker(history_size=3)
+    for n in range(6):
+        broker.publish({'n': n})
+    # 需要 2 之后的事件，缓冲里只剩 4~6
+    assert drain(broker.subscribe(last_event_id=2)) == [(6, {'type': 'resync'})]
+    # 3 之后的正好都在
+    assert [seq for seq, _ in drain(broker.subscribe(last_event_id=3))] == [4, 5, 6]
+
+
+def test_slow_subscriber_is_dropped():
+    drops = []
+    broker = EventBroker(queue_size=2, on_drop=lambda: drops.append(1))
+    slow, fast = broker.subscribe(), broker.subscribe()
+    broker.publish({'n': 1})
+    broker.publish({'n': 2})
+    drain(fast)
+    broker.publish({'n': 3})
+    assert slow.dropped and not fast.dropped
+    assert drops == [1] and broker.subscriber_count() == 1
+    # 被断开的订阅者读到结束标记；重连时凭 Last-Event-ID 补发
+    assert drain(slow)[-1] == (None, None)
+    assert drain(broker.subscribe(last_event_id=1)) == [(2, {'n': 2}), (3, {'n': 3})]
+    assert drain(fast) == [(3, {'n': 3})]
+
+
+def test_close_ends_subscribers():
+    broker = EventBroker()
+    sub = broker.subscribe()
+    broker.close()
+    assert sub.get(timeout=1) is None
+    assert broker.subscriber_count() == 0
+    # 关闭后的订阅立即结束
+    assert broker.subscribe().get(timeout=1) is None
@@ -0,0 +1,225 @@
+"""
+LLMGuandanAIAgent 的测试：预测执行（Speculator）的命中与作废，回合期限、对冲请求和规则 AI 兜底
+
+LLM 用 mock_llm_server.MockLLM（本地端口上的模拟 OpenAI 服务），回答和延迟都是确定的；
+Agent 不连接游戏服务器（需要回合信息的地方直接替换 game_client.turn）
+
+    python -m pytest -q test_llm_ai_agent.py
+"""
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('openai')
+
+import codec  # noqa: E402
+from ai_agent import GuandanAIAgent  # noqa: E402
+import llm_cache  # noqa: E402
+import rules  # noqa: E402
+from llm_ai_agent import LLMGuandanAIAgent  # noqa: E402
+from llm_prompt import candidate_moves  # noqa: E402
+from mock_llm_server import MockLLM, serve_in_background  # noqa: E402
+from test_rules import hand  # noqa: E402
+
+LEVEL = 5
+LEAD = 'S3 D3 C9 SK'
+
+
+@pytest.fixture
+def make_agent():
+    """make_agent(mock, **参数) -> 连到该 MockLLM 的 Agent（不用决策缓存）；测试结束时关闭服务和线程池"""
+    cleanups = []
+
+    def make(mock, **kwargs):
+        base, stop = serve_in_background(mock)
+        cleanups.append(stop)
+        kwargs.setdefault('speculate', True)
+        kwargs.setdefault('turn_deadline', 5)
+        agent = LLMGuandanAIAgent(server_url='http://127.0.0.1:9', api_key='mock', api_base=base,
+                                  cache=False, **kwargs)
+        cleanups.append(agent._llm_pool.shutdown)
+        if agent.speculator is not None:
+            cleanups.append(agent.speculator.shutdown)
+        return agent
+
+    yield make
+    for cleanup in reversed(cleanups):
+        cleanup()
+
+
+def situation(agent, text, last_type=None):
+    """手牌 -> (局面键, 牌面, 候选出法, LLM 调用的参数)"""
+    faces = hand(text)
+    key = llm_cache.situation_key(faces, last_type, LEVEL, agent.cache_namespace)
+    candidates = candidate_moves(rules.counts_from_faces(faces), last_type, LEVEL, agent.max_candidates)
+    return key, faces, candidates, (faces, None, LEVEL, candidates)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, '等待超时'
+        time.sleep(0.01)
+
+
+def fallback(faces, last_type=None):
+    """规则 AI 的决策（LLM 用不上时的兜底）"""
+    moves = rules.legal_moves(rules.counts_from_faces(faces), last_type, LEVEL)
+    return ('play', sorted(GuandanAIAgent.choose_move(moves, last_type is None).faces))
+
+
+def played(decision):
+    action, cards = decision
+    return action, sorted(codec.to_faces(cards))
+
+
+# ---- 预测执行 ----
+
+def test_speculation_hit_reuses_the_request(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '2')]))
+    key, faces, candidates, args = situation(agent, LEAD)
+    agent.speculator.submit({key: args})
+    # 已经在算的局面不重复提交
+    agent.speculator.submit({key: args})
+
+    assert played(agent._llm_decision(key, faces, None, None, LEVEL)) == ('play', sorted(candidates[1].faces))
+    assert agent.usage.calls == 1
+    stats = agent.speculator.stats()
+    assert (stats['started'], stats['hits'], stats['misses'], stats['discarded']) == (1, 1, 0, 0)
+
+
+def test_speculation_miss_discards_and_asks_again(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '1')]))
+    key, faces, candidates, args = situation(agent, LEAD)
+    other_key, _, _, other_args = situation(agent, 'S4 D4 C10 SQ')
+    agent.speculator.submit({other_key: other_args})
+
+    assert played(agent._llm_decision(key, faces, None, None, LEVEL)) == ('play', sorted(candidates[0].faces))
+    # 预测的局面没有出现：作废预测，照常请求 LLM
+    assert agent.speculator.claim(other_key) is None
+    stats = agent.speculator.stats()
+    assert (stats['started'], stats['hits'], stats['misses'], stats['discarded']) == (1, 0, 1, 1)
+
+
+def test_new_round_replaces_stale_speculation(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '1')]))
+    key, _, _, args = situation(agent, LEAD)
+    other_key, _, _, other_args = situation(agent, 'S4 D4 C10 SQ')
+    agent.speculator.submit({key: args})
+    agent.speculator.submit({other_key: other_args})
+    assert agent.speculator.claim(key) is None
+    agent.speculator.submit({key: args})
+    agent.speculator.cancel()
+    assert agent.speculator.claim(key) is None
+    stats = agent.speculator.stats()
+    assert (stats['started'], stats['discarded']) == (3, 3)
+
+
+def test_turn_event_speculates_off_the_event_loop(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '1')]))
+    key, faces, candidates, _ = situation(agent, LEAD)
+    threads = []
+
+    def turn(player_id):
+        threads.append(threading.current_thread().name)
+        # 上家（1 号）正要行动，最后一手是自己出的：上家再过就轮到自己首家出牌
+        return SimpleNamespace(current_player=1, level=LEVEL, hand=faces, game=SimpleNamespace(game_over=False),
+                               last_play={'playerId': agent.player_id, 'isPass': False})
+    agent.game_client.turn = turn
+
+    # 不是上家开始行动的事件不预测
+    agent._on_event({'type': 'turn', 'nextPlayer': 3})
+    agent._on_event({'type': 'turn', 'nextPlayer': 1})
+    wait_for(lambda: agent.speculator.started == 1)
+    assert len(threads) == 1 and threads[0].startswith('llm-speculate')
+
+    assert played(agent._llm_decision(key, faces, None, None, LEVEL)) == ('play', sorted(candidates[0].faces))
+    assert agent.speculator.stats()['hits'] == 1 and agent.usage.calls == 1
+
+    # 本局结束作废所有预测
+    agent._on_event({'type': 'turn', 'nextPlayer': 1})
+    wait_for(lambda: agent.speculator.started == 2)
+    agent._on_event({'type': 'turn', 'gameOver': True})
+    assert agent.speculator.claim(key) is None
+
+
+# ---- 回合期限、对冲与兜底 ----
+
+def test_scripted_answer_picks_that_candidate(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '3')]), speculate=False)
+    key, faces, candidates, _ = situation(agent, LEAD)
+    assert played(agent._llm_decision(key, faces, None, None, LEVEL)) == ('play', sorted(candidates[2].faces))
+    stats = agent.deadline_stats.stats()
+    assert (stats['turns'], stats['misses'], stats['hedges']) == (1, 0, 0)
+
+
+def test_pass_answer_when_following(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '0')]), speculate=False)
+    last_type = rules.HandType(rules.PAIR, 0, 2, 0)
+    faces = hand(LEAD)
+    key = llm_cache.situation_key(faces, last_type, LEVEL, agent.cache_namespace)
+    assert agent._llm_decision(key, faces, None, last_type, LEVEL) == ('pass', [])
+
+
+def test_deadline_falls_back_to_rules(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '2')], latency='fixed:1.0'), speculate=False, turn_deadline=0.3)
+    # 请求本身不超时，只看回合期限
+    agent.client = agent.client.with_options(timeout=5)
+    key, faces, _, _ = situation(agent, LEAD)
+    start = time.perf_counter()
+    assert played(agent._llm_decision(key, faces, None, None, LEVEL)) == fallback(faces)
+    assert time.perf_counter() - start < 0.9
+    stats = agent.deadline_stats.stats()
+    assert (stats['turns'], stats['misses'], stats['missRate']) == (1, 1, 1.0)
+
+
+@pytest.mark.parametrize('mock', [
+    MockLLM(script=[(None, '过')]),
+    MockLLM(script=[(None, '99')]),
+    MockLLM(errors='500:1.0'),
+], ids=['invalid', 'out-of-range', 'error'])
+def test_unusable_answer_falls_back_to_rules(make_agent, mock):
+    agent = make_agent(mock, speculate=False)
+    key, faces, _, _ = situation(agent, LEAD)
+    assert played(agent._llm_decision(key, faces, None, None, LEVEL)) == fallback(faces)
+    assert agent.deadline_stats.stats()['misses'] == 0
+
+
+def test_hedge_wins_over_a_slow_request(make_agent):
+    mock = MockLLM(script=[(None, '2')])
+    delays = iter([1.0, 0.0])   # 第一个请求慢，对冲请求立即回答
+    mock.latency = lambda rng: next(delays, 0.0)
+    agent = make_agent(mock, speculate=False, turn_deadline=3, hedge_after=0.1)
+    key, faces, candidates, _ = situation(agent, LEAD)
+    start = time.perf_counter()
+    assert played(agent._llm_decision(key, faces, None, None, LEVEL)) == ('play', sorted(candidates[1].faces))
+    assert time.perf_counter() - start < 0.9
+    stats = agent.deadline_stats.stats()
+    assert (stats['hedges'], stats['hedgeWins'], stats['misses']) == (1, 1, 0)
+
+
+def test_cancelled_requests_do_not_wait_for_the_deadline(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '1')]), turn_deadline=5)
+    _, _, _, args = situation(agent, LEAD)
+    cancelled = Future()
+    cancelled.cancel()
+    start = time.perf_counter()
+    assert agent._await_llm({cancelled}, None, args, start) is None
+    # 被取消的预测请求补发一次普通请求
+    spec = Future()
+    spec.cancel()
+    assert agent._await_llm({spec}, spec, args, start) == '1'
+    assert time.perf_counter() - start < 1
+    assert agent.speculator.stats()['misses'] == 2 and agent.deadline_stats.misses == 0
+
+
+def test_shut_down_pool_falls_back_to_rules(make_agent):
+    agent = make_agent(MockLLM(script=[(None, '1')]), speculate=False)
+    agent._llm_pool.shutdown()
+    key, faces, _, _ = situation(agent, LEAD)
+    assert played(agent._llm_decision(key, faces, None, None, LEVEL)) == fallback(faces)
+    assert agent.deadline_stats.turns == 1 and agent.usage.calls == 0
@@ -0,0 +1,152 @@
+"""
+llm_cache 的测试：局面编码、决策的保存与复用（resolve）、LRU / TTL、SQLite 持久化
+
+    python -m pytest -q test_llm_cache.py
+"""
+import pytest
+
+import llm_cache
+import rules
+from test_rules import hand
+
+LEVEL = 5   # 逢人配为红桃 5
+
+
+class Clock:
+    """替换 llm_cache.time.time 的手动时钟"""
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, 'time', clock)
+    return clock
+
+
+def key_of(text, last_type=None, level=LEVEL, namespace='model/v1'):
+    return llm_cache.situation_key(hand(text), last_type, level, namespace)
+
+
+def move_in(text, kind, last_type=None):
+    """手牌里第一手 kind 牌型的出法"""
+    counts = rules.counts_from_faces(hand(text))
+    return next(m for m in rules.legal_moves(counts, last_type, LEVEL) if m.hand_type.kind == kind)
+
+
+# ---- 局面编码 ----
+
+def test_situation_key_ignores_suits_only():
+    assert key_of('S3 D3 C9 HK') == key_of('H3 C3 D9 SK')
+    # 逢人配与其他花色的级牌不同
+    assert key_of('H5 S9') != key_of('S5 S9')
+    lead = key_of('S3 D3 C9')
+    assert lead != key_of('S3 D3 C9', last_type=rules.HandType(rules.PAIR, 1, 2, 0))
+    assert lead != key_of('S3 D3 C9', level=6)
+    assert lead != key_of('S3 D3 C9', namespace='model/v2')
+
+
+# ---- 决策的保存与复用 ----
+
+def test_resolve_on_another_suit_combination():
+    move = move_in('S3 D3 C9', rules.PAIR)
+    decision = llm_cache.encode_decision(move, LEVEL)
+    assert decision == {'action': 'play', 'kind': rules.PAIR, 'ranks': llm_cache.rank_counts(move.faces, LEVEL)[0],
+                        'wild': 0}
+    resolved = llm_cache.resolve(decision, rules.counts_from_faces(hand('H3 C3 D9')), None, LEVEL)
+    assert sorted(resolved.faces) == sorted(hand('H3 C3'))
+    assert llm_cache.resolve(llm_cache.encode_decision(None, LEVEL), [0] * 54, None, LEVEL) is None
+
+
+def test_resolve_keeps_the_wild_card_count():
+    decision = llm_cache.encode_decision(move_in('H5 S9', rules.PAIR), LEVEL)
+    assert decision['wild'] == 1
+    with pytest.raises(LookupError):
+        llm_cache.resolve(decision, rules.counts_from_faces(hand('S9 D9')), None, LEVEL)
+
+
+def test_resolve_requires_the_same_kind():
+    flush = llm_cache.encode_decision(move_in('S3 S4 S5 S6 S7', rules.STRAIGHT_FLUSH), LEVEL)
+    with pytest.raises(LookupError):
+        llm_cache.resolve(flush, rules.counts_from_faces(hand('S3 D4 S5 S6 S7')), None, LEVEL)
+    # 同花顺和普通顺子都凑得出时，各自落到自己的牌型上
+    both = rules.counts_from_faces(hand('S3 S4 S5 S6 S7 D7'))
+    assert llm_cache.resolve(flush, both, None, LEVEL).hand_type.kind == rules.STRAIGHT_FLUSH
+    plain = llm_cache.encode_decision(move_in('S3 D4 S5 S6 S7', rules.STRAIGHT), LEVEL)
+    assert llm_cache.resolve(plain, both, None, LEVEL).hand_type.kind == rules.STRAIGHT
+    # 只凑得出同花顺时，普通顺子的决策不复用
+    with pytest.raises(LookupError):
+        llm_cache.resolve(plain, rules.counts_from_faces(hand('S3 S4 S5 S6 S7')), None, LEVEL)
+    # 没有记录牌型的旧决策
+    with pytest.raises(LookupError):
+        llm_cache.resolve({k: v for k, v in plain.items() if k != 'kind'},
+                          rules.counts_from_faces(hand('S3 D4 S5 S6 S7')), None, LEVEL)
+
+
+def test_resolve_respects_the_last_play():
+    decision = llm_cache.encode_decision(move_in('S3 D3 C9', rules.PAIR), LEVEL)
+    higher = rules.HandType(rules.PAIR, rules.rank_order(LEVEL)[7], 2, 0)
+    with pytest.raises(LookupError):
+        llm_cache.resolve(decision, rules.counts_from_faces(hand('S3 D3 C9')), higher, LEVEL)
+
+
+# ---- 存储 ----
+
+def test_lru_eviction(clock):
+    cache = llm_cache.DecisionCache(max_entries=2)
+    cache.put('a', {'n': 1})
+    cache.put('b', {'n': 2})
+    assert cache.get('a') == {'n': 1}
+    cache.put('c', {'n': 3})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1} and cache.get('c') == {'n': 3}
+    assert cache.stats()['size'] == 2
+
+
+def test_ttl_expiry(clock):
+    cache = llm_cache.DecisionCache(ttl=60)
+    cache.put('a', llm_cache.PASS)
+    clock.now += 59
+    assert cache.contains('a') and cache.get('a') == llm_cache.PASS
+    clock.now += 2
+    assert not cache.contains('a')
+    assert cache.get('a') is None
+    assert cache.stats() == {'hits': 1, 'memoryHits': 1, 'diskHits': 0, 'unusable': 0, 'misses': 1,
+                             'hitRate': 0.5, 'size': 0}
+
+
+def test_unusable_hits_count_as_misses(clock):
+    cache = llm_cache.DecisionCache()
+    cache.put('a', llm_cache.PASS)
+    cache.get('a')
+    cache.mark_unusable()
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hitRate']) == (0, 1, 0.0)
+
+
+def test_sqlite_persistence(clock, tmp_path):
+    path = str(tmp_path / 'decisions.sqlite3')
+    writer = llm_cache.DecisionCache(path, ttl=60)
+    writer.put('a', {'action': 'play', 'kind': rules.PAIR, 'ranks': [2] + [0] * 14, 'wild': 0})
+    writer.put('b', llm_cache.PASS)
+
+    # 另一个进程（另一个实例）打开同一个文件
+    reader = llm_cache.DecisionCache(path, ttl=60)
+    assert reader.contains('a')
+    assert reader.get('a')['kind'] == rules.PAIR
+    assert reader.get('a')['kind'] == rules.PAIR
+    stats = reader.stats()
+    assert (stats['diskHits'], stats['memoryHits']) == (1, 1)
+
+    clock.now += 61
+    assert reader.get('b') is None
+    writer.close()
+    reader.close()
+    # 打开时清掉过期的决策
+    reopened = llm_cache.DecisionCache(path)
+    assert reopened._db.execute('SELECT COUNT(*) FROM decisions').fetchone()[0] == 0
+    reopened.close()
@@ -0,0 +1,95 @@
+"""
+llm_prompt 的测试：手牌的点数计数写法、每回合的用户消息、候选出法和编号回答的解析
+
+    python -m pytest -q test_llm_prompt.py
+"""
+import pytest
+
+import llm_prompt
+import rules
+from llm_cache import rank_counts
+from test_rules import hand
+
+LEVEL = 5   # 逢人配为红桃 5
+
+
+def test_format_ranks_counts_in_rank_order():
+    # 级牌排在 A 之后、王之前，逢人配单独写在最后
+    assert llm_prompt.format_ranks(hand('SA 小王 S3 H5 D3 S5 SK C9 H5'), LEVEL) == '3×2 9 K A 5 小王 配×2'
+    assert llm_prompt.format_ranks(hand('H5'), LEVEL) == '配'
+    assert llm_prompt.format_ranks([], LEVEL) == ''
+    # 花色不同的同一手牌写法相同
+    assert llm_prompt.format_ranks(hand('S3 D3 C9'), LEVEL) == llm_prompt.format_ranks(hand('H3 C3 S9'), LEVEL)
+
+
+def test_turn_prompt_when_leading():
+    faces = hand('S3 D3 C9')
+    candidates = llm_prompt.candidate_moves(rules.counts_from_faces(faces), None, LEVEL)
+    # 首家出牌不能过牌，没有 "0 过牌"
+    assert llm_prompt.turn_prompt(faces, None, LEVEL, candidates).split('\n') == [
+        '等级: 5', '手牌: 3×2 9', '上家: 无', '候选:', '1 对子 3×2', '2 单牌 9', '3 单牌 3']
+
+
+def test_turn_prompt_when_following():
+    faces = hand('S3 D3 H3 C9 S9 SK')
+    last_type = rules.pick(rules.classify(hand('S4 D4'), LEVEL))
+    candidates = llm_prompt.candidate_moves(rules.counts_from_faces(faces), last_type, LEVEL)
+    prompt = llm_prompt.turn_prompt(faces, ('对子', hand('S4 D4')), LEVEL, candidates)
+    assert prompt.split('\n') == ['等级: 5', '手牌: 3×3 9×2 K', '上家: 对子 4×2', '候选:', '0 过牌', '1 对子 9×2']
+
+
+def test_system_prompt_is_the_only_fixed_text():
+    # 规则和回答格式只在系统提示词里（前缀缓存），用户消息里不重复
+    prompt = llm_prompt.turn_prompt(hand('S3'), None, LEVEL, [])
+    assert '牌型' not in prompt and '牌型' in llm_prompt.SYSTEM_PROMPT
+
+
+# ---- 候选出法 ----
+
+BIG_HAND = 'S3 D3 H3 C3 S4 D4 S5 H5 S6 D6 S7 S8 S9 D9 SJ SQ CK HK SA 小王'
+
+
+def test_candidates_are_distinct_legal_moves():
+    counts = rules.counts_from_faces(hand(BIG_HAND))
+    legal = {(m.hand_type, tuple(sorted(m.faces))) for m in rules.legal_moves(counts, None, LEVEL)}
+    candidates = llm_prompt.candidate_moves(counts, None, LEVEL, limit=1000)
+    assert all((m.hand_type, tuple(sorted(m.faces))) in legal for m in candidates)
+    # 只是花色不同的同一手只留一个
+    idents = [(m.hand_type, tuple(rank_counts(m.faces, LEVEL)[0]), rank_counts(m.faces, LEVEL)[1])
+              for m in candidates]
+    assert len(idents) == len(set(idents))
+    assert len({llm_prompt.describe_move(m, LEVEL) for m in candidates}) == len(candidates)
+
+
+def test_candidates_are_ranked_and_limited():
+    counts = rules.counts_from_faces(hand(BIG_HAND))
+    candidates = llm_prompt.candidate_moves(counts, None, LEVEL, limit=1000)
+    assert candidates == sorted(candidates, key=rules.search_key(counts, LEVEL))
+    assert llm_prompt.candidate_moves(counts, None, LEVEL, limit=5) == candidates[:5]
+    assert len(llm_prompt.candidate_moves(counts, None, LEVEL)) == llm_prompt.DEFAULT_MAX_CANDIDATES
+
+
+def test_no_candidates_when_nothing_beats_the_last_play():
+    last_type = rules.pick(rules.classify(hand('SA DA'), LEVEL))
+    assert llm_prompt.candidate_moves(rules.counts_from_faces(hand('S3 D3 C9')), last_type, LEVEL) == []
+
+
+# ---- 编号回答 ----
+
+@pytest.mark.parametrize('text, allow_pass, choice', [
+    ('1', False, 1),
+    (' 3\n', False, 3),
+    ('12', False, 12),
+    ('0', True, 0),
+    ('0', False, None),
+    ('13', False, None),
+    ('1 2', False, None),
+    ('选 1', False, None),
+    ('1。', False, None),
+    ('-1', True, None),
+    ('１', False, None),    # 全角数字
+    ('', True, None),
+    (None, True, None),
+])
+def test_parse_choice_is_strict(text, allow_pass, choice):
+    assert llm_prompt.parse_choice(text, 12, allow_pass) == choice
@@ -0,0 +1,255 @@
+"""
+rules 的测试
+
+- classify/beats/pick：各牌型的识别、逢人配、级牌的大小、炸弹之间的大小、牌型字典的往返
+- legal_moves 与暴力枚举的对照：暴力枚举手牌的每个子集，用 classify/pick 得到服务器认可的牌型；
+  legal_moves 给出的牌型集合必须与之完全一致，并且每一手都能从手牌里取出、按 classify/pick 理解正好是它标注的牌型
+
+    python -m pytest -q test_rules.py
+"""
+import itertools
+import random
+
+import pytest
+
+import rules
+from cards import NUM_FACES, SMALL_JOKER, BIG_JOKER, SMALL_JOKER_FACE, BIG_JOKER_FACE, VALUES
+
+SUIT_CODES = 'SHDC'   # 黑桃、红桃、方块、梅花（与牌面编码的花色顺序一致）
+
+
+def hand(text):
+    """'S5 D5 H10 小王' -> 牌面列表（花色字母 + 点数，王写中文）"""
+    faces = []
+    for card in text.split():
+        if card == SMALL_JOKER:
+            faces.append(SMALL_JOKER_FACE)
+        elif card == BIG_JOKER:
+            faces.append(BIG_JOKER_FACE)
+        else:
+            faces.append(SUIT_CODES.index(card[0]) * 13 + VALUES.index(card[1:]))
+    return faces
+
+
+def best(text, level=2):
+    """首家出牌时这手牌的牌型"""
+    return rules.pick(rules.classify(hand(text), level))
+
+
+# ---- 牌型识别 ----
+
+@pytest.mark.parametrize('text, kind, size', [
+    ('S5', rules.SINGLE, 1),
+    ('大王', rules.SINGLE, 1),
+    ('S5 D5', rules.PAIR, 2),
+    ('小王 小王', rules.PAIR, 2),
+    ('S5 D5 C5', rules.TRIPLE, 3),
+    ('S5 D5 C5 S9 D9', rules.FULL_HOUSE, 5),
+    ('S5 D5 C5 大王 大王', rules.FULL_HOUSE, 5),
+    ('S3 D4 C5 S6 D7', rules.STRAIGHT, 5),
+    ('SA S2 D3 C4 S5', rules.STRAIGHT, 5),
+    ('S10 DJ CQ SK DA', rules.STRAIGHT, 5),
+    ('S3 D3 S4 D4 S5 D5', rules.TUBE, 6),
+    ('S3 D3 C3 S4 D4 C4', rules.PLATE, 6),
+    ('S5 D5 C5 H5', rules.BOMB, 4),
+    ('S5 D5 C5 H5 S5', rules.BOMB, 5),
+    ('S5 D5 C5 H5 S5 D5', rules.BOMB, 6),
+    ('S5 D5 C5 H5 S5 D5 C5', rules.BOMB, 7),
+    ('S5 D5 C5 H5 S5 D5 C5 H5', rules.BOMB, 8),
+    ('S3 S4 S5 S6 S7', rules.STRAIGHT_FLUSH, 5),
+    ('小王 小王 大王 大王', rules.JOKER_BOMB, 4),
+])
+def test_classify_kinds(text, kind, size):
+    hand_type = best(text)
+    assert (hand_type.kind, hand_type.size) == (kind, size)
+
+
+@pytest.mark.parametrize('text', ['S5 D6', '小王 大王', 'S3 D4 C5 S6', 'SQ DK SA S2 D3', 'S3 D3 S4 D4', 'S5 D5 C5 S9'])
+def test_classify_rejects_invalid(text):
+    assert rules.classify(hand(text)) == ()
+
+
+def test_straight_flush_is_also_a_straight():
+    kinds = [t.kind for t in rules.classify(hand('S3 S4 S5 S6 S7'))]
+    assert kinds == [rules.STRAIGHT_FLUSH, rules.STRAIGHT]
+    assert [t.kind for t in rules.classify(hand('S3 S4 D5 S6 S7'))] == [rules.STRAIGHT]
+
+
+# ---- 逢人配（打 5 时红桃 5） ----
+
+def test_wild_card_substitutes():
+    level = 5
+    assert rules.wild_face(level) == hand('H5')[0]
+    order = rules.rank_order(level)
+    assert best('H5 S9', level) == rules.HandType(rules.PAIR, order[VALUES.index('9')], 2, 0)
+    assert best('H5 H5 S9', level) == rules.HandType(rules.TRIPLE, order[VALUES.index('9')], 3, 0)
+    assert best('S9 D9 C9 H5', level).kind == rules.BOMB
+    assert best('S3 D4 H5 S6 D7', level).kind == rules.STRAIGHT
+    assert best('S3 D4 H5 H5 D7', level).kind == rules.STRAIGHT
+    assert best('SK DK H5 CK H5 SK', level) == rules.HandType(
+        rules.BOMB, order[VALUES.index('K')], 6, rules.bomb_power(6))
+    # 逢人配不计入同花判断
+    assert best('S3 S4 H5 S6 S7', level).kind == rules.STRAIGHT_FLUSH
+    assert best('S9 S10 SJ H5 SK', level).kind == rules.STRAIGHT_FLUSH
+
+
+def test_wild_card_cannot_replace_jokers():
+    level = 5
+    assert rules.classify(hand('H5 小王'), level) == ()
+    assert rules.classify(hand('小王 小王 大王 H5'), level) == ()
+
+
+def test_other_suits_of_the_level_card_are_not_wild():
+    # 打 5 时黑桃 5 只是级牌
+    assert rules.classify(hand('S5 S9'), 5) == ()
+    assert best('S5 D5', 5).kind == rules.PAIR
+
+
+# ---- 级牌的大小 ----
+
+def test_level_card_ranks_above_ace():
+    def key(text, level):
+        return best(text, level).key
+
+    assert key('S5', 2) < key('SA', 2) < key('S2', 2)
+    assert key('SA', 5) < key('S5', 5) < key('小王', 5) < key('大王', 5)
+    assert key('SA DA', 5) < key('S5 D5', 5)
+    assert key('SK DK CK HK', 9) < key('S9 D9 C9 S9', 9)
+    assert rules.beats(best('S5 D5 C5', 5), best('SA DA CA', 5))
+    assert not rules.beats(best('S5 D5 C5', 2), best('SA DA CA', 2))
+
+
+def test_sequences_ignore_the_level():
+    # 顺子、连对、钢板里级牌按原本的位置，A 可以当 1
+    for level in (2, 5, 14):
+        assert best('SA S2 D3 C4 D5', level).key < best('S2 D3 C4 D5 S6', level).key < best('S10 DJ CQ SK DA', level).key
+    assert best('S3 D4 C5 S6 D7', 5).key == best('S3 D4 C5 S6 D7', 2).key
+
+
+# ---- 比较大小 ----
+
+def test_bomb_power_order():
+    ordered = [
+        best('S5 D5 C5 H5'),
+        best('S6 D6 C6 H6'),
+        best('S5 D5 C5 H5 S5'),
+        best('S3 S4 S5 S6 S7'),
+        best('D4 D5 D6 D7 D8'),
+        best('S5 D5 C5 H5 S5 D5'),
+        best('S5 D5 C5 H5 S5 D5 C5'),
+        best('S5 D5 C5 H5 S5 D5 C5 H5'),
+        best('小王 小王 大王 大王'),
+    ]
+    for i, lower in enumerate(ordered):
+        for higher in ordered[i + 1:]:
+            assert rules.beats(higher, lower), (higher, lower)
+            assert not rules.beats(lower, higher), (lower, higher)
+        assert not rules.beats(lower, lower)
+    for plain in ('SA', 'S10 D10', 'S10 DJ CQ SK DA', 'S3 D3 C3 S4 D4 C4'):
+        assert rules.beats(ordered[0], best(plain))
+        assert not rules.beats(best(plain), ordered[0])
+
+
+def test_plain_types_need_same_kind_and_size():
+    assert rules.beats(best('S6 D6'), best('S5 D5'))
+    assert not rules.beats(best('S5 D5'), best('S6 D6'))
+    assert not rules.beats(best('S6 D6 C6'), best('S5 D5'))
+    assert not rules.beats(best('S4 D5 C6 S7 D8'), best('S3 D3 S4 D4 S5 D5'))
+    assert rules.beats(best('S4 D5 C6 S7 D8'), best('S3 D4 C5 S6 D7'))
+    # 三带二只比三张的点数
+    assert rules.beats(best('S6 D6 C6 S3 D3'), best('S5 D5 C5 SA DA'))
+
+
+def test_pick_prefers_same_kind_over_bomb():
+    types = rules.classify(hand('S4 S5 S6 S7 S8'))
+    assert rules.pick(types).kind == rules.STRAIGHT_FLUSH
+    assert rules.pick(types, best('S3 D4 C5 S6 D7')).kind == rules.STRAIGHT
+    assert rules.pick(types, best('S9 D10 CJ SQ DK')).kind == rules.STRAIGHT_FLUSH
+    assert rules.pick(types, best('D5 D6 D7 D8 D9')) is None
+    assert rules.pick(types, best('S5 D5 C5 H5 S5 D5')) is None
+    assert rules.pick((), None) is None
+
+
+# ---- 牌型字典 ----
+
+@pytest.mark.parametrize('text, name, rank', [
+    ('S5', '单牌', 1),
+    ('S5 D5 C5 S9 D9', '三带二', 4),
+    ('S3 D3 C3 S4 D4 C4', '钢板', 7),
+    ('S5 D5 C5 H5', '炸弹(4张)', 14),
+    ('S5 D5 C5 H5 S5', '炸弹(5张)', 15),
+    ('S3 S4 S5 S6 S7', '同花顺', 16),
+    ('S5 D5 C5 H5 S5 D5', '炸弹(6张)', 17),
+    ('S5 D5 C5 H5 S5 D5 C5 H5', '炸弹(8张)', 19),
+    ('小王 小王 大王 大王', '天王炸', 22),
+])
+def test_type_dict_round_trip(text, name, rank):
+    hand_type = best(text)
+    data = rules.type_to_dict(hand_type)
+    assert (data['name'], data['rank']) == (name, rank)
+    assert rules.type_from_dict(data) == hand_type
+
+
+# ---- legal_moves 与暴力枚举对照 ----
+
+
+def brute_force_types(counts, last_type, level):
+    """手牌所有非空子集里，能出（首家出牌或压得过 last_type）的牌型集合"""
+    distinct = [f for f in range(NUM_FACES) if counts[f]]
+    types = set()
+    for picked in itertools.product(*(range(counts[f] + 1) for f in distinct)):
+        faces = tuple(f for f, k in zip(distinct, picked) for _ in range(k))
+        if faces:
+            hand_type = rules.pick(rules.classify(faces, level), last_type)
+            if hand_type is not None:
+                types.add(hand_type)
+    return types
+
+
+def random_hand(rng, level):
+    """随机的 5 ~ 9 张（两副牌里抽）"""
+    return [f % 54 for f in rng.sample(range(108), rng.randrange(5, 10))]
+
+
+def near_flush_hand(rng, level):
+    """一条（可能缺一张的）同花五连，加逢人配和几张杂牌：容易出现同花顺与普通顺子并存"""
+    start, suit = rng.randrange(9), rng.randrange(4)
+    faces = [suit * 13 + start + k for k in range(5) if rng.random() < 0.85]
+    faces += [rules.wild_face(level)] * rng.randrange(3)
+    faces += [rng.randrange(52) for _ in range(rng.randrange(3))]
+    return faces
+
+
+def random_last_type(rng, level):
+    """首家出牌（None），或随机几张牌能组成的牌型，或一个顺子"""
+    roll = rng.random()
+    if roll < 0.4:
+        return None
+    if roll < 0.7:
+        return rules.HandType(rules.STRAIGHT, rng.randrange(10), 5, 0)
+    faces = tuple(sorted(f % 54 for f in rng.sample(range(108), rng.randrange(1, 6))))
+    return rules.pick(rules.classify(faces, level))
+
+
+@pytest.mark.parametrize('make_hand', [random_hand, near_flush_hand])
+@pytest.mark.parametrize('seed', range(4))
+def test_legal_moves_match_brute_force(make_hand, seed):
+    rng = random.Random(seed)
+    for _ in range(150):
+        level = rng.randrange(2, 15)
+        faces = make_hand(rng, level)
+        counts = tuple(rules.counts_from_faces(faces))
+        last_type = random_last_type(rng, level)
+        moves = rules.legal_moves(counts, last_type, level)
+        assert {m.hand_type for m in moves} == brute_force_types(counts, last_type, level), (faces, level, last_type)
+        for move in moves:
+            assert all(move.faces.count(f) <= counts[f] for f in set(move.faces))
+            assert rules.pick(rules.classify(move.faces, level), last_type) == move.hand_type
+
+
+def test_same_suit_run_yields_plain_straight_and_straight_flush():
+    # 黑桃 6~10 加一张方块 9：按花色顺序取牌会取到同花的五张，普通顺子也必须列出来
+    faces = [4, 5, 6, 7, 8, 33]
+    kinds = {m.hand_type.kind for m in rules.legal_moves(tuple(rules.counts_from_faces(faces)), None, 5)
+             if m.hand_type.size == 5 and m.hand_type.key == 5}
+    assert kinds == {rules.STRAIGHT, rules.STRAIGHT_FLUSH}
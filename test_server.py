@@ -0,0 +1,577 @@
+"""
+游戏服务器的接口测试
+
+Flask 版用 server.app.test_client()（WebSocket 需要真实连接，另起一个本地服务器线程），
+asyncio 版（async_server.py）用 aiohttp 的 TestClient。两个服务器共用 server.registry，
+每个测试用自己的牌桌 id。
+
+    python -m pytest -q test_server.py
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+
+import codec
+import event_broker
+import server
+from guandan_client import GuandanClient, apply_turn_delta
+
+simple_websocket = pytest.importorskip('simple_websocket')
+pytest.importorskip('flask_sock')
+aiohttp_test_utils = pytest.importorskip('aiohttp.test_utils')
+
+import async_server  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # 导入 async_server 会把共用注册表的牌桌换成 asyncio 版本，Flask 的测试换回来
+    monkeypatch.setattr(server.registry, 'table_class', server.GameTable)
+    return server.app.test_client()
+
+
+@pytest.fixture
+def live_server():
+    """本地端口上的 Flask 服务器（WebSocket 测试用），返回 http://host:port"""
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+def run_async(scenario):
+    """在 async_server 的 TestClient 里执行 scenario(client)"""
+    server.registry.table_class = async_server.AsyncGameTable
+
+    async def main():
+        async with aiohttp_test_utils.TestClient(aiohttp_test_utils.TestServer(async_server.create_app())) as c:
+            await scenario(c)
+    asyncio.run(main())
+
+
+def new_table(client, game_id, start=True):
+    response = client.post('/game/tables', json={'gameId': game_id, 'start': start})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+# ---- 座位的 WebSocket ----
+
+def test_seat_socket_requires_seat_token(client, live_server):
+    new_table(client, 'ws-token')
+    url = 'ws' + live_server[len('http'):] + '/game/ws-token/ws/1'
+
+    # 被拒绝的连接由服务器关闭
+    ws = simple_websocket.Client.connect(url)
+    assert json.loads(ws.receive(timeout=5)) == {'type': 'error', 'message': '座位令牌无效'}
+
+    token = client.post('/game/ws-token/seats/1/claim').get_json()['token']
+    ws = simple_websocket.Client.connect(url + '?token=wrong')
+    assert json.loads(ws.receive(timeout=5))['message'] == '座位令牌无效'
+
+    ws = simple_websocket.Client.connect(url, headers={'X-Seat-Token': token})
+    message = json.loads(ws.receive(timeout=5))
+    assert message['type'] == 'turn' and message['playerId'] == 1
+    ws.close()
+
+
+def test_async_seat_socket_requires_seat_token():
+    async def scenario(c):
+        await c.post('/game/tables', json={'gameId': 'ws-token-async', 'start': True})
+        async with c.ws_connect('/game/ws-token-async/ws/1') as ws:
+            assert await ws.receive_json(timeout=5) == {'type': 'error', 'message': '座位令牌无效'}
+        token = (await (await c.post('/game/ws-token-async/seats/1/claim')).json())['token']
+        async with c.ws_connect('/game/ws-token-async/ws/1', headers={'X-Seat-Token': token}) as ws:
+            message = await ws.receive_json(timeout=5)
+            assert message['type'] == 'turn' and message['playerId'] == 1
+    run_async(scenario)
+
+
+# ---- 已认领座位的手牌与回合信息 ----
+
+def test_claimed_seat_hides_hand_and_turn(client):
+    new_table(client, 'seat-private')
+    assert client.get('/game/seat-private/player/2/hand').status_code == 200
+
+    token = client.post('/game/seat-private/seats/2/claim').get_json()['token']
+    for path in ('/game/seat-private/player/2/hand', '/game/seat-private/turn/2',
+                 '/game/seat-private/turn/2?wait=1'):
+        assert client.get(path).status_code == 403
+        assert client.get(path, headers={'X-Seat-Token': 'wrong'}).status_code == 403
+        assert client.get(path, headers={'X-Seat-Token': token}).status_code == 200
+    assert client.get(f'/game/seat-private/turn/2?token={token}').status_code == 200
+    # 其他座位未被认领
+    assert client.get('/game/seat-private/player/3/hand').status_code == 200
+
+    client.delete('/game/seat-private/seats/2', headers={'X-Seat-Token': token})
+    assert client.get('/game/seat-private/player/2/hand').status_code == 200
+
+
+def test_async_claimed_seat_hides_hand_and_turn():
+    async def scenario(c):
+        await c.post('/game/tables', json={'gameId': 'seat-private-async', 'start': True})
+        token = (await (await c.post('/game/seat-private-async/seats/2/claim')).json())['token']
+        for path in ('/game/seat-private-async/player/2/hand', '/game/seat-private-async/turn/2'):
+            assert (await c.get(path)).status == 403
+            assert (await c.get(path, headers={'X-Seat-Token': token})).status == 200
+        assert (await c.get('/game/seat-private-async/turn/3')).status == 200
+    run_async(scenario)
+
+
+# ---- 牌桌注册表 ----
+
+def test_table_crud(client):
+    created = new_table(client, 'crud', start=False)
+    assert created['gameId'] == 'crud' and created['started'] is False
+    assert client.post('/game/tables', json={'gameId': 'crud'}).status_code == 409
+
+    listed = client.get('/game/tables').get_json()
+    assert 'crud' in [t['gameId'] for t in listed['tables']] and listed['total'] == len(listed['tables'])
+    assert client.get('/game/tables/crud').get_json()['gameId'] == 'crud'
+
+    assert client.post('/game/crud/start').get_json()['success']
+    assert client.get('/game/tables/crud').get_json()['started'] is True
+
+    assert client.delete('/game/tables/crud').get_json() == {'success': True, 'gameId': 'crud'}
+    assert client.get('/game/tables/crud').status_code == 404
+    assert client.delete('/game/tables/crud').status_code == 404
+    assert 'crud' not in [t['gameId'] for t in client.get('/game/tables').get_json()['tables']]
+
+
+def test_table_id_generated_and_validated(client):
+    response = client.post('/game/tables', json={})
+    assert response.status_code == 201
+    game_id = response.get_json()['gameId']
+    assert len(game_id) == 12 and server.registry.get(game_id) is not None
+    client.delete(f'/game/tables/{game_id}')
+    for bad in ('', 'a/b', 'tables', 5):
+        assert client.post('/game/tables', json={'gameId': bad}).status_code == 400
+
+
+@pytest.mark.parametrize('method, path', [
+    ('post', '/game/missing/start'),
+    ('get', '/game/missing/state'),
+    ('get', '/game/missing/turn/0'),
+    ('get', '/game/missing/turn/0?wait=1'),
+    ('get', '/game/missing/player/0/hand'),
+    ('get', '/game/missing/history'),
+    ('get', '/game/missing/events'),
+    ('post', '/game/missing/play'),
+    ('post', '/game/missing/pass'),
+    ('post', '/game/missing/seats/0/claim'),
+])
+def test_missing_table_is_404(client, method, path):
+    response = getattr(client, method)(path, json={'playerId': 0})
+    assert response.status_code == 404
+    assert response.get_json()['error'] == '牌桌不存在'
+
+
+def test_tables_are_independent(client):
+    new_table(client, 'left')
+    new_table(client, 'right')
+    before = client.get('/game/right/state').get_json()['version']
+    turn = client.get('/game/left/state').get_json()['currentPlayer']
+    hand = client.get(f'/game/left/player/{turn}/hand').get_json()['cards']
+    assert client.post('/game/left/play', json={'playerId': turn, 'cards': hand[:1]}).get_json()['success']
+    assert client.get('/game/right/state').get_json()['version'] == before
+    assert client.get('/game/left/state').get_json()['version'] > before
+
+
+# ---- 事件流 ----
+
+def take_events(stream, n):
+    """从 GuandanClient.events() 取 n 个事件（跳过心跳）"""
+    events = []
+    for event in stream:
+        if event is not None:
+            events.append(event)
+            if len(events) == n:
+                break
+    return events
+
+
+def play_first_card(client, game_id):
+    """当前玩家出最小的一张牌（首家出牌时）"""
+    seat = client.get(f'/game/{game_id}/state').get_json()['currentPlayer']
+    card = client.get(f'/game/{game_id}/player/{seat}/hand').get_json()['cards'][0]
+    assert client.post(f'/game/{game_id}/play', json={'playerId': seat, 'cards': [card]}).get_json()['success']
+
+
+def test_event_stream_replays_after_last_event_id(client, live_server):
+    new_table(client, 'sse-replay')
+    play_first_card(client, 'sse-replay')
+    # 开局 turn、出牌 play + turn
+    game = GuandanClient(live_server, 'sse-replay')
+    connected, *events = take_events(game.events(heartbeat=1, last_event_id=0), 4)
+    assert connected == {'type': 'connected', 'gameId': 'sse-replay'}
+    assert [e['type'] for e in events] == ['turn', 'play', 'turn']
+    assert [e['id'] for e in events] == [1, 2, 3]
+
+    seat = client.get('/game/sse-replay/state').get_json()['currentPlayer']
+    assert client.post('/game/sse-replay/pass', json={'playerId': seat}).get_json()['success']
+    _, *replayed = take_events(game.events(heartbeat=1, last_event_id=3), 3)
+    assert [(e['id'], e['type']) for e in replayed] == [(4, 'pass'), (5, 'turn')]
+    game.close()
+
+
+def test_event_stream_resyncs_when_too_far_behind(client, live_server):
+    new_table(client, 'sse-resync')
+    table = server.registry.get('sse-resync')
+    for n in range(event_broker.DEFAULT_HISTORY_SIZE + 1):
+        table.broker.publish({'type': 'noise', 'n': n})
+    game = GuandanClient(live_server, 'sse-resync')
+    _, resync = take_events(game.events(heartbeat=1, last_event_id=0), 2)
+    assert resync == {'type': 'resync', 'id': table.broker.last_seq}
+    game.close()
+
+
+def test_closing_table_ends_event_stream(client, live_server):
+    new_table(client, 'sse-close')
+    game = GuandanClient(live_server, 'sse-close')
+    stream = game.events(heartbeat=1)
+    assert take_events(stream, 1)[0]['type'] == 'connected'
+    client.delete('/game/tables/sse-close')
+    assert [e['type'] for e in stream if e is not None] == ['closed']
+    game.close()
+
+
+# ---- 长轮询 ----
+
+def start_long_poll(path):
+    """另一个线程里发出长轮询请求，返回 (线程, 结果字典)；结果里有 response 和 elapsed"""
+    result = {}
+
+    def poll():
+        start = time.perf_counter()
+        result['response'] = server.app.test_client().get(path)
+        result['elapsed'] = time.perf_counter() - start
+    thread = threading.Thread(target=poll, daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_long_poll_wakes_on_state_change(client):
+    new_table(client, 'poll-wake')
+    state = client.get('/game/poll-wake/state').get_json()
+    waiter = (state['currentPlayer'] + 2) % 4
+    thread, result = start_long_poll(f"/game/poll-wake/turn/{waiter}?wait=10&since={state['version']}")
+    time.sleep(0.2)
+    assert thread.is_alive()
+    play_first_card(client, 'poll-wake')
+    thread.join(5)
+    assert result['elapsed'] < 5
+    assert result['response'].get_json()['version'] > state['version']
+
+
+def test_long_poll_returns_at_once_when_ready(client):
+    new_table(client, 'poll-ready')
+    state = client.get('/game/poll-ready/state').get_json()
+    current, version = state['currentPlayer'], state['version']
+    waiter = (current + 2) % 4
+    for path in (f'/game/poll-ready/turn/{current}?wait=10&since={version}',   # 轮到自己
+                 f'/game/poll-ready/turn/{waiter}?wait=10&since={version - 1}',   # since 已过时
+                 f'/game/poll-ready/turn/{current}?wait=10'):
+        start = time.perf_counter()
+        assert client.get(path).status_code == 200
+        assert time.perf_counter() - start < 1
+
+
+def test_long_poll_times_out(client):
+    new_table(client, 'poll-timeout')
+    state = client.get('/game/poll-timeout/state').get_json()
+    waiter = (state['currentPlayer'] + 2) % 4
+    start = time.perf_counter()
+    response = client.get(f"/game/poll-timeout/turn/{waiter}?wait=0.3&since={state['version']}")
+    assert time.perf_counter() - start >= 0.3
+    assert response.get_json()['version'] == state['version']
+    assert client.get(f'/game/poll-timeout/turn/{waiter}?wait=soon').status_code == 400
+
+
+def test_long_poll_wakes_on_start_and_close(client):
+    new_table(client, 'poll-start', start=False)
+    # 开局前还没有版本号，since=0 等到开局
+    thread, result = start_long_poll('/game/poll-start/turn/1?wait=10&since=0')
+    time.sleep(0.2)
+    assert thread.is_alive()
+    client.post('/game/poll-start/start')
+    thread.join(5)
+    assert result['elapsed'] < 5 and result['response'].status_code == 200
+
+    state = client.get('/game/poll-start/state').get_json()
+    waiter = (state['currentPlayer'] + 2) % 4
+    thread, result = start_long_poll(f"/game/poll-start/turn/{waiter}?wait=10&since={state['version']}")
+    time.sleep(0.2)
+    client.delete('/game/tables/poll-start')
+    thread.join(5)
+    assert result['elapsed'] < 5 and result['response'].status_code == 404
+
+
+def test_async_long_poll_wakes_on_state_change():
+    async def scenario(c):
+        await c.post('/game/tables', json={'gameId': 'poll-async', 'start': True})
+        state = await (await c.get('/game/poll-async/state')).json()
+        current = state['currentPlayer']
+        waiter = asyncio.create_task(c.get(f"/game/poll-async/turn/{(current + 2) % 4}?wait=10&since={state['version']}"))
+        await asyncio.sleep(0.2)
+        assert not waiter.done()
+        card = (await (await c.get(f'/game/poll-async/player/{current}/hand')).json())['cards'][0]
+        await c.post('/game/poll-async/play', json={'playerId': current, 'cards': [card]})
+        response = await asyncio.wait_for(waiter, 5)
+        assert (await response.json())['version'] > state['version']
+    run_async(scenario)
+
+
+# ---- ETag 与增量 ----
+
+def test_etag_not_modified_until_state_changes(client):
+    new_table(client, 'etag')
+    for path in ('/game/etag/state', '/game/etag/turn/1'):
+        response = client.get(path)
+        etag = response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'no-cache'
+        cached = client.get(path, headers={'If-None-Match': etag})
+        assert cached.status_code == 304 and cached.data == b'' and cached.headers['ETag'] == etag
+    state_etag = client.get('/game/etag/state').headers['ETag']
+    assert client.get('/game/etag/turn/2').headers['ETag'] not in (state_etag, client.get('/game/etag/turn/1').headers['ETag'])
+
+    play_first_card(client, 'etag')
+    response = client.get('/game/etag/state', headers={'If-None-Match': state_etag})
+    assert response.status_code == 200 and response.headers['ETag'] != state_etag
+
+    # 重新开局后版本号重新计数，ETag 也不能与上一局的重复
+    client.post('/game/etag/start')
+    assert client.get('/game/etag/state', headers={'If-None-Match': state_etag}).status_code == 200
+
+
+def test_state_since_returns_delta(client):
+    new_table(client, 'delta')
+    version = client.get('/game/delta/state').get_json()['version']
+    play_first_card(client, 'delta')
+    full = client.get('/game/delta/state').get_json()
+
+    delta = client.get(f'/game/delta/state?since={version}').get_json()
+    assert delta['delta'] is True and delta['since'] == version and delta['version'] == full['version']
+    assert [(e['version'], e['isPass']) for e in delta['events']] == [(version + 1, False)]
+    assert delta['cardCounts'] == [p['cardCount'] for p in full['players']]
+    assert 'players' not in delta and 'playHistory' not in delta
+
+    assert client.get(f"/game/delta/state?since={full['version']}").get_json()['events'] == []
+    # 增量的 ETag 与完整响应不同
+    assert client.get(f'/game/delta/state?since={version}').headers['ETag'] != client.get('/game/delta/state').headers['ETag']
+    # since 早于开局或晚于当前版本：返回完整状态
+    for since in (0, full['version'] + 1):
+        assert 'delta' not in client.get(f'/game/delta/state?since={since}').get_json()
+    assert client.get('/game/delta/state?since=latest').status_code == 400
+
+
+def test_turn_since_delta_merges_into_full_turn(client):
+    new_table(client, 'turn-delta')
+    first = client.get('/game/turn-delta/state').get_json()['currentPlayer']
+    before = {seat: client.get(f'/game/turn-delta/turn/{seat}').get_json() for seat in range(4)}
+    version = before[first]['version']
+    play_first_card(client, 'turn-delta')
+
+    for seat in range(4):
+        delta = client.get(f'/game/turn-delta/turn/{seat}?since={version}').get_json()
+        assert delta['delta'] is True
+        # 手牌只发给刚出过牌的玩家
+        assert ('hand' in delta) == (seat == first)
+        merged = apply_turn_delta(before[seat], delta)
+        full = client.get(f'/game/turn-delta/turn/{seat}').get_json()
+        for key in ('version', 'isMyTurn', 'canPlay', 'currentPlayer', 'lastPlay', 'hand'):
+            assert merged[key] == full[key], key
+        assert [p['cardCount'] for p in merged['gameState']['players']] == \
+            [p['cardCount'] for p in full['gameState']['players']]
+
+
+# ---- 按版本缓存的响应 ----
+
+def test_payload_built_once_per_version():
+    table = server.GameTable('payload-unit')
+    table.start()
+    builds = []
+
+    def build():
+        builds.append(table.version)
+        return {'version': table.version}
+
+    with table.lock:
+        first = table.payload('view', build)
+        assert table.payload('view', build) is first
+        assert len(builds) == 1
+        table.payload('other', build)
+        if codec.msgpack_available():
+            assert table.payload('view', build, codec.MSGPACK) != first
+        built = len(builds)
+
+    seat = table.game_state.current_player_id
+    assert table.play(seat, table.game_state.get_player_hand(seat)[:1])['success']
+    with table.lock:
+        assert codec.decode(table.payload('view', build), codec.JSON) == {'version': table.version}
+    assert len(builds) == built + 1
+
+    table.start()
+    with table.lock:
+        table.payload('view', build)
+    assert len(builds) == built + 2
+
+
+def test_payload_cache_is_bounded():
+    table = server.GameTable('payload-bound')
+    table.start()
+    with table.lock:
+        for n in range(server.PAYLOAD_CACHE_SIZE + 5):
+            table.payload(f'view{n}', dict)
+        assert len(table._payloads) == server.PAYLOAD_CACHE_SIZE
+
+
+def test_cached_responses_follow_the_state(client):
+    new_table(client, 'payload-http')
+    seat = client.get('/game/payload-http/state').get_json()['currentPlayer']
+    hits = server.PAYLOAD_CACHE_HIT.value
+    hand = client.get(f'/game/payload-http/player/{seat}/hand')
+    assert client.get(f'/game/payload-http/player/{seat}/hand').data == hand.data
+    assert server.PAYLOAD_CACHE_HIT.value > hits
+
+    history = client.get('/game/payload-http/history').get_json()['history']
+    turn = client.get(f'/game/payload-http/turn/{seat}').get_json()
+    play_first_card(client, 'payload-http')
+    assert client.get(f'/game/payload-http/player/{seat}/hand').get_json()['cardCount'] == hand.get_json()['cardCount'] - 1
+    assert len(client.get('/game/payload-http/history').get_json()['history']) == len(history) + 1
+    assert client.get(f'/game/payload-http/turn/{seat}').get_json()['version'] == turn['version'] + 1
+
+
+# ---- MessagePack ----
+
+MSGPACK_HEADERS = {'Accept': codec.MSGPACK}
+
+
+@pytest.mark.skipif(not codec.msgpack_available(), reason='未安装 msgpack')
+def test_msgpack_round_trip(client):
+    new_table(client, 'msgpack')
+    seat = client.get('/game/msgpack/state').get_json()['currentPlayer']
+    as_json = client.get(f'/game/msgpack/player/{seat}/hand')
+    as_msgpack = client.get(f'/game/msgpack/player/{seat}/hand', headers=MSGPACK_HEADERS)
+    assert as_msgpack.mimetype == codec.MSGPACK and 'Accept' in as_msgpack.headers['Vary']
+    hand = codec.decode(as_msgpack.data, codec.MSGPACK)
+    assert hand['cards'] == codec.to_faces(as_json.get_json()['cards'])
+
+    # 两种编码的 ETag 不同，304 也按编码区分
+    etag = client.get('/game/msgpack/state', headers=MSGPACK_HEADERS).headers['ETag']
+    assert etag != client.get('/game/msgpack/state').headers['ETag']
+    assert client.get('/game/msgpack/state', headers={**MSGPACK_HEADERS, 'If-None-Match': etag}).status_code == 304
+    assert client.get('/game/msgpack/state', headers={'If-None-Match': etag}).status_code == 200
+
+    # MessagePack 请求体，出牌用牌面编码
+    body, content_type = codec.encode_body({'playerId': seat, 'cards': hand['cards'][:1]})
+    response = client.post('/game/msgpack/play', data=body, content_type=content_type, headers=MSGPACK_HEADERS)
+    assert response.mimetype == codec.MSGPACK
+    assert codec.decode(response.data, codec.MSGPACK)['success'] is True
+    turn = codec.decode(client.get(f'/game/msgpack/turn/{seat}', headers=MSGPACK_HEADERS).data, codec.MSGPACK)
+    assert turn['lastPlay']['cards'] == hand['cards'][:1]
+
+    response = client.post('/game/msgpack/pass', data=b'\xc1', content_type=codec.MSGPACK)
+    assert response.status_code == 400
+
+
+@pytest.mark.skipif(not codec.msgpack_available(), reason='未安装 msgpack')
+def test_client_plays_over_msgpack(client, live_server):
+    new_table(client, 'msgpack-client')
+    game = GuandanClient(live_server, 'msgpack-client', compact=True)
+    seat = game.state().current_player
+    hand = game.hand(seat)
+    assert all(isinstance(card, int) for card in hand.cards)
+    assert game.play(seat, hand.cards[:1]).success
+    assert game.turn(seat).last_play['cards'] == hand.cards[:1]
+    game.close()
+
+
+# ---- asyncio 服务器与 Flask 一致 ----
+
+PARITY_SEED = 7
+
+
+def parity_requests(table):
+    """同一副牌（同一种子）上两个服务器要给出相同响应的请求，'{g}' 为牌桌 id"""
+    state = table.game_state
+    seat = state.current_player_id
+    other = (seat + 1) % 4
+    hand = state.get_player_hand(seat)
+    version = state.version
+    return [
+        ('GET', '/game/tables/{g}', None),
+        ('GET', '/game/{g}/state', None),
+        ('GET', f'/game/{{g}}/turn/{seat}', None),
+        ('GET', f'/game/{{g}}/turn/{other}', None),
+        ('GET', f'/game/{{g}}/player/{other}/hand', None),
+        ('GET', '/game/{g}/player/7/hand', None),
+        ('GET', '/game/{g}/history', None),
+        ('GET', '/game/{g}/state?since=x', None),
+        ('POST', '/game/{g}/play', {'cards': hand[:1]}),
+        ('POST', '/game/{g}/play', {'playerId': seat, 'cards': 'S5'}),
+        ('POST', '/game/{g}/play', {'playerId': other, 'cards': hand[:1]}),
+        ('POST', '/game/{g}/play', {'playerId': seat, 'cards': [{'suit': '?', 'value': '2'}]}),
+        ('POST', '/game/{g}/pass', {'playerId': other}),
+        ('POST', '/game/{g}/play', {'playerId': seat, 'cards': hand[:1]}),
+        ('GET', f'/game/{{g}}/state?since={version}', None),
+        ('GET', f'/game/{{g}}/turn/{seat}?since={version}', None),
+        ('GET', f'/game/{{g}}/turn/{other}?since={version}', None),
+        ('POST', '/game/{g}/pass', {'playerId': other}),
+        ('GET', '/game/{g}/history', None),
+        ('GET', '/game/missing/state', None),
+        ('POST', '/game/tables', {'gameId': '{g}'}),
+        ('DELETE', '/game/tables/{g}', None),
+        ('GET', '/game/{g}/state', None),
+    ]
+
+
+def without_ids(obj):
+    """去掉两边必然不同的牌桌 id 和创建时间"""
+    if isinstance(obj, dict):
+        return {k: without_ids(v) for k, v in obj.items() if k not in ('gameId', 'createdAt')}
+    if isinstance(obj, list):
+        return [without_ids(v) for v in obj]
+    return obj
+
+
+def fill(obj, game_id):
+    return json.loads(json.dumps(obj).replace('{g}', game_id)) if obj is not None else None
+
+
+def test_async_server_matches_flask(client):
+    table = server.registry.create('parity-flask')
+    table.start(rng=random.Random(PARITY_SEED))
+    requests_ = parity_requests(table)
+    expected = []
+    for method, path, body in requests_:
+        response = client.open(path.format(g='parity-flask'), method=method, json=fill(body, 'parity-flask'))
+        expected.append((method, path, response.status_code, without_ids(response.get_json())))
+
+    async def scenario(c):
+        table = server.registry.create('parity-async')
+        table.start(rng=random.Random(PARITY_SEED))
+        assert parity_requests(table) == requests_
+        for (method, path, body), want in zip(requests_, expected):
+            response = await c.request(method, path.format(g='parity-async'), json=fill(body, 'parity-async'))
+            assert (method, path, response.status, without_ids(await response.json())) == want
+    run_async(scenario)
+
+
+def test_async_server_etag_and_msgpack():
+    async def scenario(c):
+        await c.post('/game/tables', json={'gameId': 'async-etag', 'start': True})
+        response = await c.get('/game/async-etag/state')
+        etag = response.headers['ETag']
+        assert (await c.get('/game/async-etag/state', headers={'If-None-Match': etag})).status == 304
+        if codec.msgpack_available():
+            response = await c.get('/game/async-etag/player/0/hand', headers=MSGPACK_HEADERS)
+            assert response.content_type == codec.MSGPACK and 'Accept' in response.headers['Vary']
+            assert all(isinstance(card, int) for card in codec.decode(await response.read(), codec.MSGPACK)['cards'])
+            assert (await c.get('/game/async-etag/state', headers={**MSGPACK_HEADERS, 'If-None-Match': etag})).status == 200
+    run_async(scenario)
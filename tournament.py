@@ -0,0 +1,203 @@
+"""
+掼蛋自对弈锦标赛 - 多进程批量对局，统计各座位/各队胜率
+
+用法:
+    python tournament.py --lineup search rule search rule --games 100000 --workers 8
+    python tournament.py --lineup greedy random greedy random --games 2000 --swap --out results.jsonl
+
+- 第 i 局的种子固定为 derive_seed(--seed, i)，与进程数、调度顺序无关，同样的参数结果完全一致
+- 对局按 --chunk 局一组分给进程池，每组完成就流式返回，边跑边汇总（可写入 JSONL）
+- --swap 时奇数局把阵容整体挪一个座位，两边各坐一半先手位，消除座位偏差
+"""
+import json
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from policies import POLICIES, get_policy
+from simulator import Simulator, derive_seed, DEFAULT_MAX_TURNS
+
+DEFAULT_CHUNK = 200
+Z_95 = 1.959964
+
+
+def wilson_interval(wins, n, z=Z_95):
+    """胜率的 Wilson 置信区间，返回 (下限, 上限)"""
+    if n == 0:
+        return (0.0, 1.0)
+    p = wins / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return (max(0.0, center - half), min(1.0, center + half))
+
+
+def seat_lineup(lineup, swapped):
+    """本局各座位的策略名；swapped 时整体挪一个座位（两边交换先手位和队伍编号）"""
+    return lineup[-1:] + lineup[:-1] if swapped else list(lineup)
+
+
+# ---- 工作进程 ----
+
+_worker = None
+
+
+def _init_worker(lineup, base_seed, level, max_turns, swap):
+    """每个进程只建一次模拟器"""
+    global _worker
+    sims = {}
+    for swapped in ((False, True) if swap else (False,)):
+        policies = [get_policy(name) for name in seat_lineup(lineup, swapped)]
+        sims[swapped] = Simulator(policies, seed=base_seed, level=level, max_turns=max_turns)
+    _worker = (base_seed, swap, sims)
+
+
+def _play_chunk(bounds):
+    """跑第 start..stop-1 局，返回 [(局序号, 是否换座, GameResult)]"""
+    base_seed, swap, sims = _worker
+    start, stop = bounds
+    results = []
+    for index in range(start, stop):
+        swapped = swap and index % 2 == 1
+        results.append((index, swapped, sims[swapped].play_game(derive_seed(base_seed, index))))
+    return results
+
+
+# ---- 汇总 ----
+
+class TournamentStats:
+    """边收结果边汇总；与结果到达的顺序无关"""
+    def __init__(self, lineup):
+        self.lineup = list(lineup)
+        self.games = 0
+        self.unfinished = 0
+        self.turns = 0
+        self.rejected = 0
+        self.seat_wins = [0] * 4
+        self.team_wins = [0, 0]
+        self.side_wins = [0, 0]   # 按阵容的队伍统计：0 = 阵容里的第 1/3 个策略，1 = 第 2/4 个
+
+    def add(self, swapped, result):
+        self.games += 1
+        self.turns += result.turns
+        self.rejected += result.rejected
+        if result.winner is None:
+            self.unfinished += 1
+            return
+        self.seat_wins[result.winner] += 1
+        self.team_wins[result.team] += 1
+        self.side_wins[result.team ^ swapped] += 1
+
+    def summary(self):
+        finished = self.games - self.unfinished
+
+        def rate(wins):
+            low, high = wilson_interval(wins, finished)
+            return {'wins': wins, 'rate': wins / finished if finished else 0.0,
+                    'ci95': [round(low, 4), round(high, 4)]}
+
+        return {
+            'lineup': self.lineup,
+            'games': self.games,
+            'unfinished': self.unfinished,
+            'avgTurns': self.turns / self.games if self.games else 0.0,
+            'rejected': self.rejected,
+            'seats': [rate(w) for w in self.seat_wins],
+            'teams': [rate(w) for w in self.team_wins],
+            'sides': [dict(rate(w), policies=self.lineup[i::2]) for i, w in enumerate(self.side_wins)],
+        }
+
+
+def run_tournament(lineup, games, seed=0, workers=None, level=2, max_turns=DEFAULT_MAX_TURNS,
+                   swap=False, chunk=DEFAULT_CHUNK, on_result=None):
+    """
+    跑 games 局并返回 TournamentStats
+    lineup: 4 个座位的策略名；workers 为空时用全部 CPU，1 表示在当前进程内运行
+    on_result(index, swapped, result): 每局结果到达时回调（到达顺序不固定）
+    """
+    if len(lineup) != 4:
+        raise ValueError("阵容需要 4 个策略名")
+    for name in lineup:
+        get_policy(name)
+    workers = workers or os.cpu_count() or 1
+    init_args = (list(lineup), seed, level, max_turns, swap)
+    chunks = [(start, min(start + chunk, games)) for start in range(0, games, chunk)]
+    stats = TournamentStats(lineup)
+
+    def collect(results):
+        for index, swapped, result in results:
+            stats.add(swapped, result)
+            if on_result is not None:
+                on_result(index, swapped, result)
+
+    if workers == 1:
+        _init_worker(*init_args)
+        for bounds in chunks:
+            collect(_play_chunk(bounds))
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+            for results in pool.imap_unordered(_play_chunk, chunks):
+                collect(results)
+    return stats
+
+
+def _format_rate(label, entry):
+    low, high = entry['ci95']
+    return f"  {label:<24} {entry['wins']:>8}  {entry['rate']:6.1%}  [{low:6.1%}, {high:6.1%}]"
+
+
+def print_summary(summary, elapsed):
+    games = summary['games']
+    print(f"{games} 局，用时 {elapsed:.1f}s（{games / elapsed:.0f} 局/秒），"
+          f"未结束 {summary['unfinished']}，平均 {summary['avgTurns']:.1f} 回合")
+    print("座位（胜局 / 胜率 / 95% 置信区间）:")
+    for seat, entry in enumerate(summary['seats']):
+        print(_format_rate(f"座位 {seat}", entry))
+    print("队伍:")
+    for team, entry in enumerate(summary['teams']):
+        print(_format_rate(f"座位 {team}/{team + 2}", entry))
+    print("阵容:")
+    for entry in summary['sides']:
+        print(_format_rate(' + '.join(entry['policies']), entry))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='掼蛋自对弈锦标赛')
+    parser.add_argument('--lineup', nargs=4, metavar='POLICY', default=['search', 'rule', 'search', 'rule'],
+                        help=f"座位 0..3 的策略（可选: {', '.join(POLICIES)}）")
+    parser.add_argument('--games', type=int, default=10000, help='对局数')
+    parser.add_argument('--seed', type=int, default=0, help='基础种子')
+    parser.add_argument('--workers', type=int, default=None, help='进程数（默认 CPU 核数）')
+    parser.add_argument('--level', type=int, default=2, help='级牌（2..14）')
+    parser.add_argument('--max-turns', type=int, default=DEFAULT_MAX_TURNS, help='单局回合上限')
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help='每个任务的局数')
+    parser.add_argument('--swap', action='store_true', help='奇数局整体挪一个座位')
+    parser.add_argument('--out', help='逐局结果写入 JSONL 文件')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出汇总')
+    args = parser.parse_args()
+
+    out = open(args.out, 'w', encoding='utf-8') if args.out else None
+
+    def write_result(index, swapped, result):
+        out.write(json.dumps({'index': index, 'swapped': swapped, **result._asdict()}) + '\n')
+
+    start = time.perf_counter()
+    try:
+        stats = run_tournament(args.lineup, args.games, seed=args.seed, workers=args.workers,
+                               level=args.level, max_turns=args.max_turns, swap=args.swap,
+                               chunk=args.chunk, on_result=write_result if out else None)
+    except ValueError as e:
+        sys.exit(str(e))
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(stats.summary(), ensure_ascii=False, indent=2))
+    else:
+        print_summary(stats.summary(), elapsed)